@@ -0,0 +1,140 @@
+import asyncio
+
+from store import RentalStore
+from customer import Customer
+
+
+class AsyncRentalStore():
+    """
+    asyncio front-end for a RentalStore.
+    
+    Requests are put on a bounded queue and executed by a fixed number of worker
+    tasks, so any number of booking coroutines can share one store while the
+    number of requests in flight stays bounded. Operations of an in-memory store
+    never block, so the workers run them directly on the event loop. Operations
+    that wait for I/O, on a SQLiteRentalStore or a store with an EventLog attached,
+    run in the loop's default executor instead; the store is thread-safe.
+    
+    The wrapped store must be quiet, so that failures raise errors.RentalError
+    subclasses in the awaiting coroutine instead of printing.
+    
+    Args:
+        store (RentalStore): Quiet store to wrap.
+        workers (int, optional): Number of worker tasks. Defaults to 8.
+        queue_size (int, optional): Maximum number of queued requests; further
+            requests wait until there is room. Defaults to 1000.
+    
+    Attributes:
+        store (RentalStore): The wrapped store.
+    
+    """
+    
+    def __init__(self, store, workers=8, queue_size=1000):
+        assert isinstance(store, RentalStore), 'store must be a RentalStore'
+        assert isinstance(workers, int) and workers > 0, 'workers must be a positive int'
+        assert isinstance(queue_size, int) and queue_size > 0, 'queue_size must be a positive int'
+        assert store.quiet, 'store must be quiet, see RentalStore'
+        self.store = store
+        self._n_workers = workers
+        self._queue_size = queue_size
+        self._queue = None
+        self._workers = []
+        
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        await self.close()
+        
+    async def submit(self, operation, *args):
+        """
+        Run operation(*args) on a worker and return its result.
+        
+        Args:
+            operation (callable): Synchronous store or customer operation.
+            *args: Arguments for operation.
+            
+        Returns:
+            The result of operation; its exceptions are raised here.
+        """
+        if self._queue is None:
+            self._start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((future, operation, args))
+        return await future
+    
+    async def close(self):
+        """Finish all queued requests and stop the workers."""
+        if self._queue is None:
+            return
+        await self._queue.join()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._queue = None
+        self._workers = []
+        
+    def _start(self):
+        self._queue = asyncio.Queue(self._queue_size)
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self._n_workers)]
+        
+    async def _work(self):
+        queue = self._queue
+        while True:
+            future, operation, args = await queue.get()
+            try:
+                if not future.cancelled():
+                    if self.store._blocking_io or self.store.event_log is not None:
+                        result = await asyncio.get_running_loop().run_in_executor(None, operation, *args)
+                    else:
+                        result = operation(*args)
+                    if not future.cancelled():
+                        future.set_result(result)
+            except Exception as error:
+                if not future.cancelled():
+                    future.set_exception(error)
+            finally:
+                queue.task_done()
+
+
+class AsyncCustomer():
+    """
+    Awaitable counterpart of Customer, running its operations through an AsyncRentalStore.
+    
+    Args:
+        name (str): Customer name.
+        store (AsyncRentalStore): Store front-end the customer belongs to.
+        
+    Attributes:
+        customer (Customer): The wrapped synchronous customer.
+        
+    """
+    
+    def __init__(self, name, store):
+        assert isinstance(store, AsyncRentalStore), 'AsyncCustomer needs an AsyncRentalStore'
+        self._store = store
+        self.customer = Customer(name, store.store)
+        
+    def __repr__(self):
+        return repr(self.customer)
+    
+    @property
+    def name(self):
+        return self.customer.name
+    
+    @property
+    def invoice(self):
+        """float: Outstanding amount to pay, read without queueing."""
+        return self.customer.invoice
+    
+    async def rent(self, item_name, rental_time):
+        """Awaitable Customer.rent(); returns the rented unit."""
+        return await self._store.submit(self.customer.rent, item_name, rental_time)
+    
+    async def buy(self, item_name):
+        """Awaitable Customer.buy(); returns the bought unit."""
+        return await self._store.submit(self.customer.buy, item_name)
+    
+    async def pay_invoice(self, amount_paid):
+        """Awaitable Customer.pay_invoice()."""
+        return await self._store.submit(self.customer.pay_invoice, amount_paid)
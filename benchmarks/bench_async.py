@@ -0,0 +1,49 @@
+"""
+Throughput and latency of AsyncRentalStore with many concurrent booking coroutines.
+
+Each client rents one laptop and, once all are rented, buys one phone. Run from the
+repository root:
+    python -m benchmarks.bench_async [n_clients ...]
+"""
+import sys
+import time
+import asyncio
+import statistics
+
+from async_store import AsyncRentalStore, AsyncCustomer
+from store import RentalStore
+from products import Laptop, Phone
+
+
+async def run_clients(n_clients, workers=8, queue_size=1000):
+    names = ['Laptop {}'.format(i % 50) for i in range(n_clients)]
+    store = RentalStore([Laptop(name, 10) for name in names] +
+                        [Phone('Phone {}'.format(i % 50), 5) for i in range(n_clients)], quiet=True)
+    latencies = []
+    
+    async def client(number):
+        customer = AsyncCustomer('Customer {}'.format(number), front)
+        for operation, args in ((customer.rent, (names[number], 2)),
+                                (customer.buy, ('Phone {}'.format(number % 50),))):
+            start = time.perf_counter()
+            await operation(*args)
+            latencies.append(time.perf_counter() - start)
+            
+    async with AsyncRentalStore(store, workers=workers, queue_size=queue_size) as front:
+        start = time.perf_counter()
+        await asyncio.gather(*(client(number) for number in range(n_clients)))
+        elapsed = time.perf_counter() - start
+    return len(latencies) / elapsed, latencies
+
+
+def main(*client_counts):
+    print('{:>8} {:>12} {:>10} {:>10} {:>10}'.format('clients', 'ops/s', 'p50 ms', 'p95 ms', 'p99 ms'))
+    for n_clients in client_counts or (1_000, 10_000):
+        throughput, latencies = asyncio.run(run_clients(n_clients))
+        cuts = statistics.quantiles(latencies, n=100)
+        print('{:>8} {:>12,.0f} {:>10.2f} {:>10.2f} {:>10.2f}'.format(
+            n_clients, throughput, cuts[49] * 1000, cuts[94] * 1000, cuts[98] * 1000))
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
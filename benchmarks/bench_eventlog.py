@@ -0,0 +1,42 @@
+"""
+Operations per second with the write-ahead event log for different fsync batch sizes.
+
+Run from the repository root:
+    python -m benchmarks.bench_eventlog [n_operations]
+"""
+import os
+import sys
+import time
+import tempfile
+
+from eventlog import EventLog
+from store import RentalStore
+from customer import Customer
+from products import Laptop
+
+
+def run(n, batch_size, directory):
+    store = RentalStore([Laptop('Laptop {}'.format(i % 100), 10) for i in range(n)], quiet=True)
+    customer = Customer('Tina Tester', store)
+    names = ['Laptop {}'.format(i % 100) for i in range(n)]
+    log = None
+    if batch_size:
+        log = EventLog(os.path.join(directory, 'events-{}.log'.format(batch_size)), batch_size)
+        store.event_log = log
+    start = time.perf_counter()
+    for name in names:
+        customer.rent(name, 2)
+    if log is not None:
+        log.close()
+    return n / (time.perf_counter() - start)
+
+
+def main(n=20_000):
+    print('{:>12} {:>14}'.format('batch size', 'rents/s'))
+    with tempfile.TemporaryDirectory() as directory:
+        for batch_size in (None, 1, 8, 64, 512, 4096):
+            print('{:>12} {:>14,.0f}'.format(batch_size or 'no log', run(n, batch_size, directory)))
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,60 @@
+"""
+Memory and read cost of a long customer rental history.
+
+One customer rents, pays and returns the same few units over and over, so all
+but a handful of rentals end up as archived RentalRecords. Run from the
+repository root:
+    python -m benchmarks.bench_history [n_rentals]
+"""
+import sys
+import time
+import datetime
+import tracemalloc
+
+from clock import SimulatedClock
+from store import RentalStore
+from customer import Customer
+from products import Laptop
+
+N_UNITS = 10
+
+
+def main(n=100_000):
+    clock = SimulatedClock(datetime.date(2000, 1, 1))
+    store = RentalStore(quiet=True, clock=clock)
+    store.extend_rows([(Laptop, 'Test Laptop', 10, False)] * N_UNITS)
+    customer = Customer('Tina Tester', store)
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    begin = time.perf_counter()
+    for number in range(n):
+        customer.rent('Test Laptop', 1)
+        if number % N_UNITS == N_UNITS - 1:
+            clock.advance(weeks=1)
+            customer.pay_invoice(customer.invoice)
+            for paid in list(customer.paid_items):
+                customer.return_item(paid)
+    elapsed = time.perf_counter() - begin
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    begin = time.perf_counter()
+    page = next(customer.rental_pages(page_size=20))
+    first_page = time.perf_counter() - begin
+    begin = time.perf_counter()
+    unpaid = sum(1 for _ in customer.iter_rentals(paid=False))
+    scan = time.perf_counter() - begin
+    begin = time.perf_counter()
+    len(customer.paid_items)
+    paid_items = time.perf_counter() - begin
+
+    print('rentals:           {:>12,}'.format(n))
+    print('rent/pay/return:   {:>12.1f} us per rental'.format(elapsed / n * 1e6))
+    print('history memory:    {:>12.0f} bytes per rental'.format(used / n))
+    print('first page ({}):   {:>12.3f} ms'.format(len(page), first_page * 1000))
+    print('scan unpaid ({}):   {:>12.3f} ms'.format(unpaid, scan * 1000))
+    print('paid_items:        {:>12.3f} ms'.format(paid_items * 1000))
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
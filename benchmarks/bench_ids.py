@@ -0,0 +1,33 @@
+"""
+Catalog construction throughput for each product ID strategy.
+
+Run from the repository root:
+    python -m benchmarks.bench_ids [n_products]
+"""
+import sys
+import time
+
+from products import Product, Laptop
+from product_ids import Uuid1Ids, SequentialIds, BlockUuidIds, RandomIds
+
+
+def build_catalog(n):
+    return [Laptop('Laptop {}'.format(i % 100), 10) for i in range(n)]
+
+
+def main(n=200_000):
+    default = Product.id_generator
+    print('{:>14} {:>16}'.format('strategy', 'products/s'))
+    try:
+        for strategy in (Uuid1Ids, SequentialIds, BlockUuidIds, RandomIds):
+            Product.id_generator = strategy()
+            start = time.perf_counter()
+            build_catalog(n)
+            elapsed = time.perf_counter() - start
+            print('{:>14} {:>16,.0f}'.format(strategy.__name__, n / elapsed))
+    finally:
+        Product.id_generator = default
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,48 @@
+"""
+Memory footprint of the slotted Product layout compared with the old __dict__ layout.
+
+Run from the repository root:
+    python -m benchmarks.bench_memory [n_products]
+"""
+import sys
+import uuid
+import tracemalloc
+
+from products import Laptop
+
+
+class DictLaptop():
+    """Replica of the previous Product layout: per-instance __dict__ and a str product_id."""
+    
+    def __init__(self, name, price_per_week=0):
+        self.name = name
+        self.product_id = str(uuid.uuid1())
+        self.buyable = False
+        self._price_per_week = price_per_week
+        self._rental_time = None
+        self._rental_start = None
+
+
+def measure(factory, n):
+    """Return the bytes allocated per object when creating n objects with factory."""
+    names = ['Laptop {}'.format(i % 100) for i in range(n)]  # names are shared, not measured
+    tracemalloc.start()
+    start, _ = tracemalloc.get_traced_memory()
+    objects = [factory(name, 10) for name in names]
+    end, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    return (end - start) / n
+
+
+def main(n=100_000):
+    old = measure(DictLaptop, n)
+    new = measure(Laptop, n)
+    print('{:>12} {:>14}'.format('layout', 'bytes/product'))
+    print('{:>12} {:>14.1f}'.format('__dict__', old))
+    print('{:>12} {:>14.1f}'.format('__slots__', new))
+    print('saving: {:.0%}'.format(1 - new / old))
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
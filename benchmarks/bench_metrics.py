@@ -0,0 +1,56 @@
+"""
+Overhead of the metrics instrumentation on renting and reading invoices.
+
+Measures the same workload before enabling metrics, while they are enabled and
+after disabling them again. The last run must match the first: the script exits
+with status 1 if it is more than TOLERANCE slower than the baseline. Each figure
+is the best of REPEATS runs to keep noise below the tolerance. Run from the
+repository root:
+    python -m benchmarks.bench_metrics [n_operations]
+"""
+import sys
+import time
+
+import metrics
+from store import RentalStore
+from customer import Customer
+from products import Laptop
+
+# largest slowdown of the run after metrics.disable() over the baseline
+TOLERANCE = 0.05
+REPEATS = 3
+
+
+def run(n):
+    store = RentalStore(quiet=True).extend_rows([(Laptop, 'Laptop {}'.format(i % 100), 10, False)
+                                                 for i in range(n)])
+    customer = Customer('Bench Customer', store)
+    start = time.perf_counter()
+    for i in range(n):
+        customer.rent('Laptop {}'.format(i % 100), 4)
+        customer.invoice
+    return (time.perf_counter() - start) / (2 * n)
+
+
+def best(n):
+    return min(run(n) for _ in range(REPEATS))
+
+
+def main(n=100_000):
+    run(min(n, 10_000))  # warm up
+    baseline = best(n)
+    metrics.enable()
+    instrumented = best(n)
+    metrics.disable()
+    disabled = best(n)
+    print('{:>14} {:>10} {:>10}'.format('', 'us/op', 'overhead'))
+    for label, seconds in (('baseline', baseline), ('enabled', instrumented), ('disabled', disabled)):
+        print('{:>14} {:>10.3f} {:>9.1f}%'.format(label, seconds * 1e6, (seconds / baseline - 1) * 100))
+    if disabled > baseline * (1 + TOLERANCE):
+        print('FAILED: disabled metrics are more than {:.0%} slower than the baseline'.format(TOLERANCE))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(*(int(arg) for arg in sys.argv[1:])))
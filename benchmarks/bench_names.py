@@ -0,0 +1,62 @@
+"""
+Type-ahead and fuzzy name search at catalog scale.
+
+Builds a store with one unit per distinct name and measures prefix search,
+suggestions for misspelled names and incremental updates. Run from the
+repository root:
+    python -m benchmarks.bench_names [n_names]
+"""
+import sys
+import time
+import random
+
+from store import RentalStore
+from products import Product, Laptop
+from product_ids import SequentialIds
+
+WORDS = ('Laptop', 'Phone', 'Tablet', 'Pro', 'Max', 'Mini', 'Ultra', 'Air', 'Book', 'Pad', 'X', 'Plus')
+N_QUERIES = 100
+
+
+def main(n=1_000_000):
+    rng = random.Random(0)
+    names = ['{} {} {} {}'.format(rng.choice(WORDS), rng.choice(WORDS), rng.choice(WORDS), i) for i in range(n)]
+    default = Product.id_generator
+    Product.id_generator = SequentialIds()
+    try:
+        store = RentalStore(quiet=True).extend_rows([(Laptop, name, 10, False) for name in names])
+    finally:
+        Product.id_generator = default
+    start = time.perf_counter()
+    store.search_names('')
+    built = time.perf_counter()
+    
+    prefixes = [name[:rng.randint(3, 12)] for name in rng.sample(names, N_QUERIES)]
+    typos = []
+    for name in rng.sample(names, N_QUERIES):
+        position = rng.randrange(len(name))
+        typos.append(name[:position] + name[position + 1:])
+        
+    timings = {}
+    for label, search, queries in (('prefix', store.search_names, prefixes),
+                                   ('fuzzy, distance 1', lambda name: store.suggest_names(name, 1), typos),
+                                   ('fuzzy, distance 2', store.suggest_names, typos)):
+        begin = time.perf_counter()
+        for query in queries:
+            search(query)
+        timings[label] = (time.perf_counter() - begin) / len(queries)
+    begin = time.perf_counter()
+    for number in range(N_QUERIES):
+        store + Laptop('New Laptop {}'.format(number), 10)
+    for item in store.get_by_name('New Laptop 0'):
+        store.discard(item)
+    timings['add a name'] = (time.perf_counter() - begin) / N_QUERIES
+    
+    print('names:            {:>12,}'.format(n))
+    print('build index:      {:>12.1f} ms'.format((built - start) * 1000))
+    for label, seconds in timings.items():
+        print('{:<18}{:>12.3f} ms'.format(label + ':', seconds * 1000))
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
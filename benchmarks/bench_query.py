@@ -0,0 +1,60 @@
+"""
+Faceted, price-sorted catalog queries: CatalogIndex against a linear filter.
+
+The query is "available, buyable phones between 3 and 8 per week, sorted by
+price", first page and a deep page. Run from the repository root:
+    python -m benchmarks.bench_query [n_products ...]
+"""
+import sys
+import time
+import random
+
+from store import RentalStore
+from products import Product, Laptop, Phone
+from product_ids import SequentialIds
+
+N_QUERIES = 100
+
+
+def linear(store, offset, limit):
+    matches = [item for item in store.products
+               if isinstance(item, Phone) and item.available and item.buyable
+               and item.price_per_week is not None and 3 <= item.price_per_week <= 8]
+    matches.sort(key=lambda item: item.price_per_week)
+    return matches[offset:offset + limit]
+
+
+def indexed(store, offset, limit):
+    return store.query(kind=Phone, available=True, buyable=True, min_price=3, max_price=8,
+                       offset=offset, limit=limit)
+
+
+def main(*sizes):
+    rng = random.Random(0)
+    default = Product.id_generator
+    Product.id_generator = SequentialIds()
+    try:
+        print('{:>12} {:>8} {:>14} {:>14} {:>9}'.format('products', 'offset', 'linear ms', 'indexed ms', 'speedup'))
+        for n in sizes or (10_000, 100_000, 1_000_000):
+            store = RentalStore(quiet=True).extend_rows(
+                [(rng.choice((Laptop, Phone)), 'Item {}'.format(i % 1000), rng.randint(1, 100), rng.random() < 0.5)
+                 for i in range(n)])
+            for item in store.products[::4]:
+                item.rent(2)
+            store.query(limit=0)  # builds the indexes
+            for offset in (0, 1000):
+                assert linear(store, offset, 20) == indexed(store, offset, 20)
+                timings = []
+                for search in (linear, indexed):
+                    start = time.perf_counter()
+                    for _ in range(N_QUERIES):
+                        search(store, offset, 20)
+                    timings.append((time.perf_counter() - start) / N_QUERIES)
+                print('{:>12,} {:>8,} {:>14.3f} {:>14.3f} {:>8.0f}x'.format(
+                    n, offset, timings[0] * 1e3, timings[1] * 1e3, timings[0] / timings[1]))
+    finally:
+        Product.id_generator = default
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
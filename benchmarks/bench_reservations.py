@@ -0,0 +1,55 @@
+"""
+Reservation conflict checks and earliest-slot queries on heavily booked units.
+
+Books every unit of one model back to back with short reservations and measures
+reserving, rentals that have to skip reserved units and the earliest free slot
+across all units. Run from the repository root:
+    python -m benchmarks.bench_reservations [n_units] [bookings_per_unit]
+"""
+import sys
+import time
+import random
+import datetime
+
+from clock import SimulatedClock
+from store import RentalStore
+from customer import Customer
+from products import Phone
+
+N_QUERIES = 1000
+
+
+def main(n_units=100, bookings=1000):
+    rng = random.Random(0)
+    today = datetime.date(2024, 1, 1)
+    store = RentalStore(quiet=True, clock=SimulatedClock(today))
+    store.extend_rows([(Phone, 'Test Phone', 5, True)] * n_units)
+    customer = Customer('Tina Tester', store)
+    begin = time.perf_counter()
+    for week in range(1, bookings + 1):
+        for _ in range(n_units):
+            customer.reserve('Test Phone', today + datetime.timedelta(weeks=2 * week), 1)
+    reserved = time.perf_counter()
+
+    starts = [today + datetime.timedelta(days=rng.randrange(14 * bookings)) for _ in range(N_QUERIES)]
+    begin_slots = time.perf_counter()
+    for start in starts:
+        store.earliest_slot('Test Phone', 1, start)
+    slots = time.perf_counter()
+    rented = 0
+    for _ in range(N_QUERIES):
+        item = store.rent_available('Test Phone', 1)
+        if item is not None:
+            rented += 1
+            item._release()
+    rentals = time.perf_counter()
+
+    print('units:            {:>12,}'.format(n_units))
+    print('reservations:     {:>12,}'.format(n_units * bookings))
+    print('reserve:          {:>12.3f} ms'.format((reserved - begin) / (n_units * bookings) * 1000))
+    print('earliest slot:    {:>12.3f} ms'.format((slots - begin_slots) / N_QUERIES * 1000))
+    print('rent and release: {:>12.3f} ms ({} rented)'.format((rentals - slots) / N_QUERIES * 1000, rented))
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
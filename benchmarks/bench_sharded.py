@@ -0,0 +1,36 @@
+"""
+Throughput of ShardedRentalStore from 1 to N shard processes.
+
+Clients rent in batches; each batch is split by shard and the parts run in
+parallel. Run from the repository root:
+    python -m benchmarks.bench_sharded [max_workers] [n_products] [batch_size]
+"""
+import os
+import sys
+import time
+
+from sharded_store import ShardedRentalStore, ShardedCustomer
+from products import Laptop
+
+
+def run(workers, n_products, batch_size):
+    with ShardedRentalStore(workers=workers) as store:
+        store.extend_rows([(Laptop, 'Laptop {}'.format(i % 1000), 10, False) for i in range(n_products)])
+        orders = [('Laptop {}'.format(i % 1000), 4) for i in range(n_products)]
+        start = time.perf_counter()
+        for number, first in enumerate(range(0, n_products, batch_size)):
+            ShardedCustomer('Customer {}'.format(number), store).rent_many(orders[first:first + batch_size])
+        return n_products / (time.perf_counter() - start)
+
+
+def main(max_workers=os.cpu_count() or 1, n_products=200_000, batch_size=10_000):
+    print('{:>8} {:>14} {:>9}'.format('workers', 'rentals/s', 'speedup'))
+    baseline = None
+    for workers in range(1, max_workers + 1):
+        throughput = run(workers, n_products, batch_size)
+        baseline = baseline or throughput
+        print('{:>8} {:>14,.0f} {:>8.2f}x'.format(workers, throughput, throughput / baseline))
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,25 @@
+"""
+Seeded load simulation: throughput, latency percentiles and peak memory per operation.
+
+Run from the repository root:
+    python -m benchmarks.bench_simulation [days] [arrivals_per_day] [seed]
+
+Peak memory is measured with tracemalloc in a second run, so that tracing does not
+distort the latencies. The same numbers are checked for regressions by the
+pytest-benchmark suite in benchmarks/test_benchmarks.py.
+"""
+import sys
+
+from simulator import Simulation, format_report
+
+
+def main(days=365, arrivals_per_day=100, seed=0):
+    print(format_report(Simulation(seed=seed, days=days, arrivals_per_day=arrivals_per_day).run()))
+    print()
+    print('with tracemalloc:')
+    print(format_report(Simulation(seed=seed, days=days, arrivals_per_day=arrivals_per_day,
+                                   trace_memory=True).run()))
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,51 @@
+"""
+Snapshot size, save time, memory-mapped open time and full reload time.
+
+Run from the repository root:
+    python -m benchmarks.bench_snapshot [n_products]
+"""
+import os
+import sys
+import time
+import tempfile
+
+from snapshot import Snapshot, save_snapshot
+from store import RentalStore
+from products import Product, Laptop
+from product_ids import SequentialIds
+
+
+def main(n=500_000):
+    default = Product.id_generator
+    Product.id_generator = SequentialIds()
+    try:
+        store = RentalStore(quiet=True).extend_rows(
+            [(Laptop, 'Laptop {}'.format(i % 1000), 10, False) for i in range(n)])
+    finally:
+        Product.id_generator = default
+    for item in store.products[::3]:
+        item.rent(4)
+        
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'store.snap')
+        start = time.perf_counter()
+        save_snapshot(path, store)
+        saved = time.perf_counter()
+        with Snapshot(path) as snapshot:
+            opened = time.perf_counter()
+            snapshot.get(store.products[n // 2].product_id)
+            looked_up = time.perf_counter()
+            snapshot.load(quiet=True)
+            loaded = time.perf_counter()
+        size = os.path.getsize(path)
+        
+    print('products:      {:>12,}'.format(n))
+    print('file size:     {:>12,} bytes ({:.1f} bytes/product)'.format(size, size / n))
+    print('save:          {:>12.1f} ms'.format((saved - start) * 1000))
+    print('open (mmap):   {:>12.3f} ms'.format((opened - saved) * 1000))
+    print('lookup by id:  {:>12.3f} ms'.format((looked_up - opened) * 1000))
+    print('full load:     {:>12.1f} ms'.format((loaded - looked_up) * 1000))
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,58 @@
+"""
+SQLiteRentalStore compared with the in-memory RentalStore: catalog creation,
+renting through a Customer, lookups by ID and the invoice.
+
+Run from the repository root, e.g. for the 1M and 10M catalogs:
+    python -m benchmarks.bench_sqlite [n_products ...]
+"""
+import os
+import sys
+import time
+import tempfile
+
+from sqlite_store import SQLiteRentalStore
+from store import RentalStore
+from customer import Customer
+from products import Product, Laptop
+from product_ids import SequentialIds
+
+N_RENTALS = 1000
+
+
+def _run(store, n):
+    start = time.perf_counter()
+    store.extend_rows([(Laptop, 'Laptop {}'.format(i % 1000), 10, False) for i in range(n)])
+    created = time.perf_counter()
+    customer = Customer('Bench Customer', store)
+    ids = [customer.rent('Laptop {}'.format(i % 1000), 4).product_id for i in range(N_RENTALS)]
+    rented = time.perf_counter()
+    for product_id in ids:
+        store.get_by_id(product_id)
+    looked_up = time.perf_counter()
+    customer.invoice
+    invoiced = time.perf_counter()
+    return (created - start, (rented - created) / N_RENTALS,
+            (looked_up - rented) / N_RENTALS, invoiced - looked_up)
+
+
+def main(*sizes):
+    sizes = sizes or (10_000,)
+    default = Product.id_generator
+    Product.id_generator = SequentialIds()
+    try:
+        print('{:>12} {:>10} {:>12} {:>14} {:>14} {:>12}'.format(
+            'products', 'store', 'create ms', 'rent us/op', 'lookup us/op', 'invoice ms'))
+        for n in sizes:
+            with tempfile.TemporaryDirectory() as directory:
+                sqlite = SQLiteRentalStore(os.path.join(directory, 'store.db'), quiet=True)
+                for label, store in (('memory', RentalStore(quiet=True)), ('sqlite', sqlite)):
+                    create, rent, lookup, invoice = _run(store, n)
+                    print('{:>12,} {:>10} {:>12.1f} {:>14.1f} {:>14.1f} {:>12.3f}'.format(
+                        n, label, create * 1e3, rent * 1e6, lookup * 1e6, invoice * 1e3))
+                sqlite.close()
+    finally:
+        Product.id_generator = default
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,80 @@
+"""
+pytest-benchmark suite of the hot paths, to catch performance regressions.
+
+Run from the repository root, e.g. comparing against a saved baseline:
+    python -m pytest benchmarks/test_benchmarks.py --benchmark-autosave
+    python -m pytest benchmarks/test_benchmarks.py --benchmark-compare --benchmark-compare-fail=mean:10%
+
+The module is skipped when pytest-benchmark is not installed.
+"""
+import pytest
+import datetime
+
+pytest.importorskip('pytest_benchmark')
+
+from clock import SimulatedClock
+from customer import Customer
+from simulator import Simulation
+from store import RentalStore
+from products import Laptop, Phone
+
+
+@pytest.fixture
+def store():
+    """Fixture for a quiet store with 100 laptop and 100 phone models, 100 units each."""
+    out = RentalStore(quiet=True, clock=SimulatedClock(datetime.date(2024, 1, 1)))
+    out.extend_rows([(Laptop, 'Laptop {}'.format(i % 100), 10, False) for i in range(10_000)] +
+                    [(Phone, 'Phone {}'.format(i % 100), 5, True) for i in range(10_000)])
+    return out
+
+
+def test_rent(benchmark, store):
+    customer = Customer('Bench Customer', store)
+    names = iter(['Laptop {}'.format(i % 100) for i in range(10_000)])
+    benchmark.pedantic(lambda: customer.rent(next(names), 4), rounds=5_000)
+    
+    
+def test_buy(benchmark, store):
+    customer = Customer('Bench Customer', store)
+    names = iter(['Phone {}'.format(i % 100) for i in range(10_000)])
+    benchmark.pedantic(lambda: customer.buy(next(names)), rounds=2_000)
+    
+    
+def test_invoice(benchmark, store):
+    customer = Customer('Bench Customer', store)
+    customer.rent_many([('Laptop {}'.format(i % 100), 1 + i % 8) for i in range(1_000)])
+    store.clock.advance(weeks=4)
+    benchmark(lambda: customer.invoice)
+    
+    
+def test_pay_invoice(benchmark, store):
+    customers = iter([Customer('Customer {}'.format(i), store) for i in range(1_000)])
+    paid = []
+    
+    def setup():
+        # check the units paid in the last round back in, so the 100 units per model last
+        for customer in paid:
+            for item in list(customer.paid_items):
+                customer.return_item(item)
+        customer = next(customers)
+        paid[:] = [customer]
+        customer.rent_many([('Laptop {}'.format(i), 1) for i in range(10)])
+        store.clock.advance(weeks=1)
+        return (customer, customer.invoice), {}
+    benchmark.pedantic(lambda customer, amount: customer.pay_invoice(amount), setup=setup, rounds=500)
+    
+    
+def test_get_by_id(benchmark, store):
+    product_id = store.products[len(store) // 2].product_id
+    benchmark(store.get_by_id, product_id)
+    
+    
+def test_receivables(benchmark, store):
+    for number in range(100):
+        Customer('Customer {}'.format(number), store).rent('Laptop {}'.format(number), 1)
+    store.clock.advance(weeks=2)
+    benchmark(lambda: store.receivables)
+    
+    
+def test_simulated_month(benchmark):
+    benchmark.pedantic(Simulation(days=30).run, rounds=3)
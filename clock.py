@@ -0,0 +1,72 @@
+import weakref
+import datetime
+import threading
+
+
+class SystemClock():
+    """Clock of a RentalStore following the system date. The default clock."""
+
+    def today(self):
+        """datetime.date: The current day."""
+        return datetime.date.today()
+
+    def subscribe(self, callback):
+        """The system date advances on its own, subscribers are never called."""
+
+
+class SimulatedClock():
+    """
+    Clock that only moves when advanced, for tests and load simulations.
+
+    Stores using the clock subscribe to it. advance() moves the date by any number of
+    days or weeks in one step and then lets every store process all rentals that
+    ended in that window as one batch, so a simulated year costs one sweep per
+    advance instead of a date lookup per product and property access.
+
+    Args:
+        start (datetime.date, optional): Initial day. Defaults to today.
+
+    """
+
+    def __init__(self, start=None):
+        assert isinstance(start, (datetime.date, type(None))), 'start must be a datetime.date'
+        self._today = start or datetime.date.today()
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    def today(self):
+        """datetime.date: The current simulated day."""
+        return self._today
+
+    def subscribe(self, callback):
+        """
+        Call callback() after every advance, for as long as its object is alive.
+
+        Args:
+            callback: Bound method, e.g. RentalStore._sweep.
+        """
+        with self._lock:
+            self._subscribers.append(weakref.WeakMethod(callback))
+
+    def advance(self, days=0, weeks=0):
+        """
+        Move the clock forward and process the rentals that became due.
+
+        Args:
+            days (int, optional): Days to advance. Defaults to 0.
+            weeks (int, optional): Weeks to advance. Defaults to 0.
+
+        Returns:
+            datetime.date: The new day.
+        """
+        assert isinstance(days, int) and isinstance(weeks, int), 'days and weeks must be int'
+        assert days >= 0 and weeks >= 0, 'The clock can only advance'
+        with self._lock:
+            self._today += datetime.timedelta(days=days, weeks=weeks)
+            callbacks = [reference() for reference in self._subscribers]
+            self._subscribers = [reference for reference, callback in zip(self._subscribers, callbacks)
+                                 if callback is not None]
+        for callback in callbacks:
+            if callback is not None:
+                callback()
+        return self._today
@@ -0,0 +1,480 @@
+import math
+import weakref
+import datetime
+import itertools
+import threading
+from array import array
+
+from products import Product, Laptop, Phone, KINDS, _kind
+from store import RentalStore
+from indexes import paginate
+
+try:
+    import numpy as np
+except ImportError:  # queries fall back to plain Python loops over the columns
+    np = None
+
+
+class _RowView():
+    """
+    Mixin turning a Product class into a view on one row of a ColumnarRentalStore.
+    
+    The state that Product keeps in slots is read from and written to the store's
+    columns instead, so all Product properties, setters and rent() keep working.
+    
+    """
+    
+    __slots__ = ()
+    
+    @property
+    def name(self):
+        return self._table._names[self._row]
+    
+    @name.setter
+    def name(self, new_name):
+        self._table._names[self._row] = new_name
+        
+    @property
+    def _buyable(self):
+        return bool(self._table._buyable[self._row])
+    
+    @_buyable.setter
+    def _buyable(self, new_buyable):
+        self._table._buyable[self._row] = bool(new_buyable)
+        
+    @property
+    def _price_per_week(self):
+        price = self._table._prices[self._row]
+        return None if math.isnan(price) else price
+    
+    @_price_per_week.setter
+    def _price_per_week(self, new_price):
+        self._table._prices[self._row] = math.nan if new_price is None else new_price
+        
+    @property
+    def _start(self):
+        start = self._table._starts[self._row]
+        return datetime.date.fromordinal(start) if start else None
+    
+    @_start.setter
+    def _start(self, new_start):
+        self._table._starts[self._row] = 0 if new_start is None else new_start.toordinal()
+        
+    @property
+    def _weeks(self):
+        weeks = self._table._weeks[self._row]
+        return weeks if weeks else None
+    
+    @_weeks.setter
+    def _weeks(self, new_weeks):
+        self._table._weeks[self._row] = 0 if new_weeks is None else new_weeks
+
+
+class ProductView(_RowView, Product):
+    __slots__ = ('_table', '_row')
+    
+    
+class LaptopView(_RowView, Laptop):
+    __slots__ = ('_table', '_row')
+    
+    
+class PhoneView(_RowView, Phone):
+    __slots__ = ('_table', '_row')
+    
+    
+_VIEWS = (ProductView, LaptopView, PhoneView)
+
+
+def _put_row(table, name, row):
+    """Add row to the {name: {row: None}} table, returns True if it was not in it yet."""
+    rows = table.setdefault(name, {})
+    added = row not in rows
+    rows[row] = None
+    return added
+
+
+def _drop_row(table, name, row):
+    """Remove row from the {name: {row: None}} table, returns True if it was in it."""
+    rows = table.get(name)
+    if rows is None or row not in rows:
+        return False
+    del rows[row]
+    if not rows:
+        del table[name]
+    return True
+
+
+class ColumnarRentalStore(RentalStore):
+    """
+    RentalStore keeping its catalog in parallel columns instead of Product objects.
+    
+    Names, prices, rental start (as date ordinal, 0 when not rented), rental weeks
+    (0 when not rented), buyable flags and a type code are stored in arrays, and
+    the name pools and ID lookups hold row numbers. A lightweight view is created
+    for a row only when the product is looked up, so the RentalStore and Customer
+    API keep working, while select(), query() and revenue_due() run over the
+    columns (vectorized with NumPy if it is installed). Like the identity map of
+    SQLiteRentalStore, a weak cache makes sure that a row has at most one view while
+    that view is in use, e.g. held by a Customer.
+    
+    Products passed to the store are copied into the columns; afterwards the views
+    returned by the store are the items to work with. Numbers read back from the
+    columns are floats. products builds a list of views of the whole catalog; use
+    iter_products() or pages() to stream large stores.
+    
+    Args:
+        products (list): List of products in store. Defaults to empty list.
+        quiet (bool, optional): See RentalStore. Defaults to False.
+        clock (optional): See RentalStore. Defaults to the system clock.
+    
+    """
+    
+    def __init__(self, products=None, quiet=False, clock=None):
+        if products is None:
+            products = []
+        assert type(products) == list, "The input argument needs to be a list."
+        for item in products:
+            assert isinstance(item, Product), "only Product-type are allowed to be in rental store"
+        self._init_shared(quiet, clock)
+        self._ids = []  # Product._id by row
+        self._names = []
+        self._prices = array('d')
+        self._starts = array('l')
+        self._weeks = array('d')
+        self._buyable = array('b')
+        self._kinds = array('b')
+        self._alive = array('b')
+        # rows changed since the last snapshot, see _take_changes()
+        self._dirty = bytearray()
+        # row by Product._id of the products in the store
+        self._rows = {}
+        # rows of all and of the free units by name as {row: None}, in row order;
+        # updated under the lock striped by name
+        self._by_name = {}
+        self._available = {}
+        self._name_locks = tuple(threading.Lock() for _ in range(64))
+        # units whose rental has ended are swept into _ended
+        self._ended = {}
+        # query() scans the columns instead of keeping a CatalogIndex
+        self._catalog_index = None
+        # views in use by row; rows are never reused, so a view stays valid after
+        # its product is sold or removed
+        self._views = weakref.WeakValueDictionary()
+        self._views_lock = threading.Lock()
+        self.extend(products)
+        
+    @property
+    def products(self):
+        """list: Views of all products of the store, in row order."""
+        return [self._view(row) for row in self._live_rows()]
+    
+    def __len__(self):
+        """Return the number of products in the store."""
+        return len(self._rows)
+    
+    def __add__(self, item):
+        """Add a product to the store as a new row."""
+        assert isinstance(item, Product), "Only instances of Product can be added to the store"
+        with self._catalog_lock:
+            assert item._id not in self._rows, "Product is already part of the store"
+            self._log_product('add', item)
+            self._append_row(item)
+        if not self.quiet:
+            print('{} is added to the store'.format(item.__repr__()))
+        return self
+    
+    def extend(self, items):
+        """Add many products to the store as new rows, without printing."""
+        with self._catalog_lock:
+            keys = set()
+            for item in items:
+                assert isinstance(item, Product), "Only instances of Product can be added to the store"
+                assert item._id not in self._rows, "Product is already part of the store"
+                assert item._id not in keys, "Product is added twice"
+                keys.add(item._id)
+            for item in items:
+                self._log_product('add', item)
+            for item in items:
+                self._append_row(item)
+        return self
+    
+    def extend_rows(self, rows):
+        """Write validated (cls, name, price_per_week, buyable) rows straight into the columns."""
+        with self._catalog_lock:
+            for cls, name, price_per_week, buyable in rows:
+                row = self._append_values(KINDS.index(cls), name, price_per_week, 0, 0, buyable,
+                                          cls.id_generator.new_id())
+                if self.event_log is not None:
+                    self._log_product('add', self._view(row))
+        return self
+    
+    def discard(self, item):
+        """Remove exactly this product from the store, see RentalStore.discard()."""
+        with self._catalog_lock:
+            row = self._rows.get(item._id)
+            if row is None:
+                return False
+            self._log('remove', id=format(item._id, 'x'))
+            name = self._names[row]
+            del self._rows[item._id]
+            with self._views_lock:
+                self._alive[row] = False
+                view = self._views.get(row)
+                if view is not None:
+                    view._store = None
+            item._store = None
+            self._dirty[row] = True
+            with self._name_lock(name):
+                _drop_row(self._by_name, name, row)
+                rented = not _drop_row(self._available, name, row)
+                if name not in self._by_name and self._name_index is not None:
+                    self._name_index.remove(name)
+            if rented:
+                self._count_rented(-1)
+            self._ended.pop(item._id, None)
+            self._renters.pop(item._id, None)
+            self._bookings.pop(item._id, None)
+        return True
+    
+    def _append_row(self, item):
+        """Copy item into a new row and return the row number."""
+        return self._append_values(_kind(item),
+                                   item.name,
+                                   item.price_per_week,
+                                   item.rental_start.toordinal() if item.rental_start else 0,
+                                   item.rental_time or 0,
+                                   item.buyable,
+                                   item._id)
+    
+    def _append_values(self, kind, name, price_per_week, start, weeks, buyable, product_id):
+        """Append one row to every column and the pools; call with _catalog_lock held."""
+        row = len(self._ids)
+        self._ids.append(product_id)
+        self._names.append(name)
+        self._prices.append(math.nan if price_per_week is None else price_per_week)
+        self._starts.append(start)
+        self._weeks.append(weeks)
+        self._buyable.append(bool(buyable))
+        self._kinds.append(kind)
+        self._alive.append(True)
+        self._dirty.append(True)
+        self._rows[product_id] = row
+        with self._name_lock(name):
+            if name not in self._by_name and self._name_index is not None:
+                self._name_index.add(name)
+            _put_row(self._by_name, name, row)
+            if not weeks:
+                _put_row(self._available, name, row)
+        if weeks:
+            self._count_rented(1)
+            self._expiry.push(self._view(row))
+        return row
+    
+    def _view(self, row):
+        """Return the view of a row, reusing the one already in use if any."""
+        with self._views_lock:
+            view = self._views.get(row)
+            if view is None:
+                cls = _VIEWS[self._kinds[row]]
+                view = cls.__new__(cls)
+                view._table = self
+                view._row = row
+                view._id = self._ids[row]
+                view._store = self if self._alive[row] else None
+                self._views[row] = view
+            return view
+        
+    def _live_rows(self):
+        """Iterate over the rows of the products in the store, in row order."""
+        return itertools.compress(range(len(self._alive)), self._alive)
+    
+    def get_by_id(self, product_id):
+        """Return the product with the given product_id, or None if it is not in the store."""
+        key = Product.id_key(product_id)
+        if key is None:
+            return None
+        return self._lookup(key)
+    
+    def _lookup(self, key):
+        row = self._rows.get(key)
+        if row is None:
+            return None
+        view = self._view(row)
+        return view if view._store is self else None
+    
+    def get_by_name(self, name):
+        """Return a list of all products in the store with the given name."""
+        with self._name_lock(name):
+            rows = list(self._by_name.get(name, ()))
+        return [self._view(row) for row in rows]
+    
+    def get_available(self, name):
+        """Return any free unit with the given name, or None if all units are rented."""
+        with self._name_lock(name):
+            rows = self._available.get(name)
+            if not rows:
+                return None
+            row = next(iter(rows))
+        return self._view(row)
+    
+    def _free_units(self, name):
+        with self._name_lock(name):
+            rows = list(self._available.get(name, ()))
+        return [self._view(row) for row in rows]
+    
+    def rented_count(self, name):
+        """Return the number of rented units with the given name."""
+        with self._name_lock(name):
+            return len(self._by_name.get(name, ())) - len(self._available.get(name, ()))
+        
+    def iter_products(self, name=None, kind=None, available=None, buyable=None, offset=0, limit=None):
+        """Stream the catalog, see RentalStore.iter_products(); filters are read from the columns."""
+        if name is not None:
+            with self._name_lock(name):
+                rows = list(self._by_name.get(name, ()))
+        else:
+            rows = self._live_rows()
+        for row in rows:
+            if kind is not None and not issubclass(_VIEWS[self._kinds[row]], kind):
+                continue
+            if available is not None and (self._weeks[row] == 0) != available:
+                continue
+            if buyable is not None and bool(self._buyable[row]) != buyable:
+                continue
+            if offset:
+                offset -= 1
+                continue
+            if limit is not None:
+                if limit <= 0:
+                    return
+                limit -= 1
+            yield self._view(row)
+            
+    def query(self, kind=None, available=None, buyable=None, min_price=None, max_price=None,
+              descending=False, offset=0, limit=None):
+        """
+        Search the catalog by facets and price range, sorted by price, see RentalStore.query().
+        
+        The matching rows are found with a scan of the columns and sorted by price;
+        only the rows of the requested page are turned into views.
+        """
+        codes = None if kind is None else [code for code, view in enumerate(_VIEWS) if issubclass(view, kind)]
+        rows = self._matching_rows(codes, available, buyable, min_price, max_price)
+        prices = self._prices
+        if descending:
+            rows.sort(key=lambda row: (math.isnan(prices[row]), -prices[row], -row))
+        else:
+            rows.sort(key=lambda row: (math.isnan(prices[row]), prices[row], row))
+        return [self._view(row) for row in paginate(rows, offset, limit)]
+    
+    def _product_rented(self, item):
+        """Called by Product.rent() to move the row out of the free pool."""
+        with self._name_lock(item.name):
+            rented = _drop_row(self._available, item.name, item._row)
+        if rented:
+            self._count_rented(1)
+        self._expiry.push(item)
+        self._dirty[item._row] = True
+        
+    def _product_released(self, item):
+        """Called by Product._release() to move the row back into the free pool."""
+        with self._name_lock(item.name):
+            released = _put_row(self._available, item.name, item._row)
+        if released:
+            self._count_rented(-1)
+        self._ended.pop(item._id, None)
+        self._renters.pop(item._id, None)
+        self._dirty[item._row] = True
+        
+    def _mark_changed(self, item):
+        self._dirty[item._row] = True
+        
+    def _take_changes(self):
+        """Return and reset the products changed since the last call, see RentalStore._take_changes()."""
+        with self._catalog_lock:
+            dirty, self._dirty = self._dirty, bytearray(len(self._dirty))
+        return {self._ids[row]: self._view(row) if self._alive[row] else None
+                for row in itertools.compress(range(len(dirty)), dirty)}
+        
+    def select(self, kind=None, available=None, buyable=None, min_price=None, max_price=None):
+        """
+        Return the products matching all given conditions.
+        
+        Args:
+            kind (type, optional): Product, Laptop or Phone (exact type).
+            available (bool, optional): Filter on availability.
+            buyable (bool, optional): Filter on buyable flag.
+            min_price (float, optional): Lowest price per week, inclusive.
+            max_price (float, optional): Highest price per week, inclusive.
+            
+        Returns:
+            list: Matching product views in row order.
+        """
+        codes = None if kind is None else [KINDS.index(kind)]
+        return [self._view(row) for row in self._matching_rows(codes, available, buyable, min_price, max_price)]
+    
+    def revenue_due(self, first_day, last_day):
+        """
+        Sum of price_per_week * rental_time over rentals ending between two days.
+        
+        Args:
+            first_day (datetime.date): First day of the period, inclusive.
+            last_day (datetime.date): Last day of the period, inclusive.
+            
+        Returns:
+            float: Revenue of the rentals that end in the period.
+        """
+        first, last = first_day.toordinal(), last_day.toordinal()
+        if np is not None:
+            starts = np.frombuffer(self._starts, dtype=np.int64 if self._starts.itemsize == 8 else np.int32)
+            weeks = np.frombuffer(self._weeks)
+            prices = np.frombuffer(self._prices)
+            alive = np.frombuffer(self._alive, dtype=np.int8).astype(bool)
+            ends = starts + np.floor(weeks * 7).astype(starts.dtype)
+            mask = alive & (starts > 0) & (ends >= first) & (ends <= last)
+            return float(np.sum(prices[mask] * weeks[mask]))
+        total = 0.0
+        for start, weeks, price, alive in zip(self._starts, self._weeks, self._prices, self._alive):
+            if alive and start and first <= start + int(weeks * 7) <= last:
+                total += price * weeks
+        return total
+    
+    def _matching_rows(self, codes, available, buyable, min_price, max_price):
+        """Return the live rows with a type code in codes (any if None) matching the other filters."""
+        if np is not None:
+            return self._select_numpy(codes, available, buyable, min_price, max_price)
+        return self._select_python(codes, available, buyable, min_price, max_price)
+    
+    def _select_numpy(self, codes, available, buyable, min_price, max_price):
+        mask = np.frombuffer(self._alive, dtype=np.int8).astype(bool)
+        if codes is not None:
+            mask &= np.isin(np.frombuffer(self._kinds, dtype=np.int8), codes)
+        if available is not None:
+            mask &= (np.frombuffer(self._weeks) == 0) == available
+        if buyable is not None:
+            mask &= np.frombuffer(self._buyable, dtype=np.int8).astype(bool) == buyable
+        prices = np.frombuffer(self._prices)
+        if min_price is not None:
+            mask &= prices >= min_price
+        if max_price is not None:
+            mask &= prices <= max_price
+        return np.flatnonzero(mask).tolist()
+    
+    def _select_python(self, codes, available, buyable, min_price, max_price):
+        rows = []
+        columns = zip(self._alive, self._kinds, self._weeks, self._buyable, self._prices)
+        for row, (alive, kind, weeks, is_buyable, price) in enumerate(columns):
+            if not alive:
+                continue
+            if codes is not None and kind not in codes:
+                continue
+            if available is not None and (weeks == 0) != available:
+                continue
+            if buyable is not None and bool(is_buyable) != buyable:
+                continue
+            if min_price is not None and not price >= min_price:
+                continue
+            if max_price is not None and not price <= max_price:
+                continue
+            rows.append(row)
+        return rows
@@ -1,9 +1,107 @@
+import math
 import datetime
+import threading
+import collections.abc
 from store import RentalStore
-from products import Product, Laptop, Phone
+from expiry import ExpiryIndex
+from errors import ProductNotFoundError, ProductUnavailableError, ProductNotBuyableError
+from products import Product, Laptop, Phone, _kind_name
 
 NoneType = type(None)
 
+
+class BatchResult():
+    """
+    Outcome of one entry of Customer.rent_many() or Customer.buy_many().
+    
+    Attributes:
+        name (str): Requested item name.
+        item (Product): The rented or bought unit. None if the entry failed or was
+            rolled back because another entry of an all-or-nothing batch failed.
+        error (Exception): Why the entry failed, None otherwise.
+        
+    """
+    
+    __slots__ = ('name', 'item', 'error')
+    
+    def __init__(self, name, item=None, error=None):
+        self.name = name
+        self.item = item
+        self.error = error
+        
+    def __repr__(self):
+        return 'BatchResult({!r}, item={!r}, error={!r})'.format(self.name, self.item, self.error)
+        
+    @property
+    def ok(self):
+        """bool: Whether the entry was applied."""
+        return self.item is not None
+
+
+RentalRecord = collections.namedtuple('RentalRecord', 'product_id name kind start weeks price paid')
+RentalRecord.__doc__ = """
+Compact record of a rental in a customer's history.
+
+Attributes:
+    product_id (int): Compact ID of the unit, see Product._id.
+    name (str): Product name.
+    kind (str): Product type, 'Laptop', 'Phone' or 'Product'.
+    start (int): Ordinal of the first rental day.
+    weeks (int): Rental time in weeks.
+    price (float): Price per week the rental is billed at.
+    paid (bool): Whether the rental is paid.
+"""
+
+
+def _record(item, paid):
+    return RentalRecord(item._id, item.name, _kind_name(item), item.rental_start.toordinal(),
+                        item.rental_time, item.price_per_week, paid)
+
+
+class ItemsView(collections.abc.Sequence):
+    """
+    Read-only list of rented units that materializes each unit only when it is accessed.
+    
+    The view holds the compact IDs of the units at the time it was created, so it
+    does not change when the customer's rentals do, like the lists it replaces.
+    
+    Args:
+        keys (tuple): Product._id of the units, in order.
+        resolve (callable): Returns the Product for an _id.
+        
+    """
+    
+    __slots__ = ('_keys', '_resolve')
+    
+    def __init__(self, keys, resolve):
+        self._keys = keys
+        self._resolve = resolve
+        
+    def __len__(self):
+        return len(self._keys)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._resolve(key) for key in self._keys[index]]
+        return self._resolve(self._keys[index])
+    
+    def __iter__(self):
+        for key in self._keys:
+            yield self._resolve(key)
+            
+    def __contains__(self, item):
+        key = getattr(item, '_id', None)
+        return key in self._keys and self._resolve(key) is item
+    
+    def __eq__(self, other):
+        if isinstance(other, (list, tuple, ItemsView)):
+            return list(self) == list(other)
+        return NotImplemented
+    
+    def __repr__(self):
+        return repr(list(self))
+
+
 class Customer():
     """
     Serves as the main interface of the rental system. Stores information about customers 
@@ -22,9 +120,14 @@ class Customer():
         invoice (float):  Outstanding amount to pay by customer for due items.
         current_items (list): Currently rented items.
         owned_items (list): Items bought from store.
+        reservations (list): Reservations not picked up or cancelled yet.
         due_items (list): Rented, unpaid items after their rental period has ended.
-        paid_items (list): Rented, paid items after their rental period has ended.
+        paid_items (list): Rented, paid items that have not been returned yet.
+        returned_rentals (list): RentalRecords of the rentals checked in with return_item().
         invoice (float): Outstanding amount to pay by customer for rented items. Defaults to 0.0.
+        
+    current_items, due_items and paid_items are ItemsViews. Settled and returned
+    rentals are kept as RentalRecords, see iter_rentals().
 
     """
 
@@ -39,9 +142,25 @@ class Customer():
             assert isinstance(item, Product), 'Can only rent Product Objects'
         self.name = name
         self.store = store
-        self._rented_items = []
-        self._paid = {}
         self._owned_items = [] # for purchased items
+        # unpaid rentals split by state; _sweep() moves ended rentals from current to due
+        self._current = {}
+        self._due = {}
+        self._expiry = ExpiryIndex()
+        # running invoice total, the sum of _due_amounts and _returned_due
+        self._due_amounts = {}
+        self._balance = 0
+        # paid or returned rentals as RentalRecords in the order they were settled;
+        # paid units not returned yet as (position in _history, unit) by _id, kept so
+        # they can be returned even after they left the store, and unpaid returned
+        # rentals' amounts by position in _history
+        self._history = []
+        self._paid_held = {}
+        self._returned_due = {}
+        self._reservations = []
+        # guards the state above; never held while taking a product lock
+        self._lock = threading.RLock()
+        store._add_customer(self)
     
     def __repr__(self):
         return 'Customer: {}, {} items rented.'.format(self.name, len(self.current_items))
@@ -61,28 +180,109 @@ class Customer():
     @property
     def invoice(self):
         """float: Outstanding amount to pay by customer for due items."""
-        return sum([item.rental_time * item.price_per_week for item in self.due_items])
+        self._sweep()
+        return self._balance
     
     @property
     def current_items(self):
-        return [item for item in self._rented_items if item.rental_end > datetime.date.today()]
+        with self._lock:
+            self._sweep()
+            return ItemsView(tuple(self._current), self._resolver(self._current))
     
     @property
     def due_items(self):
-        return [item for item in self._rented_items
-                if item.rental_end <= datetime.date.today()
-                and not self._paid[item.product_id]]
+        with self._lock:
+            self._sweep()
+            return ItemsView(tuple(self._due), self._resolver(self._due))
     
     @property
     def paid_items(self):
-        return [item for item in self._rented_items
-                if item.rental_end <= datetime.date.today()
-                and self._paid[item.product_id]]
+        with self._lock:
+            return ItemsView(tuple(self._paid_held), self._resolver(
+                {key: item for key, (_, item) in self._paid_held.items()}))
+    
+    @property
+    def returned_rentals(self):
+        with self._lock:
+            held = {position for position, _ in self._paid_held.values()}
+            return [record for position, record in enumerate(self._history) if position not in held]
+        
+    def _resolver(self, items):
+        """Look units up in items first, then in the store."""
+        def resolve(key):
+            item = items.get(key)
+            return item if item is not None else self.store._lookup(key)
+        return resolve
+    
+    def iter_rentals(self, paid=None, offset=0, limit=None):
+        """
+        Stream the rental history as RentalRecords, without materializing products.
+        
+        Settled and returned rentals come first in the order they were settled,
+        followed by the open rentals.
+        
+        Args:
+            paid (bool, optional): Filter on the paid flag.
+            offset (int, optional): Number of matching records to skip. Defaults to 0.
+            limit (int, optional): Maximum number of records to yield. Defaults to all.
+            
+        Yields:
+            RentalRecord: Matching rentals.
+        """
+        def records():
+            # _history only grows or has records replaced, so it can be walked while it changes
+            position = 0
+            while position < len(self._history):
+                yield self._history[position]
+                position += 1
+            with self._lock:
+                self._sweep()
+                open_items = list(self._due.values()) + list(self._current.values())
+            for item in open_items:
+                yield _record(item, False)
+                
+        for record in records():
+            if paid is not None and record.paid != paid:
+                continue
+            if offset:
+                offset -= 1
+                continue
+            if limit is not None:
+                if limit <= 0:
+                    return
+                limit -= 1
+            yield record
+            
+    def rental_pages(self, page_size=20, paid=None):
+        """
+        Stream the rental history page by page.
+        
+        Args:
+            page_size (int, optional): Records per page. Defaults to 20.
+            paid (bool, optional): Filter on the paid flag.
+            
+        Yields:
+            list: Pages of at most page_size RentalRecords.
+        """
+        assert isinstance(page_size, int) and page_size > 0, 'page_size must be a positive int'
+        page = []
+        for record in self.iter_rentals(paid):
+            page.append(record)
+            if len(page) == page_size:
+                yield page
+                page = []
+        if page:
+            yield page
     
     @property
     def owned_items(self):
         return self._owned_items
     
+    @property
+    def reservations(self):
+        with self._lock:
+            return list(self._reservations)
+    
     def pay_invoice(self, amount_paid):
         """Pay invoice and reset it to 0.0. Removes payed for items from current_items.
         
@@ -93,11 +293,71 @@ class Customer():
 
         assert isinstance(amount_paid, (int, float)), 'amount_paid must be int or float'
         assert amount_paid > 0, 'amount_paid must be positive'
-        assert self.invoice == amount_paid, 'Whole bill must be paid, no partial payments possible'
-
-        # delete old items
-        for item in self.due_items:
-            self._paid[item.product_id] = True
+        with self._lock:
+            assert self.invoice == amount_paid, 'Whole bill must be paid, no partial payments possible'
+            self.store._log('pay', customer=self.name, ids=[format(key, 'x') for key in self._due])
+            self._settle(list(self._due))
+            
+    def _settle(self, keys):
+        """Mark the due rentals with the given _id and all unpaid returned rentals as paid."""
+        with self._lock:
+            for key in keys:
+                item = self._due.pop(key, None) or self._current.pop(key, None)
+                if item is None:
+                    continue
+                if key in self._due_amounts:
+                    amount = self._remove_due_amount(item)
+                else:
+                    amount = item.rental_time * item.price_per_week
+                self.store._rental_paid(_kind_name(item), amount)
+                self._paid_held[key] = (len(self._history), item)
+                self._history.append(_record(item, True))
+            for position, amount in self._returned_due.items():
+                record = self._history[position]
+                self._history[position] = record._replace(paid=True)
+                self._balance -= amount
+                self.store._receivable_changed(-amount, -1)
+                self.store._rental_paid(record.kind, amount)
+            self._returned_due = {}
+            if not self._due_amounts:
+                self._balance = 0  # no rounding residue once nothing is due
+            
+    def return_item(self, item):
+        """
+        Check a rented unit back in, making it available for the next rental.
+        
+        The rental is kept as a RentalRecord, see returned_rentals. An unpaid rental
+        stays on the invoice with the full booked rental time, also when it is
+        returned early.
+        
+        Args:
+            item (Product): Unit rented by this customer.
+        """
+        with item._lock:
+            with self._lock:
+                self._sweep()
+                assert item._id in self._paid_held or item._id in self._due or item._id in self._current, \
+                    '{} is not rented by {}'.format(item.name, self.name)
+                self.store._log('return', customer=self.name, id=format(item._id, 'x'))
+                self._archive_rental(item)
+            item._release()
+            
+    def _archive_rental(self, item):
+        """Drop the unit of a returned rental, keeping only its RentalRecord in _history."""
+        with self._lock:
+            if self._paid_held.pop(item._id, None) is not None:
+                return
+            amount = item.rental_time * item.price_per_week
+            if item._id in self._due:
+                del self._due[item._id]
+                # still due, now as a returned rental
+                amount = self._due_amounts.pop(item._id)
+            else:
+                del self._current[item._id]
+                self._balance += amount
+                self.store._receivable_changed(amount, 1)
+            self._returned_due[len(self._history)] = amount
+            self._history.append(_record(item, False))
             
     def rent(self, item_name, rental_time):
         """Rent item for specific amount of time.
@@ -105,28 +365,33 @@ class Customer():
         Args:
             item_name (str): Item name as given by Product.__repr__().
             rental_time (int): Rental time in weeks.
+            
+        Returns:
+            Product: The rented unit, or None if no unit was available.
         
         Raises:
-            AssertionError: If item_name not in self.store.products.
+            ProductNotFoundError: If item_name not in self.store.products
+                (an AssertionError).
+            ProductUnavailableError: If no unit is available and the store is quiet.
 
         """
 
         #check if item in Store
-        assert item_name in [item.name for item in self.store.products], 'item must be in store'
-        #check if item available
-        rental_item = [item for item in self.store.products
-                      if item.name == item_name][0]
+        if not self.store.count(item_name):
+            raise ProductNotFoundError(item_name)
+        #rent any free unit with that name, set rental time and start rental today
+        rental_item = self.store.rent_available(item_name, rental_time)
         
-        # if item available in store, set rental time and start rental today
-        if rental_item.rent(rental_time):
-            self._rented_items.append(rental_item)
-            self._paid[rental_item.product_id] = False
+        if rental_item is not None:
+            self._hold([rental_item])
+            return rental_item
             
+        if self.store.quiet:
+            raise ProductUnavailableError(item_name)
         # if not available, display message and all store items
-        else:
-            print('Sorry, {} is currently not available'.format(item_name))
-            print('Here is a list of products and their availability:')
-            self.store.display_products()
+        print('Sorry, {} is currently not available'.format(item_name))
+        print('Here is a list of products and their availability:')
+        self.store.display_products()
             
     def buy(self, item_name):
         """
@@ -134,28 +399,309 @@ class Customer():
 
         Args:
             item_name (str): Item name as given by Product.__repr__().
+            
+        Returns:
+            Product: The bought unit, or None if it could not be bought.
 
         Raises:
-            AssertionError: If item_name not in self.store.products or item is not buyable or available.
+            ProductNotFoundError: If item_name not in self.store.products
+                (an AssertionError).
+            ProductUnavailableError: If no unit is available and the store is quiet.
+            ProductNotBuyableError: If the item is not buyable and the store is quiet.
         """
         # Check if item is in the store
-        assert item_name in [item.name for item in self.store.products], 'Item must be in store'
-
-        # Extract the item from the store
-        item = next(item for item in self.store.products if item.name == item_name)
-
-        # Check if the item is available and buyable
-        if item.available and item.buyable:
-            # Remove item from the store
-            self.store.products.remove(item)
-            # Add item to customer's owned items
-            self._owned_items.append(item)
-        else:
-            # Print a message if the item is not available or buyable
-            if not item.available:
-                print(f'Sorry, {item_name} is currently not available for purchase.')
-            if not item.buyable:
-                print(f'Sorry, {item_name} is not buyable.')
-            # Display all items with their availability
-            print('Here is a list of products and their availability:')
-            self.store.display_products()
\ No newline at end of file
+        if not self.store.count(item_name):
+            raise ProductNotFoundError(item_name)
+
+        # Remove a free and buyable unit from the store
+        item = self.store.sell_available(item_name)
+
+        if item is not None:
+            self._own([item])
+            return item
+        
+        item = self.store.get_available(item_name)
+        if item is not None and item.buyable:
+            item = None  # the free units are reserved
+        if self.store.quiet:
+            if item is None:
+                raise ProductUnavailableError(item_name)
+            raise ProductNotBuyableError(item_name)
+        # Print a message if the item is not available or buyable
+        if item is None:
+            print(f'Sorry, {item_name} is currently not available for purchase.')
+            item = next(iter(self.store.get_by_name(item_name)), None)
+        if item is not None and not item.buyable:
+            print(f'Sorry, {item_name} is not buyable.')
+        # Display all items with their availability
+        print('Here is a list of products and their availability:')
+        self.store.display_products()
+            
+    def reserve(self, item_name, start, rental_time):
+        """
+        Reserve a unit for a rental starting on a future day.
+        
+        Args:
+            item_name (str): Item name as given by Product.__repr__().
+            start (datetime.date): First day of the rental, today or later.
+            rental_time (int): Rental time in weeks.
+            
+        Returns:
+            Reservation: The booking, to be passed to pick_up() once it starts, or
+            None if no unit is free for the whole period.
+            
+        Raises:
+            ProductNotFoundError: If item_name not in self.store.products
+                (an AssertionError).
+            ProductUnavailableError: If no unit is free and the store is quiet.
+        """
+        assert isinstance(start, datetime.date), 'start must be a date'
+        assert isinstance(rental_time, int), 'rental_time must be int'
+        assert rental_time > 0, 'rental_time must be positive'
+        assert start >= self.store.clock.today(), 'Reservations cannot start in the past'
+        if not self.store.count(item_name):
+            raise ProductNotFoundError(item_name)
+        reservation = self.store.reserve_available(item_name, start, rental_time, self)
+        if reservation is not None:
+            with self._lock:
+                self._reservations.append(reservation)
+            return reservation
+        
+        if self.store.quiet:
+            raise ProductUnavailableError(item_name)
+        slot = self.store.earliest_slot(item_name, rental_time, start)
+        print('Sorry, {} is not available from {} for {} weeks'.format(item_name, start, rental_time))
+        if slot is not None:
+            print('The earliest start is {}'.format(slot[0]))
+            
+    def pick_up(self, reservation):
+        """
+        Start the rental of a reservation, on or after its first day.
+        
+        The rental runs from the reserved start, so it ends as booked.
+        
+        Args:
+            reservation (Reservation): One of self.reservations.
+            
+        Returns:
+            Product: The rented unit, or None if it has not been returned yet.
+            
+        Raises:
+            ProductUnavailableError: If the unit has not been returned yet and the
+                store is quiet.
+        """
+        assert reservation in self.reservations, 'Not a reservation of this customer'
+        assert reservation.start <= self.store.clock.today(), 'The reservation starts on {}'.format(reservation.start)
+        item = reservation.item
+        with item._lock:
+            rented = item._store is self.store and item.available
+            if rented:
+                self.cancel_reservation(reservation)
+                rented = item._start_rental(reservation.start, reservation.rental_time)
+        if rented:
+            self._hold([item])
+            return item
+        
+        if self.store.quiet:
+            raise ProductUnavailableError(item.name)
+        print('Sorry, {} has not been returned yet'.format(item.name))
+        
+    def cancel_reservation(self, reservation):
+        """Cancel one of self.reservations, making the unit bookable again."""
+        with self._lock:
+            assert reservation in self._reservations, 'Not a reservation of this customer'
+            self._reservations.remove(reservation)
+        self.store._unbook(reservation)
+            
+    def rent_many(self, orders, atomic=True):
+        """
+        Rent several items in one call, e.g. for a corporate order.
+        
+        Each distinct name is looked up once and each entry claims one free unit, so
+        the cost grows with the size of the batch only. Failures never dump the
+        catalog; they are reported per entry.
+        
+        Args:
+            orders (list): (item_name, rental_time) tuples.
+            atomic (bool, optional): If True, all entries are rented or none: when
+                any entry fails, the units claimed so far are released again. If
+                False, every entry that can be rented is. Defaults to True.
+                
+        Returns:
+            list: A BatchResult per order, in order.
+        """
+        orders = list(orders)
+        for _, rental_time in orders:
+            assert isinstance(rental_time, int), 'rental_time must be int'
+            assert rental_time > 0, 'rental_time must be positive'
+        results = []
+        in_store = {}
+        for item_name, rental_time in orders:
+            result = BatchResult(item_name)
+            results.append(result)
+            if item_name not in in_store:
+                in_store[item_name] = bool(self.store.count(item_name))
+            if not in_store[item_name]:
+                result.error = ProductNotFoundError(item_name)
+                continue
+            try:
+                result.item = self.store.rent_available(item_name, rental_time)
+            except AssertionError as error:  # e.g. longer than Laptop.max_rental_time
+                result.error = error
+                continue
+            if result.item is None:
+                result.error = ProductUnavailableError(item_name)
+                
+        if atomic and any(result.error is not None for result in results):
+            for result in results:
+                if result.item is not None:
+                    result.item._release()
+                    result.item = None
+        self._hold([result.item for result in results if result.item is not None])
+        self._report_failures(results, 'rented')
+        return results
+    
+    def buy_many(self, item_names, atomic=True):
+        """
+        Buy several items in one call.
+        
+        Args:
+            item_names (list): Names of the items to buy, one entry per unit.
+            atomic (bool, optional): If True, all entries are bought or none: when
+                any entry fails, the units taken so far are put back into the store.
+                If False, every entry that can be bought is. Defaults to True.
+                
+        Returns:
+            list: A BatchResult per name, in order.
+        """
+        results = []
+        in_store = {}
+        for item_name in item_names:
+            result = BatchResult(item_name)
+            results.append(result)
+            if item_name not in in_store:
+                in_store[item_name] = bool(self.store.count(item_name))
+            if not in_store[item_name]:
+                result.error = ProductNotFoundError(item_name)
+                continue
+            result.item = self.store.sell_available(item_name)
+            if result.item is None:
+                item = self.store.get_available(item_name)
+                if item is None or item.buyable:
+                    result.error = ProductUnavailableError(item_name)
+                else:
+                    result.error = ProductNotBuyableError(item_name)
+                    
+        if atomic and any(result.error is not None for result in results):
+            sold = [result.item for result in results if result.item is not None]
+            self.store.extend(sold)
+            for result in results:
+                result.item = None
+        self._own([result.item for result in results if result.item is not None])
+        self._report_failures(results, 'bought')
+        return results
+    
+    def _hold(self, items):
+        """Register rented units as current rentals of this customer."""
+        for item in items:
+            self.store._log('hold', customer=self.name, id=format(item._id, 'x'))
+        with self._lock:
+            for item in items:
+                self._current[item._id] = item
+                self._expiry.push(item)
+                self.store._set_renter(item, self)
+                
+    def _own(self, items):
+        """Register bought units as owned by this customer."""
+        for item in items:
+            self.store._log('buy', customer=self.name, id=format(item._id, 'x'))
+        with self._lock:
+            self._owned_items.extend(items)
+            
+    def _report_failures(self, results, verb):
+        if self.store.quiet:
+            return
+        for result in results:
+            if result.error is not None:
+                print('Sorry, {} could not be {}: {}'.format(result.name, verb, result.error))
+            
+    def _sweep(self):
+        """Move rentals that ended up to today from current to due."""
+        with self._lock:
+            for item in self._expiry.pop_due(self.store.clock.today()):
+                if item._id in self._current:
+                    self._due[item._id] = self._current.pop(item._id)
+                    self._add_due_amount(item)
+                
+    def _rental_changed(self, item):
+        """Called by the store when the rental period or price of one of our items changes."""
+        with self._lock:
+            if item._id in self._due:
+                self._remove_due_amount(item)
+                if item.rental_end > self.store.clock.today():
+                    self._current[item._id] = self._due.pop(item._id)
+                else:
+                    self._add_due_amount(item)
+            if item._id in self._current:
+                self._expiry.push(item)
+            
+    def _add_due_amount(self, item):
+        amount = item.rental_time * item.price_per_week
+        self._due_amounts[item._id] = amount
+        self._balance += amount
+        self.store._receivable_changed(amount, 1)
+        
+    def _remove_due_amount(self, item):
+        amount = self._due_amounts.pop(item._id)
+        self._balance -= amount
+        if not self._due_amounts and not self._returned_due:
+            self._balance = 0  # no rounding residue once nothing is due
+        self.store._receivable_changed(-amount, -1)
+        return amount
+            
+    def check_invoice(self):
+        """
+        Recompute the invoice from scratch and compare it with the running total.
+        
+        Raises:
+            AssertionError: If the running total is out of sync with the due items.
+        """
+        expected = (sum([item.rental_time * item.price_per_week for item in self.due_items]) +
+                    sum(self._returned_due.values()))
+        assert math.isclose(self._balance, expected, abs_tol=1e-9), \
+            'Invoice out of sync: running total {} != {}'.format(self._balance, expected)
+        
+    def _restore(self, rented_items, owned_items, history=(), held=frozenset()):
+        """
+        Rebuild the rental state, e.g. from a snapshot.
+        
+        Unpaid rentals are registered as current; the next sweep moves the ended
+        ones to due and adds them to the invoice.
+        
+        Args:
+            rented_items (list): Rented products in rental order.
+            owned_items (list): Bought products.
+            history (list, optional): RentalRecords of settled and returned rentals.
+                Defaults to none.
+            held (set, optional): Positions in history of the paid rentals whose
+                units have not been returned yet. Defaults to none.
+        """
+        with self._lock:
+            for position, record in enumerate(history):
+                amount = record.weeks * record.price
+                if record.paid:
+                    self.store._rental_paid(record.kind, amount)
+                    item = self.store._lookup(record.product_id) if position in held else None
+                    if item is not None:
+                        self._paid_held[record.product_id] = (len(self._history), item)
+                else:
+                    self._returned_due[len(self._history)] = amount
+                    self._balance += amount
+                    self.store._receivable_changed(amount, 1)
+                self._history.append(record)
+            for item in rented_items:
+                self._current[item._id] = item
+                self._expiry.push(item)
+                if item._store is self.store:
+                    self.store._set_renter(item, self)
+            self._owned_items.extend(owned_items)
@@ -0,0 +1,30 @@
+class RentalError(Exception):
+    """Base class for failed store operations."""
+    
+    def __init__(self, item_name, message):
+        super().__init__(message)
+        self.item_name = item_name
+        
+
+class ProductNotFoundError(RentalError, AssertionError):
+    """No product with the requested name is part of the store.
+    
+    Also an AssertionError, which is what these failures raised before.
+    """
+    
+    def __init__(self, item_name):
+        super().__init__(item_name, '{} is not part of the store'.format(item_name))
+        
+        
+class ProductUnavailableError(RentalError):
+    """All units with the requested name are currently rented."""
+    
+    def __init__(self, item_name):
+        super().__init__(item_name, '{} is currently not available'.format(item_name))
+        
+        
+class ProductNotBuyableError(RentalError):
+    """The requested product can only be rented."""
+    
+    def __init__(self, item_name):
+        super().__init__(item_name, '{} is not buyable'.format(item_name))
@@ -0,0 +1,187 @@
+import os
+import json
+import datetime
+import threading
+
+from products import KINDS_BY_NAME
+from store import RentalStore
+from customer import Customer
+
+
+class EventLog():
+    """
+    Append-only write-ahead log of store changes with group commit.
+    
+    Every change (add, remove, rent, release, extend, price, hold, buy, pay,
+    reserve, cancel, return) is appended as one JSON line before it is applied.
+    Lines are buffered and written with a single fsync once batch_size events are
+    pending, or max_delay seconds after the first of them was buffered, so
+    durability costs one disk flush per batch instead of one per operation and a
+    quiet store does not keep events in memory indefinitely. Events still in the
+    buffer are lost on a crash; call sync() where an operation must be durable
+    before continuing.
+    
+    Args:
+        path (str): Log file, appended to if it exists.
+        batch_size (int, optional): Events per fsync. Defaults to 64.
+        max_delay (float, optional): Seconds a partly filled batch may wait before
+            it is committed anyway, None to wait for a full batch or sync().
+            Defaults to 0.05.
+        
+    """
+    
+    def __init__(self, path, batch_size=64, max_delay=0.05):
+        assert isinstance(batch_size, int) and batch_size > 0, 'batch_size must be a positive int'
+        assert max_delay is None or max_delay >= 0, 'max_delay must be None or non-negative'
+        self.path = path
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self._file = open(path, 'ab')
+        self._pending = []
+        self._timer = None
+        self._lock = threading.Lock()
+        
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+        
+    def attach(self, store):
+        """
+        Log all changes of store from now on.
+        
+        The current catalog, including rental state, is written first as 'add'
+        events, so that replay() can rebuild the store from the log alone.
+        
+        Args:
+            store (RentalStore): Store to log.
+        """
+        with store._catalog_lock:
+            store.event_log = self
+            for item in store.products:
+                store._log_product('add', item)
+        self.sync()
+        
+    def append(self, op, fields):
+        """Buffer one event, committing the batch when it is full or has waited max_delay."""
+        line = json.dumps(dict(fields, op=op), separators=(',', ':')).encode('utf-8') + b'\n'
+        with self._lock:
+            self._pending.append(line)
+            if len(self._pending) >= self.batch_size:
+                self._commit()
+            elif self._timer is None and self.max_delay is not None:
+                self._timer = threading.Timer(self.max_delay, self.sync)
+                self._timer.daemon = True
+                self._timer.start()
+                
+    def sync(self):
+        """Write and fsync all buffered events."""
+        with self._lock:
+            self._commit()
+            
+    def close(self):
+        self.sync()
+        self._file.close()
+        
+    def _commit(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        self._file.write(b''.join(self._pending))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = []
+
+
+def replay(path, store_class=RentalStore, quiet=True, clock=None):
+    """
+    Rebuild a store and its customers from an event log.
+    
+    Args:
+        path (str): Log file written by EventLog.
+        store_class (type, optional): RentalStore class to create. Defaults to RentalStore.
+        quiet (bool, optional): Passed to the store. Defaults to True.
+        clock (optional): Clock passed to the store, e.g. the SimulatedClock the log
+            was written with. Defaults to the system clock.
+        
+    Returns:
+        tuple: (store, list of Customer in order of their first event)
+    """
+    store = store_class(quiet=quiet, clock=clock)
+    products = {}
+    customers = {}
+    
+    def customer(name):
+        if name not in customers:
+            customers[name] = Customer(name, store)
+        return customers[name]
+    
+    with open(path, 'rb') as file:
+        for line in file:
+            if not line.strip():
+                continue
+            event = json.loads(line)
+            op = event['op']
+            key = int(event['id'], 16) if 'id' in event else None
+            if op == 'add':
+                item = KINDS_BY_NAME[event['kind']]._from_row(event['name'], event['price'], event['buyable'], key)
+                if event['start'] is not None:
+                    item._start = datetime.date.fromordinal(event['start'])
+                    item._weeks = event['weeks']
+                store.extend([item])
+                # a columnar store keeps its own view of the product
+                products[key] = store._lookup(key)
+            elif op == 'remove':
+                store.discard(products[key])
+            elif op == 'rent':
+                item = products[key]
+                start = datetime.date.fromordinal(event['start'])
+                if item._store is not None:
+                    # a SQLiteRentalStore writes the rental when it is claimed
+                    item._store._claim_rental(item, start, event['weeks'])
+                item._weeks = event['weeks']
+                item._start = start
+                if item._store is not None:
+                    item._store._product_rented(item)
+            elif op == 'release':
+                products[key]._release()
+            elif op == 'extend':
+                products[key]._rental_time = event['weeks']
+            elif op == 'price':
+                item = products[key]
+                item._price_per_week = event['price']
+                item._rental_changed()
+            elif op == 'buyable':
+                item = products[key]
+                item._buyable = event['buyable']
+                item._rental_changed()
+            elif op == 'hold':
+                customer(event['customer'])._restore([products[key]], [])
+            elif op == 'buy':
+                customer(event['customer'])._restore([], [products[key]])
+            elif op == 'pay':
+                paying = customer(event['customer'])
+                paying._sweep()
+                paying._settle([int(key, 16) for key in event['ids']])
+            elif op == 'return':
+                customer(event['customer'])._archive_rental(products[key])
+            elif op == 'reserve':
+                holder = customer(event['customer']) if event['customer'] is not None else None
+                reservation = store._book(products[key], datetime.date.fromordinal(event['start']),
+                                          event['weeks'], holder)
+                if holder is not None:
+                    holder._reservations.append(reservation)
+            elif op == 'cancel':
+                start = datetime.date.fromordinal(event['start'])
+                for reservation in store.reservations(products[key]):
+                    if reservation.start != start:
+                        continue
+                    if reservation.customer is not None:
+                        reservation.customer.cancel_reservation(reservation)
+                    else:
+                        store._unbook(reservation)
+    store._take_changes()
+    return store, list(customers.values())
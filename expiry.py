@@ -0,0 +1,57 @@
+import heapq
+import itertools
+import threading
+
+
+class ExpiryIndex():
+    """
+    Min-heap of rented products ordered by the day their rental ends.
+    
+    Entries are keyed by rental_end.toordinal() at the time they are pushed. When a
+    rental period changes the product is simply pushed again; the outdated entry is
+    recognised as stale when it reaches the top and skipped.
+    
+    The index is thread-safe; its lock is never held while calling other code.
+    
+    """
+    
+    def __init__(self):
+        self._heap = []
+        self._counter = itertools.count()  # tie-breaker, products are not orderable
+        self._lock = threading.Lock()
+        
+    def __len__(self):
+        """Return the number of entries, including stale ones."""
+        return len(self._heap)
+    
+    def push(self, item):
+        """Schedule item for its current rental_end."""
+        entry = (item.rental_end.toordinal(), next(self._counter), item)
+        with self._lock:
+            heapq.heappush(self._heap, entry)
+        
+    def next_end(self):
+        """int: ordinal of the earliest scheduled rental end, or None if empty."""
+        return self._heap[0][0] if self._heap else None
+        
+    def pop_due(self, today):
+        """
+        Remove and return all products whose rental ended on or before today.
+        
+        Args:
+            today (datetime.date): Day up to which rentals are swept.
+            
+        Returns:
+            list: Products in order of their rental end.
+        """
+        heap = self._heap
+        today = today.toordinal()
+        due = []
+        with self._lock:
+            while heap and heap[0][0] <= today:
+                end, _, item = heapq.heappop(heap)
+                rental_end = item.rental_end
+                # skip entries whose rental period has changed since they were pushed
+                if rental_end is not None and rental_end.toordinal() == end:
+                    due.append(item)
+        return due
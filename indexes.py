@@ -0,0 +1,305 @@
+import math
+import heapq
+import bisect
+import threading
+import itertools
+
+from products import KINDS_BY_NAME, _kind_name
+
+# sorts rental-only products without a price after all priced ones
+NO_PRICE = math.inf
+
+# a bucket this large is re-sorted once instead of inserting entries one by one
+BULK_INSERT = 64
+# entries copied out of a bucket at a time while a query walks it
+CHUNK = 256
+
+
+def _price_key(item):
+    price = item.price_per_week
+    return NO_PRICE if price is None else price
+
+
+class CatalogIndex():
+    """
+    Secondary indexes over a store's catalog for faceted, price-sorted queries.
+
+    Every product gets a slot number. The type and buyable facets split the catalog
+    into buckets, each holding a list of (price, slot) entries sorted by price, and
+    availability is a bitmap with one byte per slot. A query bisects the price range
+    in the matching buckets, merges them in price order and skips the rented units
+    with a bitmap lookup, so it touches only the entries in the price range of the
+    requested facets instead of the whole catalog.
+
+    The store keeps the index current on add, remove, rent, return and price
+    changes. All methods are thread-safe.
+
+    Args:
+        products (list, optional): Initial products. Defaults to none.
+
+    """
+
+    def __init__(self, products=()):
+        self._lock = threading.Lock()
+        self._items = []  # product by slot, None for free slots
+        self._slots = {}  # slot by Product._id
+        self._free_slots = []
+        self._keys = []  # (bucket, price) the slot is indexed under
+        self._available = bytearray()
+        self._buckets = {}  # {(kind name, buyable): sorted [(price, slot), ...]}
+        # entries of added products, merged into their buckets by the next query
+        self._pending = {}
+        for item in products:
+            self.add(item)
+
+    def __len__(self):
+        return len(self._slots)
+
+    def add(self, item):
+        """Index a new product; cheap, the price index is sorted lazily."""
+        with self._lock:
+            entry = self._assign(item)
+            self._pending.setdefault(self._keys[entry[1]][0], []).append(entry)
+
+    def _flush(self):
+        """Merge the pending entries into their buckets; call with the lock held."""
+        for bucket, entries in self._pending.items():
+            index = self._buckets.setdefault(bucket, [])
+            if len(entries) >= BULK_INSERT:
+                index.extend(entries)
+                index.sort()
+            else:
+                for entry in entries:
+                    bisect.insort(index, entry)
+        self._pending = {}
+
+    def remove(self, item):
+        """Remove a product from the index, e.g. when it is sold."""
+        with self._lock:
+            self._flush()
+            slot = self._slots.pop(item._id, None)
+            if slot is None:
+                return
+            self._unlink(slot)
+            self._items[slot] = None
+            self._keys[slot] = None
+            self._available[slot] = 0
+            self._free_slots.append(slot)
+
+    def update(self, item):
+        """Refresh availability, price and buyable bucket of a product after it changed."""
+        with self._lock:
+            slot = self._slots.get(item._id)
+            if slot is None:
+                return
+            self._available[slot] = item.available
+            key = ((_kind_name(item), bool(item.buyable)), _price_key(item))
+            if key != self._keys[slot]:
+                self._flush()
+                self._unlink(slot)
+                self._keys[slot] = key
+                bisect.insort(self._buckets.setdefault(key[0], []), (key[1], slot))
+
+    def query(self, kind=None, available=None, buyable=None, min_price=None, max_price=None,
+              descending=False):
+        """
+        Yield the matching products in price order, see RentalStore.query().
+
+        Buckets are walked lazily, CHUNK entries at a time, so a page costs about
+        as much as the entries it skips and returns. Entries that became outdated
+        while walking are skipped.
+        """
+        low = (-math.inf if min_price is None else min_price, -1)
+        high = (math.inf if max_price is None else max_price, math.inf)
+        walks = []
+        with self._lock:
+            self._flush()
+            for bucket, index in self._buckets.items():
+                kind_name, is_buyable = bucket
+                if kind is not None and not issubclass(KINDS_BY_NAME[kind_name], kind):
+                    continue
+                if buyable is not None and is_buyable != bool(buyable):
+                    continue
+                walks.append(self._walk(bucket, index, low, high, descending))
+        merged = heapq.merge(*walks, reverse=True) if descending else heapq.merge(*walks)
+        items = self._items
+        keys = self._keys
+        flags = self._available
+        for price, slot, bucket in merged:
+            item = items[slot]
+            # the slot may have been freed, reused, repriced or moved to another bucket
+            # since the ranges were taken
+            if item is None or keys[slot] != (bucket, price):
+                continue
+            if available is not None and bool(flags[slot]) != bool(available):
+                continue
+            yield item
+
+    def _walk(self, bucket, index, low, high, descending):
+        """Yield (price, slot, bucket) entries between low and high, resuming after the last one."""
+        last = None
+        while True:
+            with self._lock:
+                if descending:
+                    end = bisect.bisect_right(index, high) if last is None else bisect.bisect_left(index, last)
+                    start = max(bisect.bisect_left(index, low), end - CHUNK)
+                    chunk = index[start:end][::-1]
+                else:
+                    start = bisect.bisect_left(index, low) if last is None else bisect.bisect_right(index, last)
+                    end = min(bisect.bisect_right(index, high), start + CHUNK)
+                    chunk = index[start:end]
+            if not chunk:
+                return
+            for price, slot in chunk:
+                yield price, slot, bucket
+            last = chunk[-1]
+
+    def _assign(self, item):
+        if self._free_slots:
+            slot = self._free_slots.pop()
+            self._items[slot] = item
+            self._available[slot] = item.available
+        else:
+            slot = len(self._items)
+            self._items.append(item)
+            self._keys.append(None)
+            self._available.append(item.available)
+        self._slots[item._id] = slot
+        self._keys[slot] = ((_kind_name(item), bool(item.buyable)), _price_key(item))
+        return (_price_key(item), slot)
+
+    def _unlink(self, slot):
+        bucket, price = self._keys[slot]
+        index = self._buckets[bucket]
+        position = bisect.bisect_left(index, (price, slot))
+        del index[position]
+
+
+def paginate(items, offset=0, limit=None):
+    """Return items[offset:offset + limit] of an iterator as a list."""
+    assert isinstance(offset, int) and offset >= 0, 'offset must be a non-negative int'
+    assert limit is None or (isinstance(limit, int) and limit >= 0), 'limit must be a non-negative int'
+    return list(itertools.islice(items, offset, None if limit is None else offset + limit))
+
+
+class NameIndex():
+    """
+    Case-insensitive index of product names for type-ahead and fuzzy search.
+
+    The index is a trie laid out as a sorted list of casefolded names: all names
+    below a trie node form a contiguous range of the list, and the children of a
+    node are found by bisecting that range. This answers prefix lookups in
+    O(log n + results) and lets the bounded edit-distance search walk the trie
+    without allocating a node object per character, which keeps a million names
+    in a few tens of megabytes. Adding or removing a name is one insertion into
+    or deletion from the list. All methods are thread-safe.
+
+    Args:
+        names (iterable, optional): Initial names. Defaults to none.
+
+    """
+
+    def __init__(self, names=()):
+        self._lock = threading.Lock()
+        self._names = {}  # casefolded key -> set of names as spelled in the catalog
+        for name in names:
+            self._names.setdefault(name.casefold(), set()).add(name)
+        self._keys = sorted(self._names)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, name):
+        """Add a name, e.g. when the first unit with that name is added to the store."""
+        key = name.casefold()
+        with self._lock:
+            spellings = self._names.get(key)
+            if spellings is None:
+                self._names[key] = {name}
+                bisect.insort(self._keys, key)
+            else:
+                spellings.add(name)
+
+    def remove(self, name):
+        """Remove a name, e.g. when the last unit with that name is sold."""
+        key = name.casefold()
+        with self._lock:
+            spellings = self._names.get(key)
+            if spellings is None:
+                return
+            spellings.discard(name)
+            if not spellings:
+                del self._names[key]
+                del self._keys[bisect.bisect_left(self._keys, key)]
+
+    def prefix(self, prefix, limit=None):
+        """
+        Return the names starting with prefix, ignoring case, in alphabetical order.
+
+        Args:
+            prefix (str): Typed prefix.
+            limit (int, optional): Maximum number of names. Defaults to all.
+
+        Returns:
+            list: Matching names.
+        """
+        prefix = prefix.casefold()
+        out = []
+        with self._lock:
+            keys = self._keys
+            position = bisect.bisect_left(keys, prefix)
+            while position < len(keys) and keys[position].startswith(prefix):
+                out.extend(sorted(self._names[keys[position]]))
+                if limit is not None and len(out) >= limit:
+                    return out[:limit]
+                position += 1
+        return out
+
+    def similar(self, name, max_distance=2, limit=None):
+        """
+        Return names within an edit distance of name, ignoring case.
+
+        The trie is walked depth first while computing one row of the Levenshtein
+        matrix per character; a branch is abandoned as soon as every entry of its row
+        exceeds max_distance, so only prefixes that can still match are visited.
+
+        Args:
+            name (str): Possibly misspelled name.
+            max_distance (int, optional): Largest number of inserted, deleted or
+                replaced characters. Defaults to 2.
+            limit (int, optional): Maximum number of names. Defaults to all.
+
+        Returns:
+            list: (name, distance) tuples, closest first, then alphabetically.
+        """
+        assert isinstance(max_distance, int) and max_distance >= 0, 'max_distance must be a non-negative int'
+        target = name.casefold()
+        found = []
+        with self._lock:
+            keys = self._keys
+            if not keys:
+                return []
+            self._descend(keys, target, 0, len(keys), 0, list(range(len(target) + 1)), max_distance, found)
+            found = [(spelling, distance) for distance, key in sorted(found)
+                     for spelling in sorted(self._names[key])]
+        return found if limit is None else found[:limit]
+
+    def _descend(self, keys, target, low, high, depth, row, max_distance, found):
+        """Visit the trie node of the keys in [low, high), which share their first depth characters."""
+        if len(keys[low]) == depth:
+            # the node's own prefix is a name
+            if row[-1] <= max_distance:
+                found.append((row[-1], keys[low]))
+            low += 1
+        while low < high:
+            prefix = keys[low][:depth + 1]
+            end = bisect.bisect_left(keys, prefix[:-1] + chr(ord(prefix[-1]) + 1), low, high)
+            character = prefix[-1]
+            next_row = [row[0] + 1]
+            for column in range(1, len(target) + 1):
+                next_row.append(min(next_row[column - 1] + 1,
+                                    row[column] + 1,
+                                    row[column - 1] + (target[column - 1] != character)))
+            if min(next_row) <= max_distance:
+                self._descend(keys, target, low, end, depth + 1, next_row, max_distance, found)
+            low = end
@@ -0,0 +1,167 @@
+import csv
+import json
+import time
+import itertools
+
+from products import Product, Laptop, Phone
+
+
+TYPES = {'product': Product, 'laptop': Laptop, 'phone': Phone}
+_TRUE = {'true', '1', 'yes', 'y'}
+_FALSE = {'false', '0', 'no', 'n'}
+
+
+def read_csv(file):
+    """
+    Stream records from a CSV file with a header row.
+    
+    Expected columns are type, name, price_per_week and optionally buyable.
+    
+    Args:
+        file (file): Open text file.
+        
+    Yields:
+        dict: One record per data row.
+    """
+    yield from csv.DictReader(file)
+    
+    
+def read_jsonl(file):
+    """
+    Stream records from a JSON Lines file, one JSON object per line.
+    
+    Args:
+        file (file): Open text file.
+        
+    Yields:
+        dict: One record per non-empty line.
+    """
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+            
+            
+def _parse_price(value):
+    if value is None or value == '':
+        return 0
+    if isinstance(value, str):
+        value = value.strip()
+        try:
+            return int(value)
+        except ValueError:
+            return float(value)
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(value)
+    return value
+
+
+def _parse_bool(value, default):
+    if value is None or value == '':
+        return default
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in _TRUE:
+        return True
+    if text in _FALSE:
+        return False
+    raise ValueError(value)
+
+
+def validate_batch(records, first_row=1):
+    """
+    Validate a batch of records and convert them to rows for RentalStore.extend_rows().
+    
+    Args:
+        records (list): Records as yielded by read_csv() or read_jsonl().
+        first_row (int, optional): Row number of the first record, used in error messages.
+            Defaults to 1.
+            
+    Returns:
+        list: (cls, name, price_per_week, buyable) tuples.
+        
+    Raises:
+        AssertionError: If any record of the batch is invalid, listing all invalid rows.
+    """
+    rows = []
+    errors = []
+    for number, record in enumerate(records, first_row):
+        if not isinstance(record, dict):
+            errors.append('row {}: record must be a mapping'.format(number))
+            continue
+        cls = TYPES.get(str(record.get('type', '')).strip().lower())
+        if cls is None:
+            errors.append('row {}: type must be one of {}'.format(number, ', '.join(TYPES)))
+            continue
+        name = record.get('name')
+        if not isinstance(name, str) or not name:
+            errors.append('row {}: name must be a non-empty string'.format(number))
+            continue
+        try:
+            price_per_week = _parse_price(record.get('price_per_week'))
+        except ValueError:
+            errors.append('row {}: price_per_week must be int or float'.format(number))
+            continue
+        try:
+            buyable = _parse_bool(record.get('buyable'), default=cls is Phone)
+        except ValueError:
+            errors.append('row {}: buyable must be a boolean'.format(number))
+            continue
+        rows.append((cls, name, price_per_week, buyable))
+    assert not errors, 'Invalid catalog rows:\n' + '\n'.join(errors)
+    return rows
+
+
+def load_catalog(source, store, fmt=None, batch_size=10_000):
+    """
+    Load a CSV or JSON Lines catalog into a store.
+    
+    Records are streamed and validated batch by batch. Nothing is added unless the
+    whole file is valid; all products are then inserted with a single
+    RentalStore.extend_rows() call and one summary line is printed, unless the
+    store is quiet.
+    
+    Args:
+        source (str or file): Path or open text file.
+        store (RentalStore): Store to add the products to.
+        fmt (str, optional): 'csv' or 'jsonl'. Guessed from the file name if None.
+        batch_size (int, optional): Number of records validated at once. Defaults to 10000.
+        
+    Returns:
+        int: Number of products added.
+    """
+    assert isinstance(batch_size, int) and batch_size > 0, 'batch_size must be a positive int'
+    if fmt is None:
+        name = source if isinstance(source, str) else getattr(source, 'name', '')
+        fmt = 'csv' if str(name).lower().endswith('.csv') else 'jsonl'
+    assert fmt in ('csv', 'jsonl'), "fmt must be 'csv' or 'jsonl'"
+    reader = read_csv if fmt == 'csv' else read_jsonl
+    
+    start = time.perf_counter()
+    if isinstance(source, str):
+        with open(source, newline='', encoding='utf-8') as file:
+            rows = _validate_all(reader(file), batch_size)
+    else:
+        rows = _validate_all(reader(source), batch_size)
+    store.extend_rows(rows)
+    if store.quiet:
+        return len(rows)
+    
+    counts = {}
+    for cls, *_ in rows:
+        counts[cls.__name__] = counts.get(cls.__name__, 0) + 1
+    details = ', '.join('{} {}'.format(count, kind) for kind, count in counts.items())
+    print('{} products are added to the store ({}) in {:.2f}s'.format(
+        len(rows), details or 'none', time.perf_counter() - start))
+    return len(rows)
+
+
+def _validate_all(records, batch_size):
+    rows = []
+    first_row = 1
+    while True:
+        batch = list(itertools.islice(records, batch_size))
+        if not batch:
+            return rows
+        rows.extend(validate_batch(batch, first_row))
+        first_row += len(batch)
@@ -0,0 +1,229 @@
+import time
+import functools
+import threading
+import statistics
+import collections
+
+from store import RentalStore
+from customer import Customer
+
+# operations that are timed, by class; subclasses overriding one are timed as well
+CUSTOMER_METHODS = ('rent', 'buy', 'pay_invoice', 'rent_many', 'buy_many', 'return_item')
+CUSTOMER_PROPERTIES = ('invoice', 'current_items', 'due_items', 'paid_items', 'owned_items')
+STORE_METHODS = ('__add__', '__sub__')
+# catalog accesses that are counted as scanned entries while an operation runs
+STORE_SCANS = ('iter_products', 'get_available')
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+_scans = threading.local()
+_patched = []  # (cls, name, original attribute) while enabled
+_enabled = None
+
+
+class Metrics():
+    """
+    Call counts, latencies and catalog-scan lengths per operation.
+
+    Latency percentiles are computed from the last sample_size calls of each
+    operation; counts and sums cover all calls. The scan length of a call is the
+    number of catalog entries it visited through RentalStore.iter_products() and
+    get_available(), e.g. the whole catalog when a failed rental prints it.
+
+    Args:
+        sample_size (int, optional): Latencies kept per operation. Defaults to 10000.
+
+    """
+
+    def __init__(self, sample_size=10_000):
+        assert isinstance(sample_size, int) and sample_size > 0, 'sample_size must be a positive int'
+        self.sample_size = sample_size
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Forget all recorded calls."""
+        with self._lock:
+            self._calls = {}
+
+    def record(self, operation, seconds, scanned, failed=False):
+        """
+        Record one call.
+
+        Args:
+            operation (str): Operation name, e.g. 'Customer.rent'.
+            seconds (float): Duration of the call.
+            scanned (int): Catalog entries visited by the call.
+            failed (bool, optional): Whether the call raised. Defaults to False.
+        """
+        with self._lock:
+            calls = self._calls.get(operation)
+            if calls is None:
+                calls = self._calls[operation] = {'count': 0, 'errors': 0, 'seconds': 0.0,
+                                                  'scanned': 0, 'max_scanned': 0,
+                                                  'samples': collections.deque(maxlen=self.sample_size)}
+            calls['count'] += 1
+            calls['errors'] += failed
+            calls['seconds'] += seconds
+            calls['scanned'] += scanned
+            calls['max_scanned'] = max(calls['max_scanned'], scanned)
+            calls['samples'].append(seconds)
+
+    def snapshot(self):
+        """
+        Return the recorded metrics.
+
+        Returns:
+            dict: {operation: {'count', 'errors', 'seconds', 'p50', 'p95', 'p99',
+            'scanned', 'max_scanned'}}, seconds being the cumulative latency.
+        """
+        with self._lock:
+            calls = {operation: dict(entry, samples=list(entry['samples']))
+                     for operation, entry in self._calls.items()}
+        out = {}
+        for operation, entry in sorted(calls.items()):
+            samples = entry.pop('samples')
+            cuts = statistics.quantiles(samples, n=100) if len(samples) > 1 else samples * 99
+            for quantile in QUANTILES:
+                entry['p{}'.format(round(quantile * 100))] = cuts[round(quantile * 100) - 1]
+            out[operation] = entry
+        return out
+
+    def prometheus(self, prefix='rentalstore'):
+        """
+        Return the recorded metrics in the Prometheus text exposition format.
+
+        Args:
+            prefix (str, optional): Prefix of the metric names. Defaults to 'rentalstore'.
+
+        Returns:
+            str: Counters of calls, errors and scanned entries and a latency summary,
+            all labelled by operation.
+        """
+        snapshot = self.snapshot()
+        lines = []
+
+        def family(name, kind, help_text, samples):
+            lines.append('# HELP {}_{} {}'.format(prefix, name, help_text))
+            lines.append('# TYPE {}_{} {}'.format(prefix, name, kind))
+            for suffix, labels, value in samples:
+                lines.append('{}_{}{}{{{}}} {!r}'.format(prefix, name, suffix, labels, value))
+
+        label = 'operation="{}"'.format
+        family('calls_total', 'counter', 'Calls per operation.',
+               [('', label(operation), entry['count']) for operation, entry in snapshot.items()])
+        family('errors_total', 'counter', 'Calls that raised, per operation.',
+               [('', label(operation), entry['errors']) for operation, entry in snapshot.items()])
+        family('scanned_items_total', 'counter', 'Catalog entries visited per operation.',
+               [('', label(operation), entry['scanned']) for operation, entry in snapshot.items()])
+        latency = []
+        for operation, entry in snapshot.items():
+            for quantile in QUANTILES:
+                latency.append(('', '{},quantile="{}"'.format(label(operation), quantile),
+                                entry['p{}'.format(round(quantile * 100))]))
+            latency.append(('_sum', label(operation), entry['seconds']))
+            latency.append(('_count', label(operation), entry['count']))
+        family('latency_seconds', 'summary', 'Latency per operation.', latency)
+        return '\n'.join(lines) + '\n'
+
+
+def _timed(operation, function, metrics):
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        scanned = getattr(_scans, 'count', 0)
+        start = time.perf_counter()
+        try:
+            result = function(*args, **kwargs)
+        except BaseException:
+            metrics.record(operation, time.perf_counter() - start, getattr(_scans, 'count', 0) - scanned, True)
+            raise
+        metrics.record(operation, time.perf_counter() - start, getattr(_scans, 'count', 0) - scanned)
+        return result
+    return wrapper
+
+
+def _counted(function):
+    if function.__name__ == 'iter_products':
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            for item in function(*args, **kwargs):
+                _scans.count = getattr(_scans, 'count', 0) + 1
+                yield item
+    else:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            _scans.count = getattr(_scans, 'count', 0) + 1
+            return function(*args, **kwargs)
+    return wrapper
+
+
+def _classes(base):
+    """base and all its subclasses."""
+    classes = [base]
+    for cls in classes:
+        classes.extend(sub for sub in cls.__subclasses__() if sub not in classes)
+    return classes
+
+
+def _patch(cls, name, replacement):
+    _patched.append((cls, name, cls.__dict__[name]))
+    setattr(cls, name, replacement)
+
+
+def enable(metrics=None):
+    """
+    Start recording metrics by wrapping the instrumented methods.
+
+    The wrappers replace the methods on the classes themselves, so instrumentation
+    applies to all existing and new stores and customers of the classes imported so
+    far. disable() puts the original methods back; while disabled nothing is wrapped
+    and there is no overhead at all.
+
+    Args:
+        metrics (Metrics, optional): Registry to record into. Defaults to a new one.
+
+    Returns:
+        Metrics: The registry recording the calls.
+    """
+    global _enabled
+    if _enabled is not None:
+        disable()
+    metrics = Metrics() if metrics is None else metrics
+    for cls in _classes(Customer):
+        for name in CUSTOMER_METHODS:
+            if name in cls.__dict__:
+                _patch(cls, name, _timed('{}.{}'.format(cls.__name__, name), cls.__dict__[name], metrics))
+        for name in CUSTOMER_PROPERTIES:
+            if name in cls.__dict__:
+                prop = cls.__dict__[name]
+                _patch(cls, name, property(_timed('{}.{}'.format(cls.__name__, name), prop.fget, metrics),
+                                           prop.fset, prop.fdel, prop.__doc__))
+    for cls in _classes(RentalStore):
+        for name in STORE_METHODS:
+            if name in cls.__dict__:
+                _patch(cls, name, _timed('{}.{}'.format(cls.__name__, name), cls.__dict__[name], metrics))
+        for name in STORE_SCANS:
+            if name in cls.__dict__:
+                _patch(cls, name, _counted(cls.__dict__[name]))
+    _enabled = metrics
+    return metrics
+
+
+def disable():
+    """
+    Stop recording and restore the original methods.
+
+    Returns:
+        Metrics: The registry that was recording, None if metrics were not enabled.
+    """
+    global _enabled
+    while _patched:
+        cls, name, original = _patched.pop()
+        setattr(cls, name, original)
+    metrics, _enabled = _enabled, None
+    return metrics
+
+
+def enabled():
+    """Metrics: The registry currently recording, None if metrics are disabled."""
+    return _enabled
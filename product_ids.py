@@ -0,0 +1,95 @@
+import os
+import uuid
+import random
+import weakref
+import itertools
+
+# generators whose per-process state has to be renewed in a forked child
+_forkable = weakref.WeakSet()
+
+
+def _reset_after_fork():
+    for generator in list(_forkable):
+        generator._reset()
+        
+        
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+    
+    
+class Uuid1Ids():
+    """Default strategy: the 128-bit integer of uuid.uuid1(), one clock read per product."""
+    
+    def new_id(self):
+        return uuid.uuid1().int
+    
+    
+class SequentialIds():
+    """
+    Monotonic sequence: a random 64-bit process prefix followed by a 64-bit counter.
+    
+    The prefix is renewed in forked children, so workers of a process pool never
+    share IDs while IDs within one process stay increasing.
+    
+    Args:
+        start (int, optional): First counter value. Defaults to 1.
+    
+    """
+    
+    def __init__(self, start=1):
+        self._start = start
+        self._reset()
+        _forkable.add(self)
+        
+    def _reset(self):
+        self._prefix = int.from_bytes(os.urandom(8), 'big') << 64
+        self._counter = itertools.count(self._start)
+        
+    def new_id(self):
+        return self._prefix | next(self._counter)
+    
+    
+class BlockUuidIds():
+    """
+    Hands out consecutive IDs from blocks starting at a random uuid4.
+    
+    One uuid4 is drawn per block of block_size IDs; its low bits are cleared and
+    then filled with the position in the block.
+    
+    Args:
+        block_size (int, optional): IDs per block, rounded up to a power of two.
+            Defaults to 4096.
+    
+    """
+    
+    def __init__(self, block_size=4096):
+        assert isinstance(block_size, int) and block_size > 0, 'block_size must be a positive int'
+        self._bits = (block_size - 1).bit_length()
+        self._reset()
+        _forkable.add(self)
+        
+    def _reset(self):
+        self._block = iter(())
+        
+    def new_id(self):
+        try:
+            return next(self._block)
+        except StopIteration:
+            base = uuid.uuid4().int >> self._bits << self._bits
+            self._block = iter(range(base, base + (1 << self._bits)))
+            return next(self._block)
+        
+        
+class RandomIds():
+    """Random 64-bit IDs from a generator seeded by os.urandom, re-seeded after fork."""
+    
+    def __init__(self):
+        self._random = random.Random()
+        self._reset()
+        _forkable.add(self)
+        
+    def _reset(self):
+        self._random.seed(os.urandom(16))
+        
+    def new_id(self):
+        return self._random.getrandbits(64)
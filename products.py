@@ -1,13 +1,21 @@
 import uuid
 import datetime
+import threading
+from product_ids import Uuid1Ids
 
 NoneType = type(None)
 
+# striped locks shared by all products instead of one lock object per product
+_LOCKS = tuple(threading.RLock() for _ in range(256))
+
 
 class Product():
     """
     Contains basic attributes and properties of a product.
     
+    Products use __slots__ and keep their ID as an integer drawn from id_generator,
+    which is only formatted as a UUID string when product_id is read.
+    
     Args:
         name (str): Product's name.
         price_per_week (float, optional): Product's rental price per week.
@@ -15,10 +23,19 @@ class Product():
     
     Attributes:
         name (str): Product's name.
-        product_id (str): Unique product ID given by uuid.uuid1().
+        product_id (str): Unique product ID given by Product.id_generator.
         buyable (bool): Product's status regarding purchases. Defaults to False.
+        
+    Class Attribute:
+        id_generator: ID strategy from product_ids, Uuid1Ids() by default. Replace it
+            with e.g. SequentialIds() for faster catalog creation.
     
     """
+    
+    id_generator = Uuid1Ids()
+    
+    # __weakref__ lets stores that materialize products on demand keep an identity map
+    __slots__ = ('name', '_id', '_buyable', '_price_per_week', '_weeks', '_start', '_store', '__weakref__')
 
     def __init__(self, 
                  name,
@@ -28,17 +45,53 @@ class Product():
         assert isinstance(price_per_week, (int, float, NoneType)), 'price_per_week must be int, float or None'
         
         self.name = name
-        self.product_id = str(uuid.uuid1())
-        self.buyable = False
+        self._id = self.id_generator.new_id()
+        self._buyable = False
         self._price_per_week = price_per_week
-        self._rental_time = None
-        self._rental_start = None
+        self._weeks = None
+        self._start = None
+        self._store = None  # set by RentalStore while the product is part of it
         
     def __repr__(self):
         return '{}'.format(self.name)
     
     def __str__(self):
         return f"{self.name}\nPrice per week: {self.price_per_week}"
+    
+    @classmethod
+    def _from_row(cls, name, price_per_week, buyable, product_id=None):
+        """
+        Create a product from already validated values, skipping the per-call asserts.
+        
+        product_id is the compact integer ID; a new one is drawn if it is None.
+        """
+        item = cls.__new__(cls)
+        item.name = name
+        item._id = cls.id_generator.new_id() if product_id is None else product_id
+        item._buyable = buyable
+        item._price_per_week = price_per_week
+        item._weeks = None
+        item._start = None
+        item._store = None
+        return item
+    
+    @property
+    def product_id(self):
+        """str: Unique product ID, formatted from the compact integer ID."""
+        return str(uuid.UUID(int=self._id))
+    
+    @property
+    def _lock(self):
+        """threading.RLock: guards the check-and-set of the rental state of this product."""
+        return _LOCKS[hash(self._id) % len(_LOCKS)]
+    
+    @staticmethod
+    def id_key(product_id):
+        """Convert a product_id string to the compact ID used as index key, None if invalid."""
+        try:
+            return uuid.UUID(product_id).int
+        except (ValueError, TypeError, AttributeError):
+            return None
         
     @property
     def price_per_week(self):
@@ -49,7 +102,53 @@ class Product():
     def price_per_week(self, new_price):
         assert isinstance(new_price, (int, float)), 'New price must be int or float'
         assert new_price > 0, 'New price must be positive'
+        self._log('price', price=new_price)
         self._price_per_week = new_price
+        self._rental_changed()
+        
+    @property
+    def buyable(self):
+        """bool: Product's status regarding purchases."""
+        return self._buyable
+    
+    @buyable.setter
+    def buyable(self, new_buyable):
+        self._log('buyable', buyable=bool(new_buyable))
+        self._buyable = new_buyable
+        self._rental_changed()
+        
+    # _rental_start and _rental_time wrap the raw fields so that every change of the
+    # rental period, including a direct assignment, is reported to the store
+    @property
+    def _rental_start(self):
+        return self._start
+    
+    @_rental_start.setter
+    def _rental_start(self, new_start):
+        self._start = new_start
+        self._rental_changed()
+        
+    @property
+    def _rental_time(self):
+        return self._weeks
+    
+    @_rental_time.setter
+    def _rental_time(self, new_time):
+        self._weeks = new_time
+        self._rental_changed()
+        
+    def _rental_changed(self):
+        if self._store is not None:
+            self._store._rental_changed(self)
+            
+    def _today(self):
+        """datetime.date: Current day of the store's clock, the system date outside a store."""
+        return self._store.clock.today() if self._store is not None else datetime.date.today()
+            
+    def _log(self, op, **fields):
+        """Write a change of this product to the store's event log before applying it."""
+        if self._store is not None:
+            self._store._log(op, id=format(self._id, 'x'), **fields)
         
     @property
     def rental_start(self):
@@ -65,10 +164,14 @@ class Product():
     def rental_time(self, new_time):
         assert isinstance(new_time, (int, float)), "New time must be int or float"
         assert self._rental_start is not None, "The item is not rented yet"
-        if self._rental_time is not None:
-            assert new_time > self._rental_time, "New rental time must be greater than the current rental time"
         assert new_time > 0, 'New time must be positive'
-        self._rental_time = new_time
+        with self._lock:
+            if self._rental_time is not None:
+                assert new_time > self._rental_time, "New rental time must be greater than the current rental time"
+            assert self._store is None or self._store._can_book(self, self._rental_start, new_time), \
+                "The unit is reserved by another customer within the extended period"
+            self._log('extend', weeks=new_time)
+            self._rental_time = new_time
         
     @property
     def rental_end(self):
@@ -93,16 +196,40 @@ class Product():
                 Must be strictly positive.
                 
         Returns:
-            True if Product is available, False otherwise.
+            True if Product is available, False if it is rented or reserved within
+            the rental period.
         """
         assert isinstance(rental_time, int), 'rental_time must be int'
         assert rental_time > 0, 'rental_time must be positive'
-        if self.available:
-            self._rental_time = rental_time
-            self._rental_start = datetime.date.today()
+        return self._start_rental(self._today(), rental_time)
+    
+    def _start_rental(self, start, rental_time):
+        """Rent the product from start on, unless it is rented or reserved in that period."""
+        # check and set atomically, so that a unit is never rented twice
+        with self._lock:
+            if not self.available:
+                return False
+            if self._store is not None and not self._store._can_book(self, start, rental_time):
+                return False
+            if self._store is not None and not self._store._claim_rental(self, start, rental_time):
+                return False
+            self._log('rent', weeks=rental_time, start=start.toordinal())
+            self._weeks = rental_time
+            self._start = start
+            if self._store is not None:
+                self._store._product_rented(self)
             return True
-        else:
-            return False
+        
+    def _release(self):
+        """Undo rent(), e.g. when a batch rental is rolled back, making the unit free again."""
+        with self._lock:
+            if self.available:
+                return
+            self._log('release')
+            self._weeks = None
+            self._start = None
+            if self._store is not None:
+                self._store._product_released(self)
 
     def product_description(self):
         print('Product: {}\nPrice per week: {}'.format(self.name, self.price_per_week))
@@ -117,7 +244,7 @@ class Laptop(Product):
     
     Attributes:
         name (str): Product's name.
-        product_id (str): Unique product ID given by uuid.uuid1().
+        product_id (str): Unique product ID given by Product.id_generator.
         buyable (bool): Product's status regarding purchases. Defaults to False.
     
     Class Attribute(int): 
@@ -125,6 +252,8 @@ class Laptop(Product):
         
     """
     
+    __slots__ = ()
+    
     max_rental_time = 12
     
     def rent(self, rental_time):
@@ -143,12 +272,7 @@ class Laptop(Product):
         assert isinstance(rental_time, int), 'rental_time must be int'
         assert rental_time > 0, 'rental_time must be positive'
         assert rental_time <= Laptop.max_rental_time, 'Rental time must be below {} weeks'.format(Laptop.max_rental_time)
-        if self.available:
-            self._rental_time = rental_time
-            self._rental_start = datetime.date.today()
-            return True
-        else:
-            return False
+        return super().rent(rental_time)
     
     @property
     def rental_time(self):
@@ -159,11 +283,15 @@ class Laptop(Product):
     def rental_time(self, new_time):
         assert isinstance(new_time, (int, float)), "New time must be int or float"
         assert self._rental_start is not None, "The item is not rented yet"
-        if self._rental_time is not None:
-            assert new_time <= Laptop.max_rental_time, "You can loan laptops for a maximum of 12 months"
-            assert new_time > self._rental_time, "New rental time must be greater than the current rental time"
         assert new_time > 0, 'New time must be positive'
-        self._rental_time = new_time
+        with self._lock:
+            if self._rental_time is not None:
+                assert new_time <= Laptop.max_rental_time, "You can loan laptops for a maximum of 12 months"
+                assert new_time > self._rental_time, "New rental time must be greater than the current rental time"
+            assert self._store is None or self._store._can_book(self, self._rental_start, new_time), \
+                "The unit is reserved by another customer within the extended period"
+            self._log('extend', weeks=new_time)
+            self._rental_time = new_time
 
     @classmethod    
     def display_max_rental_time(cls):
@@ -194,11 +322,14 @@ class Phone(Product):
     
     Attributes:
         name (str): Product's name.
-        product_id (str): Unique product ID given by uuid.uuid1().
+        product_id (str): Unique product ID given by Product.id_generator.
         buyable (bool): Product's status regarding purchases. Defaults to True.
         price_per_week (float): Product's rental price per week.
     
     """
+    
+    __slots__ = ()
+    
     def __init__(self,
                  name,
                  price_per_week=0,
@@ -213,4 +344,19 @@ class Phone(Product):
         assert isinstance(a_dictionary, dict), "Given argument needs to be of the type: dictionary"
         assert 'name' and 'price_per_week' in a_dictionary.keys(), "Given dictionary should contain the keys name and price_per_week"
         
-        return cls(name = a_dictionary.get('name'), price_per_week= a_dictionary.get("price_per_week"))
\ No newline at end of file
+        return cls(name = a_dictionary.get('name'), price_per_week= a_dictionary.get("price_per_week"))
+
+
+# product types by the type code SQLite, snapshot and columnar stores keep for them
+KINDS = (Product, Laptop, Phone)
+KINDS_BY_NAME = {cls.__name__: cls for cls in KINDS}
+
+
+def _kind(item):
+    """Type code of item, the index of its most specific class in KINDS."""
+    return 2 if isinstance(item, Phone) else 1 if isinstance(item, Laptop) else 0
+
+
+def _kind_name(item):
+    """Product type an item is accounted under: 'Phone', 'Laptop' or 'Product'."""
+    return KINDS[_kind(item)].__name__
@@ -0,0 +1,94 @@
+import bisect
+import datetime
+
+
+def period(start, rental_time):
+    """Return (first day, day after the last day) of a rental as ordinals."""
+    return start.toordinal(), (start + datetime.timedelta(weeks=rental_time)).toordinal()
+
+
+class Reservation():
+    """
+    Booking of one unit for a future rental period.
+
+    Args:
+        item (Product): Reserved unit.
+        start (datetime.date): First day of the rental.
+        rental_time (int): Rental time in weeks.
+        customer (Customer, optional): Customer holding the reservation.
+
+    """
+
+    __slots__ = ('item', 'start', 'rental_time', 'customer')
+
+    def __init__(self, item, start, rental_time, customer=None):
+        self.item = item
+        self.start = start
+        self.rental_time = rental_time
+        self.customer = customer
+
+    def __repr__(self):
+        return 'Reservation({!r}, {}, {} weeks)'.format(self.item, self.start, self.rental_time)
+
+    @property
+    def end(self):
+        """datetime.date: Day the reserved rental ends."""
+        return self.start + datetime.timedelta(weeks=self.rental_time)
+
+
+class IntervalList():
+    """
+    Booked periods of one unit, kept as sorted, non-overlapping [start, end) day ordinals.
+
+    Starts and ends are parallel sorted lists, so a conflict check is a single
+    bisection, O(log n), and the earliest free slot is found by walking the gaps
+    from there.
+
+    """
+
+    def __init__(self):
+        self._starts = []
+        self._ends = []
+        self._holders = []
+
+    def __len__(self):
+        return len(self._starts)
+
+    def __iter__(self):
+        """Yield the holders of the booked periods in chronological order."""
+        return iter(list(self._holders))
+
+    def conflicts(self, start, end):
+        """Return True if [start, end) overlaps a booked period."""
+        position = bisect.bisect_right(self._starts, start)
+        if position and self._ends[position - 1] > start:
+            return True
+        return position < len(self._starts) and self._starts[position] < end
+
+    def add(self, start, end, holder):
+        """Book [start, end) for holder; the period must be free."""
+        assert not self.conflicts(start, end), 'The period is already booked'
+        position = bisect.bisect_right(self._starts, start)
+        self._starts.insert(position, start)
+        self._ends.insert(position, end)
+        self._holders.insert(position, holder)
+
+    def remove(self, start, holder):
+        """Free the period booked by holder starting on start. Returns True if it was booked."""
+        position = bisect.bisect_left(self._starts, start)
+        if position < len(self._starts) and self._starts[position] == start and self._holders[position] is holder:
+            del self._starts[position]
+            del self._ends[position]
+            del self._holders[position]
+            return True
+        return False
+
+    def next_free(self, day, length):
+        """Return the first day >= day starting a free period of length days."""
+        position = bisect.bisect_right(self._starts, day)
+        if position and self._ends[position - 1] > day:
+            day = self._ends[position - 1]
+        while position < len(self._starts) and self._starts[position] < day + length:
+            day = max(day, self._ends[position])
+            position += 1
+        return day
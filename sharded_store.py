@@ -0,0 +1,393 @@
+import os
+import zlib
+import math
+import datetime
+import threading
+import contextlib
+import multiprocessing
+
+from clock import SimulatedClock
+from store import RentalStore
+from customer import Customer, BatchResult
+from products import KINDS_BY_NAME, _kind_name
+from errors import RentalError
+
+
+def _report(results):
+    """BatchResults of a shard as (product ID or None, portable error or None) pairs."""
+    return [(result.item.product_id if result.item is not None else None,
+             _portable(result.error) if result.error is not None else None)
+            for result in results]
+
+
+def _row(item):
+    """Picklable copy of a product: (kind, name, price, buyable, _id, rental start ordinal, weeks)."""
+    start = item.rental_start.toordinal() if item.rental_start else None
+    return (_kind_name(item), item.name, item.price_per_week, item.buyable, item._id, start, item.rental_time)
+
+
+def _extend(store, customer, rows):
+    items = []
+    for kind, name, price_per_week, buyable, product_id, start, weeks in rows:
+        item = KINDS_BY_NAME[kind]._from_row(name, price_per_week, buyable, product_id)
+        if start is not None:
+            item._start = datetime.date.fromordinal(start)
+            item._weeks = weeks
+        items.append(item)
+    return len(store.extend(items))
+
+
+def _rent_many(store, customer, orders):
+    return _report(customer.rent_many(orders, atomic=False))
+
+
+def _buy_many(store, customer, item_names):
+    return _report(customer.buy_many(item_names, atomic=False))
+
+
+def _quote(store, customer):
+    """The customer's invoice and the rentals it is made of, for a later _pay()."""
+    with customer._lock:
+        return customer.invoice, list(customer._due)
+
+
+def _pay(store, customer, keys):
+    # settles exactly the quoted rentals, even if more became due in the meantime
+    with customer._lock:
+        store._log('pay', customer=customer.name, ids=[format(key, 'x') for key in keys])
+        customer._settle(keys)
+
+
+# operations a shard runs, called with its store, the customer (or None) and the arguments
+OPERATIONS = {
+    'extend': _extend,
+    'extend_rows': lambda store, customer, rows: len(store.extend_rows(rows)),
+    'len': lambda store, customer: len(store),
+    'count': lambda store, customer, name: store.count(name),
+    'available_count': lambda store, customer, name: store.available_count(name),
+    'stats': lambda store, customer: store.stats(),
+    'advance': lambda store, customer, days, weeks: store.clock.advance(days=days, weeks=weeks),
+    'rent': lambda store, customer, name, weeks: customer.rent(name, weeks).product_id,
+    'buy': lambda store, customer, name: customer.buy(name).product_id,
+    'rent_many': _rent_many,
+    'buy_many': _buy_many,
+    'invoice': lambda store, customer: customer.invoice,
+    'quote': _quote,
+    'pay': _pay,
+}
+
+
+def _serve(connection, clock_start):
+    """Main loop of a shard process: run batches of calls until None is received."""
+    clock = SimulatedClock(clock_start) if clock_start is not None else None
+    store = RentalStore(quiet=True, clock=clock)
+    customers = {}
+    while True:
+        calls = connection.recv()
+        if calls is None:
+            break
+        replies = []
+        for operation, customer_name, args in calls:
+            customer = None
+            if customer_name is not None:
+                customer = customers.get(customer_name)
+                if customer is None:
+                    customer = customers[customer_name] = Customer(customer_name, store)
+            try:
+                replies.append((True, OPERATIONS[operation](store, customer, *args)))
+            except Exception as error:
+                replies.append((False, _portable(error)))
+        connection.send(replies)
+    connection.close()
+
+
+def _portable(error):
+    """Errors that pickle reliably: RentalError is sent as (class, item_name)."""
+    if isinstance(error, RentalError):
+        return (type(error), error.item_name)
+    return error
+
+
+def _restore(error):
+    if isinstance(error, tuple):
+        cls, item_name = error
+        return cls(item_name)
+    return error
+
+
+def _unwrap(reply):
+    ok, value = reply
+    if not ok:
+        raise _restore(value)
+    return value
+
+
+class ShardedRentalStore():
+    """
+    Catalog partitioned across worker processes, one RentalStore per process.
+
+    Products are assigned to shards by a stable hash of their name, so all units
+    of a product live in one shard and renting or buying by name touches exactly
+    one process. Each shard keeps its own part of every customer; invoices and
+    statistics are aggregated over all shards. Calls for different shards run in
+    parallel, so throughput scales with the number of cores as long as each call
+    carries enough work: batch operations (rent_many, buy_many, extend_rows) send
+    one message per shard.
+
+    Products live in the shard processes. Operations return product IDs instead of
+    Product objects, and products passed to extend() are copied into the shards.
+    Failures raise errors.RentalError subclasses, as in a quiet RentalStore.
+
+    Args:
+        workers (int, optional): Number of shard processes. Defaults to the number of CPUs.
+        clock_start (datetime.date, optional): Run the shards on SimulatedClocks
+            starting on this day, see advance(). Defaults to the system clock.
+
+    """
+
+    def __init__(self, workers=None, clock_start=None):
+        if workers is None:
+            workers = os.cpu_count() or 1
+        assert isinstance(workers, int) and workers > 0, 'workers must be a positive int'
+        self.workers = workers
+        self._connections = []
+        self._locks = []
+        self._processes = []
+        for _ in range(workers):
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_serve, args=(child, clock_start), daemon=True)
+            process.start()
+            child.close()
+            self._connections.append(parent)
+            self._locks.append(threading.Lock())
+            self._processes.append(process)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Stop all shard processes."""
+        for connection, lock, process in zip(self._connections, self._locks, self._processes):
+            with lock:
+                connection.send(None)
+                connection.close()
+            process.join()
+        self._connections = []
+        self._processes = []
+
+    def shard_of(self, name):
+        """Return the index of the shard holding the products with the given name."""
+        return zlib.crc32(name.encode('utf-8')) % self.workers
+
+    def _scatter(self, calls):
+        """
+        Run lists of calls on several shards in parallel.
+
+        Args:
+            calls (dict): {shard: [(operation, customer_name, args), ...]}
+
+        Returns:
+            dict: {shard: [(ok, value), ...]}
+        """
+        with self._locked(calls):
+            return self._exchange(calls)
+
+    @contextlib.contextmanager
+    def _locked(self, shards):
+        """Hold the connections of several shards, e.g. across a _exchange() that must not interleave."""
+        shards = sorted(shards)
+        for shard in shards:  # locks in shard order, so concurrent scatters cannot deadlock
+            self._locks[shard].acquire()
+        try:
+            yield
+        finally:
+            for shard in shards:
+                self._locks[shard].release()
+
+    def _exchange(self, calls):
+        """Send calls to their shards and collect the replies; hold the shards' locks."""
+        for shard in sorted(calls):
+            self._connections[shard].send(calls[shard])
+        return {shard: self._connections[shard].recv() for shard in sorted(calls)}
+
+    def _call(self, shard, operation, customer_name=None, *args):
+        return _unwrap(self._scatter({shard: [(operation, customer_name, args)]})[shard][0])
+
+    def _broadcast(self, operation, customer_name=None, *args):
+        replies = self._scatter({shard: [(operation, customer_name, args)] for shard in range(self.workers)})
+        return [_unwrap(replies[shard][0]) for shard in range(self.workers)]
+
+    def _partition(self, entries, name):
+        """Group entries by the shard of name(entry), keeping their positions."""
+        parts = {}
+        for position, entry in enumerate(entries):
+            shard_entries = parts.setdefault(self.shard_of(name(entry)), ([], []))
+            shard_entries[0].append(position)
+            shard_entries[1].append(entry)
+        return parts
+
+    def extend(self, items):
+        """Copy products, including their rental state, into their shards; returns the store itself."""
+        parts = self._partition([_row(item) for item in items], lambda row: row[1])
+        replies = self._scatter({shard: [('extend', None, (entries,))] for shard, (_, entries) in parts.items()})
+        for reply in replies.values():
+            _unwrap(reply[0])
+        return self
+
+    def extend_rows(self, rows):
+        """Add validated (cls, name, price_per_week, buyable) rows; returns the store itself."""
+        parts = self._partition(rows, lambda row: row[1])
+        replies = self._scatter({shard: [('extend_rows', None, (entries,))] for shard, (_, entries) in parts.items()})
+        for reply in replies.values():
+            _unwrap(reply[0])
+        return self
+
+    def __len__(self):
+        """Return the number of products in all shards."""
+        return sum(self._broadcast('len'))
+
+    def count(self, name):
+        """Return the number of units with the given name."""
+        return self._call(self.shard_of(name), 'count', None, name)
+
+    def available_count(self, name):
+        """Return the number of free units with the given name."""
+        return self._call(self.shard_of(name), 'available_count', None, name)
+
+    def rent(self, customer_name, item_name, rental_time):
+        """Rent a unit for a customer, see Customer.rent(); returns its product ID."""
+        return self._call(self.shard_of(item_name), 'rent', customer_name, item_name, rental_time)
+
+    def buy(self, customer_name, item_name):
+        """Buy a unit for a customer, see Customer.buy(); returns its product ID."""
+        return self._call(self.shard_of(item_name), 'buy', customer_name, item_name)
+
+    def rent_many(self, customer_name, orders):
+        """
+        Rent many items for a customer with one message per shard.
+
+        Entries are applied best-effort, see Customer.rent_many(atomic=False).
+
+        Args:
+            customer_name (str): Customer renting the items.
+            orders (list): (item_name, rental_time) tuples.
+
+        Returns:
+            list: A BatchResult per order, whose item is the product ID.
+        """
+        orders = list(orders)
+        return self._batch('rent_many', customer_name, orders, [name for name, _ in orders])
+
+    def buy_many(self, customer_name, item_names):
+        """Buy many items for a customer best-effort, see rent_many()."""
+        item_names = list(item_names)
+        return self._batch('buy_many', customer_name, item_names, item_names)
+
+    def _batch(self, operation, customer_name, entries, names):
+        parts = self._partition(range(len(entries)), lambda position: names[position])
+        replies = self._scatter({shard: [(operation, customer_name, ([entries[position] for position in positions],))]
+                                 for shard, (positions, _) in parts.items()})
+        results = [None] * len(entries)
+        for shard, (positions, _) in parts.items():
+            for position, (product_id, error) in zip(positions, _unwrap(replies[shard][0])):
+                results[position] = BatchResult(names[position], product_id,
+                                                error if error is None else _restore(error))
+        return results
+
+    def invoice(self, customer_name):
+        """Return the outstanding amount of a customer over all shards."""
+        return sum(self._broadcast('invoice', customer_name))
+
+    def pay_invoice(self, customer_name, amount_paid):
+        """
+        Pay the whole invoice of a customer, settling its part in every shard.
+
+        All shards are held while the invoice is checked and paid, and each shard
+        settles exactly the rentals it quoted, so either every part is paid or
+        none is.
+
+        Args:
+            customer_name (str): Paying customer.
+            amount_paid (float): Must equal invoice(customer_name).
+        """
+        assert isinstance(amount_paid, (int, float)), 'amount_paid must be int or float'
+        assert amount_paid > 0, 'amount_paid must be positive'
+        shards = range(self.workers)
+        with self._locked(shards):
+            replies = self._exchange({shard: [('quote', customer_name, ())] for shard in shards})
+            quotes = {shard: _unwrap(replies[shard][0]) for shard in shards}
+            assert math.isclose(sum(amount for amount, _ in quotes.values()), amount_paid), \
+                'Whole bill must be paid, no partial payments possible'
+            replies = self._exchange({shard: [('pay', customer_name, (keys,))]
+                                      for shard, (amount, keys) in quotes.items() if amount})
+        for reply in replies.values():
+            _unwrap(reply[0])
+
+    def stats(self):
+        """Return the aggregates of all shards, see RentalStore.stats()."""
+        shards = self._broadcast('stats')
+        revenue = {}
+        for shard in shards:
+            for kind, amount in shard['revenue_by_type'].items():
+                revenue[kind] = revenue.get(kind, 0) + amount
+        products = sum(shard['products'] for shard in shards)
+        active_rentals = sum(shard['active_rentals'] for shard in shards)
+        return {'products': products,
+                'active_rentals': active_rentals,
+                'utilization': active_rentals / products if products else 0.0,
+                'receivables': sum(shard['receivables'] for shard in shards),
+                'revenue_by_type': revenue}
+
+    def advance(self, days=0, weeks=0):
+        """Advance the SimulatedClock of every shard, see SimulatedClock.advance()."""
+        return self._broadcast('advance', None, days, weeks)[0]
+
+
+class ShardedCustomer():
+    """
+    Customer of a ShardedRentalStore, with the interface of Customer.
+
+    The customer's rentals and purchases live in the shards of the products;
+    its invoice is the sum over all shards.
+
+    Args:
+        name (str): Customer name, which identifies the customer in every shard.
+        store (ShardedRentalStore): Store the customer belongs to.
+
+    """
+
+    def __init__(self, name, store):
+        assert isinstance(store, ShardedRentalStore), 'ShardedCustomer needs a ShardedRentalStore'
+        self.name = name
+        self.store = store
+
+    def __repr__(self):
+        return 'ShardedCustomer: {}'.format(self.name)
+
+    @property
+    def invoice(self):
+        """float: Outstanding amount to pay over all shards."""
+        return self.store.invoice(self.name)
+
+    def rent(self, item_name, rental_time):
+        """Rent an item, see Customer.rent(); returns the product ID."""
+        return self.store.rent(self.name, item_name, rental_time)
+
+    def buy(self, item_name):
+        """Buy an item, see Customer.buy(); returns the product ID."""
+        return self.store.buy(self.name, item_name)
+
+    def rent_many(self, orders):
+        """Rent many items best-effort, see ShardedRentalStore.rent_many()."""
+        return self.store.rent_many(self.name, orders)
+
+    def buy_many(self, item_names):
+        """Buy many items best-effort, see ShardedRentalStore.buy_many()."""
+        return self.store.buy_many(self.name, item_names)
+
+    def pay_invoice(self, amount_paid):
+        """Pay the whole invoice, see Customer.pay_invoice()."""
+        self.store.pay_invoice(self.name, amount_paid)
@@ -0,0 +1,176 @@
+import time
+import random
+import datetime
+import itertools
+import statistics
+import tracemalloc
+
+from clock import SimulatedClock
+from store import RentalStore
+from customer import Customer
+from errors import RentalError
+from products import Laptop, Phone
+
+OPERATIONS = ('rent', 'buy', 'extend', 'invoice', 'pay')
+
+
+class Simulation():
+    """
+    Seeded discrete-event load simulation of a store and its customers.
+
+    Customers arrive as a Poisson process over simulated days. Each arrival picks an
+    operation from mix and a product model by a Zipf-like popularity, so a few models
+    are in high demand. Paying customers return their paid rentals, which makes the
+    units free again and archives the rentals. The store runs on a SimulatedClock
+    that is advanced one day at a time, so a simulated year takes seconds. Runs
+    with the same arguments and seed perform exactly the same operations.
+
+    Args:
+        seed (int, optional): Seed of the random generator. Defaults to 0.
+        days (int, optional): Simulated days. Defaults to 365.
+        customers (int, optional): Number of customers. Defaults to 200.
+        models (int, optional): Number of distinct laptop and of phone models. Defaults to 50.
+        units (int, optional): Units per model. Defaults to 50.
+        arrivals_per_day (float, optional): Mean arrivals per day. Defaults to 100.
+        mix (dict, optional): Relative weights of the operations in OPERATIONS; pay
+            also reads the invoice. Defaults to mostly rentals.
+        max_weeks (int, optional): Longest rental drawn, in weeks. Defaults to 8.
+        store_class (type, optional): RentalStore class to simulate. Defaults to RentalStore.
+        trace_memory (bool, optional): Measure the peak memory allocated by each
+            operation with tracemalloc, which slows the run down. Defaults to False.
+
+    """
+
+    def __init__(self, seed=0, days=365, customers=200, models=50, units=50, arrivals_per_day=100,
+                 mix=None, max_weeks=8, store_class=RentalStore, trace_memory=False):
+        assert isinstance(days, int) and days > 0, 'days must be a positive int'
+        assert isinstance(max_weeks, int) and 0 < max_weeks, 'max_weeks must be a positive int'
+        assert arrivals_per_day > 0, 'arrivals_per_day must be positive'
+        if mix is None:
+            mix = {'rent': 60, 'buy': 5, 'extend': 5, 'pay': 30}
+        assert set(mix) <= set(OPERATIONS), 'mix can only contain {}'.format(', '.join(OPERATIONS))
+        self.seed = seed
+        self.days = days
+        self.n_customers = customers
+        self.models = models
+        self.units = units
+        self.arrivals_per_day = arrivals_per_day
+        self.mix = mix
+        self.max_weeks = max_weeks
+        self.store_class = store_class
+        self.trace_memory = trace_memory
+
+    def run(self):
+        """
+        Run the simulation.
+
+        Returns:
+            dict: Report with an entry per operation type (count, failed, throughput in
+            operations per second of operation time, p50/p95/p99 latency in seconds
+            and peak_memory in bytes or None) and a 'total' entry.
+        """
+        rng = random.Random(self.seed)
+        clock = SimulatedClock(datetime.date(2024, 1, 1))
+        store = self.store_class(quiet=True, clock=clock)
+        store.extend_rows([(Laptop, 'Laptop {}'.format(model), rng.randint(5, 30), False)
+                           for model in range(self.models) for _ in range(self.units)] +
+                          [(Phone, 'Phone {}'.format(model), rng.randint(2, 15), True)
+                           for model in range(self.models) for _ in range(self.units)])
+        customers = [Customer('Customer {}'.format(number), store) for number in range(self.n_customers)]
+        popularity = list(itertools.accumulate(1 / (rank + 1) for rank in range(self.models)))
+        operations = list(self.mix)
+        weights = list(itertools.accumulate(self.mix[operation] for operation in operations))
+
+        latencies = {operation: [] for operation in OPERATIONS}
+        failed = dict.fromkeys(OPERATIONS, 0)
+        peaks = dict.fromkeys(OPERATIONS, 0)
+        tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+
+        def timed(operation, function, *args):
+            if self.trace_memory:
+                tracemalloc.reset_peak()
+                before = tracemalloc.get_traced_memory()[0]
+            start = time.perf_counter()
+            try:
+                result = function(*args)
+            except (RentalError, AssertionError):
+                result = None
+                failed[operation] += 1
+            latencies[operation].append(time.perf_counter() - start)
+            if self.trace_memory:
+                peaks[operation] = max(peaks[operation], tracemalloc.get_traced_memory()[1] - before)
+            return result
+
+        started = time.perf_counter()
+        try:
+            for _ in range(self.days):
+                # arrivals of the day as a Poisson process with exponential gaps
+                arrival = rng.expovariate(self.arrivals_per_day)
+                while arrival < 1:
+                    customer = rng.choice(customers)
+                    operation = rng.choices(operations, cum_weights=weights)[0]
+                    model = rng.choices(range(self.models), cum_weights=popularity)[0]
+                    if operation == 'rent':
+                        timed('rent', customer.rent, 'Laptop {}'.format(model) if rng.random() < 0.5
+                              else 'Phone {}'.format(model), rng.randint(1, self.max_weeks))
+                    elif operation == 'buy':
+                        timed('buy', customer.buy, 'Phone {}'.format(model))
+                    elif operation == 'extend':
+                        current = customer.current_items
+                        if current:
+                            item = rng.choice(current)
+                            timed('extend', setattr, item, 'rental_time', item.rental_time + 1)
+                    else:
+                        amount = timed('invoice', getattr, customer, 'invoice')
+                        if amount:
+                            returned = customer.due_items
+                            timed('pay', customer.pay_invoice, amount)
+                            for item in returned:
+                                customer.return_item(item)
+                    arrival += rng.expovariate(self.arrivals_per_day)
+                clock.advance(days=1)
+        finally:
+            elapsed = time.perf_counter() - started
+            if tracing:
+                tracemalloc.stop()
+
+        report = {}
+        for operation, samples in latencies.items():
+            if not samples:
+                continue
+            cuts = statistics.quantiles(samples, n=100) if len(samples) > 1 else samples * 99
+            report[operation] = {'count': len(samples),
+                                 'failed': failed[operation],
+                                 'throughput': len(samples) / (sum(samples) or 1e-9),
+                                 'p50': cuts[49],
+                                 'p95': cuts[94],
+                                 'p99': cuts[98],
+                                 'peak_memory': peaks[operation] if self.trace_memory else None}
+        total = sum(entry['count'] for entry in report.values())
+        report['total'] = {'count': total,
+                           'failed': sum(failed.values()),
+                           'elapsed': elapsed,
+                           'throughput': total / elapsed,
+                           'receivables': store.receivables,
+                           'revenue_by_type': store.revenue_by_type()}
+        return report
+
+
+def format_report(report):
+    """Format a report of Simulation.run() as a table."""
+    lines = ['{:>8} {:>9} {:>8} {:>12} {:>9} {:>9} {:>9} {:>11}'.format(
+        'op', 'count', 'failed', 'ops/s', 'p50 us', 'p95 us', 'p99 us', 'peak KiB')]
+    for operation in OPERATIONS:
+        if operation not in report:
+            continue
+        entry = report[operation]
+        peak = '-' if entry['peak_memory'] is None else '{:.1f}'.format(entry['peak_memory'] / 1024)
+        lines.append('{:>8} {:>9,} {:>8,} {:>12,.0f} {:>9.1f} {:>9.1f} {:>9.1f} {:>11}'.format(
+            operation, entry['count'], entry['failed'], entry['throughput'],
+            entry['p50'] * 1e6, entry['p95'] * 1e6, entry['p99'] * 1e6, peak))
+    total = report['total']
+    lines.append('{:,} operations in {:.2f} s ({:,.0f} ops/s), receivables {:.2f}'.format(
+        total['count'], total['elapsed'], total['throughput'], total['receivables']))
+    return '\n'.join(lines)
@@ -0,0 +1,359 @@
+import os
+import json
+import mmap
+import struct
+import datetime
+
+from products import Product, KINDS, _kind
+from store import RentalStore
+from customer import Customer, RentalRecord
+
+MAGIC = b'RSNAP001'
+DELTA_MAGIC = b'RSD1'
+
+# magic, record count, offset and length of the name table and of the customer section
+HEADER = struct.Struct('<8sQQQQQ')
+# one fixed-width record per product, sorted by id:
+# id, kind, flags, price, rental start ordinal, rental weeks, name offset, name length
+RECORD = struct.Struct('<16sBBdidIH')
+# delta frame: magic, record count, removed count, name table length, customer section length
+DELTA_HEADER = struct.Struct('<4sIIII')
+
+BUYABLE = 1
+IN_STORE = 2
+PRICE_NONE = 4
+PRICE_INT = 8
+WEEKS_INT = 16
+
+
+class _NameTable():
+    """Distinct product names, stored once and referenced by (offset, length)."""
+    
+    def __init__(self):
+        self._positions = {}
+        self._encoded = []
+        self._size = 0
+        
+    def add(self, name):
+        position = self._positions.get(name)
+        if position is None:
+            encoded = name.encode('utf-8')
+            position = self._positions[name] = (self._size, len(encoded))
+            self._encoded.append(encoded)
+            self._size += len(encoded)
+        return position
+    
+    def to_bytes(self):
+        return b''.join(self._encoded)
+
+
+def _pack(item, in_store, names):
+    """Pack item into a RECORD, adding its name to the _NameTable names."""
+    price = item.price_per_week
+    weeks = item.rental_time
+    flags = ((BUYABLE if item.buyable else 0) |
+             (IN_STORE if in_store else 0) |
+             (PRICE_NONE if price is None else 0) |
+             (PRICE_INT if isinstance(price, int) else 0) |
+             (WEEKS_INT if isinstance(weeks, int) else 0))
+    return RECORD.pack(item._id.to_bytes(16, 'big'),
+                       _kind(item),
+                       flags,
+                       price or 0,
+                       item.rental_start.toordinal() if item.rental_start else 0,
+                       weeks or 0,
+                       *names.add(item.name))
+
+
+def _unpack(record, names):
+    """Materialize a Product from a RECORD; names is the encoded name table."""
+    raw_id, kind, flags, price, start, weeks, offset, length = RECORD.unpack(record)
+    if flags & PRICE_NONE:
+        price = None
+    elif flags & PRICE_INT:
+        price = int(price)
+    item = KINDS[kind]._from_row(bytes(names[offset:offset + length]).decode('utf-8'),
+                                 price,
+                                 bool(flags & BUYABLE),
+                                 int.from_bytes(raw_id, 'big'))
+    if start:
+        item._start = datetime.date.fromordinal(start)
+    if weeks:
+        item._weeks = int(weeks) if flags & WEEKS_INT else weeks
+    return item, bool(flags & IN_STORE)
+
+
+def _customer_state(customer):
+    return {'name': customer.name,
+            'rented': [format(key, 'x') for key in list(customer._due) + list(customer._current)],
+            'owned': [format(item._id, 'x') for item in customer.owned_items],
+            'history': [[format(record.product_id, 'x')] + list(record[1:]) for record in customer._history],
+            'held': sorted(position for position, _ in customer._paid_held.values()),
+            'reservations': [[format(reservation.item._id, 'x'), reservation.start.toordinal(), reservation.rental_time]
+                             for reservation in customer.reservations]}
+
+
+def _referenced(customers):
+    """Return {_id: product} of all products held by the customers."""
+    products = {}
+    for customer in customers:
+        for items in (customer.due_items, customer.current_items, customer.paid_items, customer.owned_items):
+            for item in items:
+                if item is not None:
+                    products[item._id] = item
+    return products
+
+
+def save_snapshot(path, store, customers=()):
+    """
+    Write a full snapshot of a store and its customers.
+
+    Products are written as fixed-width records sorted by ID, followed by a table of
+    the distinct product names and the customers as JSON. Products only held by
+    customers (e.g. bought ones) are included and flagged as not in the store. Any
+    delta file of path is removed, as the snapshot supersedes it.
+
+    Args:
+        path (str): File to write.
+        store (RentalStore): Store to save.
+        customers (list, optional): Customers of the store. Defaults to none.
+    """
+    store._take_changes()
+    items = {item._id: (item, False) for item in _referenced(customers).values()}
+    items.update((item._id, (item, True)) for item in store.products)
+
+    name_table = _NameTable()
+    records = [_pack(item, in_store, name_table) for _, (item, in_store) in sorted(items.items())]
+    names = name_table.to_bytes()
+    state = json.dumps([_customer_state(customer) for customer in customers]).encode('utf-8')
+
+    names_offset = HEADER.size + len(records) * RECORD.size
+    with open(path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, len(records),
+                               names_offset, len(names),
+                               names_offset + len(names), len(state)))
+        file.write(b''.join(records))
+        file.write(names)
+        file.write(state)
+    if os.path.exists(path + '.delta'):
+        os.remove(path + '.delta')
+
+
+def append_delta(path, store, customers=()):
+    """
+    Append the changes since the last snapshot or delta to path + '.delta'.
+
+    Each delta frame holds fixed-width records of the changed products, the IDs of
+    removed products and the current state of the given customers.
+
+    Args:
+        path (str): Snapshot file the delta belongs to.
+        store (RentalStore): Store to save.
+        customers (list, optional): Customers whose state is written. Defaults to none.
+    """
+    referenced = _referenced(customers)
+    records = []
+    removed = []
+    name_table = _NameTable()
+    for key, item in store._take_changes().items():
+        if item is not None:
+            records.append(_pack(item, True, name_table))
+        elif key in referenced:
+            records.append(_pack(referenced[key], False, name_table))
+        else:
+            removed.append(key.to_bytes(16, 'big'))
+    # names of a delta frame are local to the frame and follow its records
+    names = name_table.to_bytes()
+    state = json.dumps([_customer_state(customer) for customer in customers]).encode('utf-8')
+
+    with open(path + '.delta', 'ab') as file:
+        file.write(DELTA_HEADER.pack(DELTA_MAGIC, len(records), len(removed), len(names), len(state)))
+        file.write(b''.join(records))
+        file.write(b''.join(removed))
+        file.write(names)
+        file.write(state)
+        file.flush()
+        os.fsync(file.fileno())
+
+
+class Snapshot():
+    """
+    Memory-mapped, read-only view of a snapshot and its deltas.
+
+    Opening only maps the file and reads the (small) delta file; products are
+    materialized when they are accessed. load() rebuilds a complete store with its
+    customers, which are identified by name.
+
+    Args:
+        path (str): Snapshot file written by save_snapshot().
+
+    """
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._count, names_offset, names_len, state_offset, state_len = HEADER.unpack_from(self._map)
+        assert magic == MAGIC, '{} is not a RentalStore snapshot'.format(path)
+        self._names = memoryview(self._map)[names_offset:names_offset + names_len]
+        self._state = (state_offset, state_len)
+        self._cache = {}
+        # later deltas override earlier ones: {_id: (record, names) or None if removed}
+        self._overlay = {}
+        self._customers = None
+        if os.path.exists(path + '.delta'):
+            self._read_deltas(path + '.delta')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._names.release()
+        self._map.close()
+        self._file.close()
+
+    def __len__(self):
+        """Return the number of product records in the base snapshot."""
+        return self._count
+
+    def get(self, product_id):
+        """
+        Return the product with the given product_id, materializing only this record.
+
+        Args:
+            product_id (str): Product ID as given by Product.product_id.
+
+        Returns:
+            Product: The product, or None if it is not part of the snapshot.
+        """
+        key = Product.id_key(product_id)
+        if key is None:
+            return None
+        return self._get(key)
+
+    def __iter__(self):
+        """Yield all products of the snapshot, materializing them one by one."""
+        for item, _ in self._entries():
+            yield item
+
+    def load(self, store_class=RentalStore, quiet=False, clock=None):
+        """
+        Materialize all products and customers.
+
+        Args:
+            store_class (type, optional): RentalStore class to create. Defaults to RentalStore.
+            quiet (bool, optional): Passed to the store. Defaults to False.
+            clock (optional): Clock passed to the store, e.g. the SimulatedClock the
+                snapshot was taken with. Defaults to the system clock.
+
+        Returns:
+            tuple: (store, list of Customer)
+        """
+        products = {}
+        in_store = []
+        for item, is_in_store in self._entries():
+            products[item._id] = item
+            if is_in_store:
+                in_store.append(item)
+        store = store_class(products=in_store, quiet=quiet, clock=clock)
+
+        def resolve(hex_id):
+            key = int(hex_id, 16)
+            return store._lookup(key) or products[key]
+
+        customers = []
+        for state in self.customer_states():
+            customer = Customer(state['name'], store)
+            customer._restore([resolve(key) for key in state['rented']],
+                              [resolve(key) for key in state['owned']],
+                              [RentalRecord(int(key, 16), *fields) for key, *fields in state.get('history', ())],
+                              set(state.get('held', ())))
+            for key, start, rental_time in state.get('reservations', ()):
+                reservation = store._book(resolve(key), datetime.date.fromordinal(start), rental_time, customer)
+                if reservation is not None:
+                    customer._reservations.append(reservation)
+            customers.append(customer)
+        store._take_changes()
+        return store, customers
+
+    def customer_states(self):
+        """list: Customer states as saved, the latest delta taking precedence."""
+        if self._customers is None:
+            offset, length = self._state
+            self._customers = {state['name']: state
+                               for state in json.loads(self._map[offset:offset + length])}
+        return list(self._customers.values())
+
+    def _record(self, index):
+        start = HEADER.size + index * RECORD.size
+        return self._map[start:start + RECORD.size]
+
+    def _find(self, key):
+        """Binary search of the sorted records, returns the index or None."""
+        raw = key.to_bytes(16, 'big')
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            start = HEADER.size + middle * RECORD.size
+            found = self._map[start:start + 16]
+            if found == raw:
+                return middle
+            if found < raw:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def _get(self, key):
+        if key in self._overlay:
+            entry = self._overlay[key]
+            return None if entry is None else self._materialize(key, *entry)[0]
+        index = self._find(key)
+        if index is None:
+            return None
+        return self._materialize(key, self._record(index), self._names)[0]
+
+    def _entries(self):
+        """Yield (product, in_store) for all live records, the overlay last."""
+        for index in range(self._count):
+            record = self._record(index)
+            key = int.from_bytes(record[:16], 'big')
+            if key not in self._overlay:
+                yield self._materialize(key, record, self._names)
+        for key, entry in self._overlay.items():
+            if entry is not None:
+                yield self._materialize(key, *entry)
+
+    def _materialize(self, key, record, names):
+        if key not in self._cache:
+            self._cache[key] = _unpack(record, names)
+        return self._cache[key]
+
+    def _read_deltas(self, delta_path):
+        with open(delta_path, 'rb') as file:
+            data = file.read()
+        offset = 0
+        customers = {}
+        while offset < len(data):
+            magic, n_records, n_removed, names_len, state_len = DELTA_HEADER.unpack_from(data, offset)
+            assert magic == DELTA_MAGIC, 'Corrupt delta file {}'.format(delta_path)
+            offset += DELTA_HEADER.size
+            records_end = offset + n_records * RECORD.size
+            removed_end = records_end + n_removed * 16
+            names = data[removed_end:removed_end + names_len]
+            for start in range(offset, records_end, RECORD.size):
+                record = data[start:start + RECORD.size]
+                key = int.from_bytes(record[:16], 'big')
+                self._overlay[key] = (record, names)
+                self._cache.pop(key, None)
+            for start in range(records_end, removed_end, 16):
+                key = int.from_bytes(data[start:start + 16], 'big')
+                self._overlay[key] = None
+                self._cache.pop(key, None)
+            offset = removed_end + names_len
+            customers.update((state['name'], state) for state in json.loads(data[offset:offset + state_len]))
+            offset += state_len
+        self.customer_states()
+        self._customers.update(customers)
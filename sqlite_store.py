@@ -0,0 +1,427 @@
+import queue
+import sqlite3
+import weakref
+import datetime
+import threading
+import contextlib
+
+from products import Product, KINDS, _kind
+from store import RentalStore
+from indexes import NameIndex
+
+COLUMNS = 'product_id, kind, name, price, buyable, rental_start, rental_weeks'
+
+# price and rental_weeks have no declared type, so ints and floats come back unchanged
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS products (
+    product_id BLOB PRIMARY KEY,
+    kind INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    price,
+    buyable INTEGER NOT NULL,
+    rental_start INTEGER,
+    rental_weeks,
+    rental_end INTEGER
+);
+CREATE INDEX IF NOT EXISTS products_name ON products (name, rental_weeks);
+CREATE INDEX IF NOT EXISTS products_rental_end ON products (rental_end);
+CREATE INDEX IF NOT EXISTS products_price ON products (price);
+'''
+
+# statements are kept as constants so every connection compiles each one once and
+# reuses it from its statement cache
+INSERT = 'INSERT INTO products ({}, rental_end) VALUES (?, ?, ?, ?, ?, ?, ?, ?)'.format(COLUMNS)
+UPDATE_RENTAL = ('UPDATE products SET price = ?, buyable = ?, rental_start = ?, rental_weeks = ?, rental_end = ? '
+                 'WHERE product_id = ?')
+# claims of a unit only succeed while it is free, so two Product objects of one row
+# can never both rent or sell it
+CLAIM_RENTAL = ('UPDATE products SET rental_start = ?, rental_weeks = ?, rental_end = ? '
+                'WHERE product_id = ? AND rental_weeks IS NULL')
+DELETE = 'DELETE FROM products WHERE product_id = ?'
+DELETE_FREE = 'DELETE FROM products WHERE product_id = ? AND rental_weeks IS NULL'
+SELECT_BY_ID = 'SELECT {} FROM products WHERE product_id = ?'.format(COLUMNS)
+SELECT_BY_NAME = 'SELECT {} FROM products WHERE name = ? ORDER BY rowid'.format(COLUMNS)
+SELECT_FREE = 'SELECT {} FROM products WHERE name = ? AND rental_weeks IS NULL LIMIT 1'.format(COLUMNS)
+SELECT_ALL_FREE = 'SELECT {} FROM products WHERE name = ? AND rental_weeks IS NULL ORDER BY rowid'.format(COLUMNS)
+SELECT_NAMES = 'SELECT DISTINCT name FROM products'
+SELECT_ENDED = 'SELECT {} FROM products WHERE rental_end <= ? ORDER BY rental_end'.format(COLUMNS)
+COUNT_ALL = 'SELECT COUNT(*) FROM products'
+COUNT_NAME = 'SELECT COUNT(*) FROM products WHERE name = ?'
+COUNT_FREE = 'SELECT COUNT(*) FROM products WHERE name = ? AND rental_weeks IS NULL'
+COUNT_RENTED = 'SELECT COUNT(*) FROM products WHERE name = ? AND rental_weeks IS NOT NULL'
+COUNT_ALL_RENTED = 'SELECT COUNT(*) FROM products WHERE rental_end IS NOT NULL'
+REVENUE_DUE = ('SELECT TOTAL(price * rental_weeks) FROM products '
+               'WHERE rental_end BETWEEN ? AND ?')
+
+
+def _rental_end(start, weeks):
+    """Ordinal of the rental end, as Product.rental_end computes it."""
+    if start is None or weeks is None:
+        return None
+    return (start + datetime.timedelta(weeks=weeks)).toordinal()
+
+
+class SQLiteRentalStore(RentalStore):
+    """
+    RentalStore keeping its catalog in a SQLite database instead of in memory.
+
+    Products are materialized from rows when they are looked up and written back
+    whenever they change. An identity map makes sure that each row is represented by
+    at most one Product object while that object is in use, e.g. held by a Customer.
+    Reads use a pool of connections, writes are serialized on one of them. File
+    databases run in WAL mode, so readers do not wait for the writer.
+
+    The Customer interface (rent, buy, invoice) works unchanged. products builds a
+    list of the whole catalog and is only meant for small stores; use
+    iter_products() or pages() to stream large ones.
+
+    Args:
+        path (str, optional): Database file. Defaults to ':memory:', which uses a
+            single connection.
+        products (list, optional): Products to add. Defaults to none.
+        quiet (bool, optional): See RentalStore. Defaults to False.
+        pool_size (int, optional): Number of pooled connections. Defaults to 4.
+        clock (optional): See RentalStore. Defaults to the system clock.
+
+    """
+
+    # every rent, purchase and return is written to the database
+    _blocking_io = True
+
+    def __init__(self, path=':memory:', products=None, quiet=False, pool_size=4, clock=None):
+        assert isinstance(pool_size, int) and pool_size > 0, 'pool_size must be a positive int'
+        # the expiry index is only used to bill renters when their rentals end
+        self._init_shared(quiet, clock)
+        self._write_lock = threading.Lock()
+        self._identity = weakref.WeakValueDictionary()
+        self._identity_lock = threading.Lock()
+
+        if path == ':memory:':
+            pool_size = 1
+        self._pool = queue.Queue()
+        for _ in range(pool_size):
+            connection = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+            if path != ':memory:':
+                connection.execute('PRAGMA journal_mode = WAL')
+                connection.execute('PRAGMA synchronous = NORMAL')
+            self._pool.put(connection)
+        with self._connection() as connection:
+            connection.executescript(SCHEMA)
+        if products is not None:
+            self.extend(products)
+
+    def close(self):
+        """Close all pooled connections."""
+        for _ in range(self._pool.qsize()):
+            self._pool.get().close()
+
+    @contextlib.contextmanager
+    def _connection(self):
+        connection = self._pool.get()
+        try:
+            yield connection
+        finally:
+            self._pool.put(connection)
+
+    def _write(self, sql, parameters):
+        with self._write_lock, self._connection() as connection:
+            return connection.execute(sql, parameters).rowcount
+
+    def _query(self, sql, parameters=()):
+        with self._connection() as connection:
+            return connection.execute(sql, parameters).fetchall()
+
+    def _scalar(self, sql, parameters=()):
+        with self._connection() as connection:
+            return connection.execute(sql, parameters).fetchone()[0]
+
+    def _materialize(self, row):
+        """Return the Product for a row, reusing the object already in use if any."""
+        raw_id, kind, name, price, buyable, start, weeks = row
+        key = int.from_bytes(raw_id, 'big')
+        with self._identity_lock:
+            item = self._identity.get(key)
+            if item is None:
+                item = KINDS[kind]._from_row(name, price, bool(buyable), key)
+                if start is not None:
+                    item._start = datetime.date.fromordinal(start)
+                item._weeks = weeks
+                item._store = self
+                self._identity[key] = item
+        return item
+
+    def _refresh(self, item):
+        """Bring an outdated object of a row up to date after a lost claim, detaching it if the row is gone."""
+        rows = self._query(SELECT_BY_ID, (item._id.to_bytes(16, 'big'),))
+        if not rows:
+            with self._identity_lock:
+                if self._identity.get(item._id) is item:
+                    del self._identity[item._id]
+            item._store = None
+            return
+        item._buyable = bool(rows[0][4])
+        start, weeks = rows[0][5:]
+        item._start = None if start is None else datetime.date.fromordinal(start)
+        item._weeks = weeks
+
+    def _row(self, item):
+        start = item.rental_start.toordinal() if item.rental_start else None
+        return (item._id.to_bytes(16, 'big'), _kind(item), item.name, item.price_per_week,
+                bool(item.buyable), start, item.rental_time,
+                _rental_end(item.rental_start, item.rental_time))
+
+    @property
+    def products(self):
+        """list: All products of the store, materialized."""
+        return list(self.iter_products())
+
+    def __len__(self):
+        """Return the number of products in the store."""
+        return self._scalar(COUNT_ALL)
+
+    def __add__(self, item):
+        """Add a product to the store."""
+        assert isinstance(item, Product), "Only instances of Product can be added to the store"
+        self.extend([item])
+        if not self.quiet:
+            print('{} is added to the store'.format(item.__repr__()))
+        return self
+
+    def extend(self, items):
+        """Add many products to the store in one transaction, without printing."""
+        for item in items:
+            assert isinstance(item, Product), "Only instances of Product can be added to the store"
+        with self._catalog_lock:
+            with self._write_lock, self._connection() as connection:
+                connection.execute('BEGIN')
+                try:
+                    connection.executemany(INSERT, (self._row(item) for item in items))
+                except sqlite3.IntegrityError:
+                    connection.execute('ROLLBACK')
+                    raise AssertionError("Product is already part of the store")
+                connection.execute('COMMIT')
+            # logged once the rows are in, so a rejected batch leaves no events behind
+            for item in items:
+                self._log_product('add', item)
+            with self._identity_lock:
+                for item in items:
+                    item._store = self
+                    self._identity[item._id] = item
+            if self._name_index is not None:
+                for item in items:
+                    self._name_index.add(item.name)
+        return self
+
+    def extend_rows(self, rows):
+        """Insert validated (cls, name, price_per_week, buyable) rows; products are only created to log them."""
+        rows = [(cls.id_generator.new_id(), cls, name, price_per_week, buyable)
+                for cls, name, price_per_week, buyable in rows]
+        with self._catalog_lock:
+            with self._write_lock, self._connection() as connection:
+                connection.execute('BEGIN')
+                connection.executemany(INSERT, (
+                    (key.to_bytes(16, 'big'), KINDS.index(cls), name, price_per_week, bool(buyable), None, None, None)
+                    for key, cls, name, price_per_week, buyable in rows))
+                connection.execute('COMMIT')
+            if self.event_log is not None:
+                for key, cls, name, price_per_week, buyable in rows:
+                    self._log_product('add', cls._from_row(name, price_per_week, buyable, key))
+            if self._name_index is not None:
+                for _, _, name, _, _ in rows:
+                    self._name_index.add(name)
+        return self
+
+    def discard(self, item):
+        """Remove exactly this product from the store, see RentalStore.discard()."""
+        return self._remove(item, DELETE)
+
+    def _sell(self, item):
+        """Delete the row of a sold unit, unless another thread rented or sold it first."""
+        return self._remove(item, DELETE_FREE)
+
+    def _remove(self, item, sql):
+        with self._catalog_lock:
+            if item._store is not self:
+                return False
+            if not self._write(sql, (item._id.to_bytes(16, 'big'),)):
+                self._refresh(item)
+                return False
+            self._log('remove', id=format(item._id, 'x'))
+            self._renters.pop(item._id, None)
+            self._bookings.pop(item._id, None)
+            with self._identity_lock:
+                self._identity.pop(item._id, None)
+            if self._name_index is not None and not self.count(item.name):
+                self._name_index.remove(item.name)
+            item._store = None
+        return True
+
+    def _name_trie(self):
+        """Return the NameIndex, building it from the distinct names on first use."""
+        with self._catalog_lock:
+            if self._name_index is None:
+                self._name_index = NameIndex(name for name, in self._query(SELECT_NAMES))
+        return self._name_index
+
+    def get_by_id(self, product_id):
+        """Return the product with the given product_id, or None if it is not in the store."""
+        key = Product.id_key(product_id)
+        if key is None:
+            return None
+        rows = self._query(SELECT_BY_ID, (key.to_bytes(16, 'big'),))
+        return self._materialize(rows[0]) if rows else None
+
+    def _lookup(self, key):
+        rows = self._query(SELECT_BY_ID, (key.to_bytes(16, 'big'),))
+        return self._materialize(rows[0]) if rows else None
+
+    def get_by_name(self, name):
+        """Return a list of all products in the store with the given name."""
+        return [self._materialize(row) for row in self._query(SELECT_BY_NAME, (name,))]
+
+    def get_available(self, name):
+        """Return any free unit with the given name, or None if all units are rented."""
+        rows = self._query(SELECT_FREE, (name,))
+        return self._materialize(rows[0]) if rows else None
+
+    def _free_units(self, name):
+        return [self._materialize(row) for row in self._query(SELECT_ALL_FREE, (name,))]
+
+    def count(self, name):
+        """Return the number of units with the given name in the store."""
+        return self._scalar(COUNT_NAME, (name,))
+
+    def available_count(self, name):
+        """Return the number of free units with the given name."""
+        return self._scalar(COUNT_FREE, (name,))
+
+    def rented_count(self, name):
+        """Return the number of rented units with the given name."""
+        return self._scalar(COUNT_RENTED, (name,))
+
+    @property
+    def active_rentals(self):
+        """int: Number of units in the store that are currently rented."""
+        return self._scalar(COUNT_ALL_RENTED)
+
+    def ended_items(self):
+        """Return all rented units whose rental period has ended, using the rental_end index."""
+        rows = self._query(SELECT_ENDED, (self.clock.today().toordinal(),))
+        return [self._materialize(row) for row in rows]
+
+    def revenue_due(self, first_day, last_day):
+        """
+        Sum of price_per_week * rental_time over rentals ending between two days.
+
+        Args:
+            first_day (datetime.date): First day of the period, inclusive.
+            last_day (datetime.date): Last day of the period, inclusive.
+
+        Returns:
+            float: Revenue of the rentals that end in the period.
+        """
+        return self._scalar(REVENUE_DUE, (first_day.toordinal(), last_day.toordinal()))
+
+    def iter_products(self, name=None, kind=None, available=None, buyable=None, offset=0, limit=None,
+                      page_size=1000):
+        """
+        Stream the catalog, see RentalStore.iter_products().
+
+        Rows are fetched page_size at a time and no connection is held between pages.
+        """
+        conditions, parameters = self._conditions(name, kind, available, buyable)
+        sql = 'SELECT rowid, {} FROM products WHERE {} ORDER BY rowid LIMIT ?'.format(
+            COLUMNS, ' AND '.join(['rowid > ?'] + conditions))
+
+        last_rowid = 0
+        while limit is None or limit > 0:
+            rows = self._query(sql, [last_rowid] + parameters + [page_size])
+            if not rows:
+                return
+            last_rowid = rows[-1][0]
+            for row in rows:
+                if offset:
+                    offset -= 1
+                    continue
+                if limit is not None:
+                    if limit <= 0:
+                        return
+                    limit -= 1
+                yield self._materialize(row[1:])
+
+    def query(self, kind=None, available=None, buyable=None, min_price=None, max_price=None,
+              descending=False, offset=0, limit=None):
+        """Search the catalog by facets and price range, see RentalStore.query(), using the price index."""
+        assert isinstance(offset, int) and offset >= 0, 'offset must be a non-negative int'
+        assert limit is None or (isinstance(limit, int) and limit >= 0), 'limit must be a non-negative int'
+        conditions, parameters = self._conditions(None, kind, available, buyable)
+        if min_price is not None:
+            conditions.append('price >= ?')
+            parameters.append(min_price)
+        if max_price is not None:
+            conditions.append('price <= ?')
+            parameters.append(max_price)
+        order = 'DESC' if descending else 'ASC'
+        sql = 'SELECT {} FROM products WHERE {} ORDER BY price IS NULL, price {}, rowid {} LIMIT ? OFFSET ?'.format(
+            COLUMNS, ' AND '.join(conditions) or '1', order, order)
+        rows = self._query(sql, parameters + [-1 if limit is None else limit, offset])
+        return [self._materialize(row) for row in rows]
+
+    def _conditions(self, name, kind, available, buyable):
+        """SQL conditions and their parameters for the filters of iter_products()."""
+        conditions = []
+        parameters = []
+        if name is not None:
+            conditions.append('name = ?')
+            parameters.append(name)
+        if kind is not None:
+            codes = [code for code, cls in enumerate(KINDS) if issubclass(cls, kind)]
+            conditions.append('kind IN ({})'.format(', '.join('?' * len(codes)) or 'NULL'))
+            parameters.extend(codes)
+        if available is not None:
+            conditions.append('rental_weeks IS NULL' if available else 'rental_weeks IS NOT NULL')
+        if buyable is not None:
+            conditions.append('buyable = ?')
+            parameters.append(bool(buyable))
+        return conditions, parameters
+
+    def _claim_rental(self, item, start, rental_time):
+        """Write the rental if the row is still free; False if another thread took the unit."""
+        claimed = self._write(CLAIM_RENTAL, (start.toordinal(), rental_time, _rental_end(start, rental_time),
+                                             item._id.to_bytes(16, 'big')))
+        if not claimed:
+            self._refresh(item)
+        return bool(claimed)
+
+    def _product_rented(self, item):
+        """Called by Product.rent() after _claim_rental() has written the rental."""
+        self._expiry.push(item)
+
+    def _product_released(self, item):
+        """Called by Product._release() to clear the rental in the database."""
+        self._renters.pop(item._id, None)
+        self._rental_changed(item)
+
+    def _rental_changed(self, item):
+        """Called by Product whenever its rental period, price or buyable flag changes."""
+        start = item.rental_start.toordinal() if item.rental_start else None
+        self._write(UPDATE_RENTAL, (item.price_per_week, bool(item.buyable), start, item.rental_time,
+                                    _rental_end(item.rental_start, item.rental_time),
+                                    item._id.to_bytes(16, 'big')))
+        if item.rental_end is None:
+            return
+        self._expiry.push(item)
+        renter = self._renters.get(item._id)
+        if renter is not None:
+            renter._rental_changed(item)
+
+    def _sweep(self):
+        """Bill the renters of all rentals that ended up to today."""
+        for item in self._expiry.pop_due(self.clock.today()):
+            renter = self._renters.get(item._id)
+            if renter is not None:
+                renter._sweep()
+
+    def _take_changes(self):
+        """Changes are written through to the database, there is nothing to collect."""
+        return {}
@@ -1,30 +1,135 @@
-from products import Product, Laptop, Phone
+import datetime
+import threading
+from products import Product, Laptop, Phone, _kind_name
+from expiry import ExpiryIndex
+from clock import SystemClock
+from indexes import CatalogIndex, NameIndex, paginate
+from reservations import IntervalList, Reservation, period
+from errors import ProductNotFoundError
 
 NoneType = type(None) 
 
+
+def _put(table, item):
+    """Add item to the {name: {_id: item}} table, returns True if it was not in it yet."""
+    units = table.setdefault(item.name, {})
+    added = item._id not in units
+    units[item._id] = item
+    return added
+
+
+def _drop(table, item):
+    """Remove item from the {name: {_id: item}} table, returns True if it was in it."""
+    units = table.get(item.name)
+    if units is None or units.pop(item._id, None) is None:
+        return False
+    if not units:
+        del table[item.name]
+    return True
+
+
 class RentalStore():
     """
     Container to store products.
     
     Args:
         products (list): List of products in store. Defaults to empty list.
+        quiet (bool, optional): If True, operations never print. Failures raise
+            errors.RentalError subclasses instead. Defaults to False.
+        clock (optional): Clock all rental dates are read from, e.g. a
+            clock.SimulatedClock. Defaults to clock.SystemClock().
+            
+    Attributes:
+        quiet (bool): Whether the store and its customers run silently.
+        clock: Clock of the store and its products and customers.
+        event_log (EventLog): Log every change is written to before it is applied,
+            set by EventLog.attach(). Defaults to None.
+            
+    Properties:
+        customers (list): Customers created for this store.
+        receivables (float): Outstanding amount of all customers for due rentals.
+        active_rentals (int): Number of units currently rented.
+        utilization (float): Share of the units in the store that are rented.
 
     """
-    def __init__(self, products=None):
+    
+    # whether operations wait for I/O even without an event log, see AsyncRentalStore
+    _blocking_io = False
+    
+    def __init__(self, products=None, quiet=False, clock=None):
         if isinstance(products, NoneType):
             products = []
         assert type(products) == list, "The input argument needs to be a list."
         for item in products:
             assert isinstance(item, Product), "only Product-type are allowed to be in rental store"
-        self.products = products
+        self._init_shared(quiet, clock)
+        self.products = []
+        
+        # hash indexes keyed by the compact Product._id for constant-time lookups,
+        # kept in sync by _index/_unindex
+        self._by_id = {}
+        self._by_name = {}
+        # position of every product in self.products by _id, so that a removal can
+        # swap the last product into its slot instead of scanning the list
+        self._positions = {}
+        # per-name pools of free and rented units, updated by the products themselves
+        self._available = {}
+        self._rented = {}
+        # units whose rental has ended are swept into _ended
+        self._ended = {}
+        # pool updates take the lock striped by name
+        self._name_locks = tuple(threading.Lock() for _ in range(64))
+        # products changed since the last snapshot by _id, None for removed ones
+        self._changes = {}
+        # price, type, buyable and availability indexes, built by the first query()
+        self._catalog_index = None
+        # nothing is logged yet, extend() only checks for duplicates and indexes
+        self.extend(products)
+            
+    def _init_shared(self, quiet, clock):
+        """Set up the state every store has, whatever keeps its catalog."""
+        self.quiet = quiet
+        self.event_log = None
+        self._set_clock(clock)
+        # rentals ordered by end date, and the customer holding each rental
+        self._expiry = ExpiryIndex()
+        self._renters = {}
+        # catalog changes (add, remove, purchase) take _catalog_lock; renting a unit
+        # only takes the product's own lock
+        self._catalog_lock = threading.RLock()
+        # trie of the names, built by the first name search
+        self._name_index = None
+        # booked future periods per unit by _id, guarded by the product's lock
+        self._bookings = {}
+        self._init_stats()
     
+    def _init_stats(self):
+        # running aggregates, updated by the store and its customers on every rent,
+        # extension, due transition and payment so that reading them is O(1)
+        self._customers = []
+        self._stats_lock = threading.Lock()
+        self._rented_total = 0
+        self._receivables = 0
+        self._due_total = 0
+        self._revenue = {}
+        
+    def _set_clock(self, clock):
+        self.clock = SystemClock() if clock is None else clock
+        # a simulated clock processes due rentals right after it is advanced
+        self.clock.subscribe(self._sweep)
+        
     @staticmethod
     def display_impressum():
         print('IMPRINT \nRentalStore GmbH \nDeposit Street 7 \n44321 Rent City')
        
-    def display_products(self):
-        """Displays Products with name, price per week and availability."""
-        for item in self.products: 
+    def display_products(self, **filters):
+        """
+        Displays Products with name, price per week and availability.
+        
+        Args:
+            **filters: Passed on to iter_products().
+        """
+        for item in self.iter_products(**filters): 
             print(
                 "Name: {}, Price per week: {:.2f}€, Available: {}, Buyable: {}".format(
                 item.name,
@@ -34,6 +139,603 @@ class RentalStore():
                 )
             )
             
+    def iter_products(self, name=None, kind=None, available=None, buyable=None, offset=0, limit=None):
+        """
+        Stream the catalog, optionally filtered and paginated.
+        
+        Args:
+            name (str, optional): Only units with this name, looked up in the name index.
+            kind (type, optional): Only instances of this Product class.
+            available (bool, optional): Filter on availability.
+            buyable (bool, optional): Filter on buyable flag.
+            offset (int, optional): Number of matching products to skip. Defaults to 0.
+            limit (int, optional): Maximum number of products to yield. Defaults to all.
+            
+        Yields:
+            Product: Matching products in catalog order.
+        """
+        if name is not None:
+            source = self._by_name.get(name, {}).values()
+            if available is not None:
+                pool = self._available if available else self._rented
+                source = pool.get(name, {}).values()
+        else:
+            source = self.products
+        for item in source:
+            if kind is not None and not isinstance(item, kind):
+                continue
+            if available is not None and item.available != available:
+                continue
+            if buyable is not None and item.buyable != buyable:
+                continue
+            if offset:
+                offset -= 1
+                continue
+            if limit is not None:
+                if limit <= 0:
+                    return
+                limit -= 1
+            yield item
+            
+    def query(self, kind=None, available=None, buyable=None, min_price=None, max_price=None,
+              descending=False, offset=0, limit=None):
+        """
+        Search the catalog by facets and price range, sorted by price.
+        
+        The first query builds an indexes.CatalogIndex, which the store keeps
+        current from then on, so queries only touch the products in the requested
+        price range and facets.
+        
+        Args:
+            kind (type, optional): Only instances of this Product class.
+            available (bool, optional): Filter on availability.
+            buyable (bool, optional): Filter on buyable flag.
+            min_price (float, optional): Lowest price per week, inclusive.
+            max_price (float, optional): Highest price per week, inclusive.
+            descending (bool, optional): Most expensive first. Defaults to False.
+            offset (int, optional): Number of matching products to skip. Defaults to 0.
+            limit (int, optional): Maximum number of products to return. Defaults to all.
+            
+        Returns:
+            list: Matching products sorted by price per week; products without a
+            price come last.
+        """
+        if self._catalog_index is None:
+            with self._catalog_lock:
+                if self._catalog_index is None:
+                    self._catalog_index = CatalogIndex(self.products)
+        return paginate(self._catalog_index.query(kind, available, buyable, min_price, max_price, descending),
+                        offset, limit)
+            
+    def search_names(self, prefix, limit=10):
+        """
+        Type-ahead search: product names starting with prefix, ignoring case.
+        
+        Args:
+            prefix (str): Typed prefix.
+            limit (int, optional): Maximum number of names. Defaults to 10.
+            
+        Returns:
+            list: (name, available_count, count) tuples in alphabetical order.
+        """
+        return [(name, self.available_count(name), self.count(name))
+                for name in self._name_trie().prefix(prefix, limit)]
+    
+    def suggest_names(self, name, max_distance=2, limit=10):
+        """
+        Product names within an edit distance of a possibly misspelled name.
+        
+        Args:
+            name (str): Name as typed.
+            max_distance (int, optional): Largest number of inserted, deleted or
+                replaced characters. Defaults to 2.
+            limit (int, optional): Maximum number of names. Defaults to 10.
+            
+        Returns:
+            list: (name, available_count, count) tuples, closest names first.
+        """
+        return [(match, self.available_count(match), self.count(match))
+                for match, _ in self._name_trie().similar(name, max_distance, limit)]
+    
+    def _name_trie(self):
+        """Return the NameIndex, building it on first use."""
+        if self._name_index is None:
+            with self._catalog_lock:
+                if self._name_index is None:
+                    self._name_index = NameIndex(list(self._by_name))
+        return self._name_index
+            
+    def pages(self, page_size=20, **filters):
+        """
+        Stream the catalog page by page.
+        
+        Args:
+            page_size (int, optional): Products per page. Defaults to 20.
+            **filters: Passed on to iter_products().
+            
+        Yields:
+            list: Pages of at most page_size products.
+        """
+        assert isinstance(page_size, int) and page_size > 0, 'page_size must be a positive int'
+        page = []
+        for item in self.iter_products(**filters):
+            page.append(item)
+            if len(page) == page_size:
+                yield page
+                page = []
+        if page:
+            yield page
+            
+    def get_by_id(self, product_id):
+        """Return the product with the given product_id, or None if it is not in the store."""
+        key = Product.id_key(product_id)
+        if key is None:
+            return None
+        return self._by_id.get(key)
+    
+    def get_by_name(self, name):
+        """Return a list of all products in the store with the given name."""
+        return list(self._by_name.get(name, {}).values())
+    
+    def _lookup(self, key):
+        """Return the product with the compact ID key, or None if it is not in the store."""
+        return self._by_id.get(key)
+    
+    def get_available(self, name):
+        """Return any free unit with the given name, or None if all units are rented."""
+        with self._name_lock(name):
+            units = self._available.get(name)
+            if not units:
+                return None
+            return next(iter(units.values()))
+    
+    def rent_available(self, name, rental_time):
+        """
+        Rent any free unit with the given name.
+        
+        Safe to call from many threads: a unit taken by another thread in the meantime
+        is skipped and the next free unit is tried.
+        
+        Args:
+            name (str): Product name.
+            rental_time (int): Rental time in weeks.
+            
+        Returns:
+            Product: The rented unit, or None if no unit is free.
+        """
+        return self._claim(name, lambda item: item.rent(rental_time))
+                
+    def sell_available(self, name):
+        """
+        Remove a free, buyable unit with the given name from the store.
+        
+        Safe to call from many threads, each unit is sold at most once.
+        
+        Args:
+            name (str): Product name.
+            
+        Returns:
+            Product: The sold unit, or None if no free unit is buyable.
+        """
+        def sell(item):
+            if not item.buyable or not item.available or self._bookings.get(item._id):
+                return False
+            return self._sell(item)
+        
+        return self._claim(name, sell)
+    
+    def _claim(self, name, claim):
+        """
+        Apply claim(item) to a free unit with the given name under its lock until it succeeds.
+        
+        A unit taken by another thread in the meantime is skipped and the next free
+        unit is tried. If a free unit is refused because it is reserved, the other
+        free units are tried once each.
+        
+        Returns:
+            Product: The claimed unit, or None if no free unit could be claimed.
+        """
+        while True:
+            item = self.get_available(name)
+            if item is None:
+                return None
+            with item._lock:
+                if item._store is self and claim(item):
+                    return item
+                if item._store is self and item.available:
+                    if not self._bookings.get(item._id):
+                        return None
+                    break
+        for item in self._free_units(name):
+            with item._lock:
+                if item._store is self and item.available and claim(item):
+                    return item
+        return None
+    
+    def _free_units(self, name):
+        """Return all free units with the given name."""
+        with self._name_lock(name):
+            return list(self._available.get(name, {}).values())
+    
+    def reserve_available(self, name, start, rental_time, customer=None):
+        """
+        Reserve any unit with the given name for a future rental period.
+        
+        A unit can be reserved if the period overlaps neither its current rental
+        nor another reservation. Each check is a bisection of the unit's booked
+        periods, see reservations.IntervalList.
+        
+        Args:
+            name (str): Product name.
+            start (datetime.date): First day of the rental.
+            rental_time (int): Rental time in weeks.
+            customer (Customer, optional): Customer holding the reservation.
+            
+        Returns:
+            Reservation: The booking, or None if no unit is free for the whole period.
+        """
+        for item in self.get_by_name(name):
+            if isinstance(item, Laptop):
+                assert rental_time <= Laptop.max_rental_time, \
+                    'Rental time must be below {} weeks'.format(Laptop.max_rental_time)
+            reservation = self._book(item, start, rental_time, customer)
+            if reservation is not None:
+                return reservation
+        return None
+    
+    def earliest_slot(self, name, rental_time, not_before=None):
+        """
+        Find the first day any unit with the given name is free for a rental period.
+        
+        Units are assumed to be back when their current rental ends.
+        
+        Args:
+            name (str): Product name.
+            rental_time (int): Rental time in weeks.
+            not_before (datetime.date, optional): Earliest acceptable start. Defaults to today.
+            
+        Returns:
+            tuple: (start date, unit), or None if no unit with that name can be
+            rented that long.
+        """
+        assert isinstance(rental_time, int) and rental_time > 0, 'rental_time must be a positive int'
+        today = self.clock.today()
+        first = max(today, not_before or today).toordinal()
+        length = 7 * rental_time
+        best = None
+        for item in self.get_by_name(name):
+            if isinstance(item, Laptop) and rental_time > Laptop.max_rental_time:
+                continue
+            with item._lock:
+                day = first
+                if item.rental_end is not None:
+                    day = max(day, item.rental_end.toordinal())
+                bookings = self._bookings.get(item._id)
+                if bookings:
+                    day = bookings.next_free(day, length)
+            if best is None or day < best[0]:
+                best = (day, item)
+                if day == first:
+                    break
+        if best is None:
+            return None
+        return datetime.date.fromordinal(best[0]), best[1]
+    
+    def reservations(self, item):
+        """Return the reservations of a unit in chronological order."""
+        with item._lock:
+            return list(self._bookings.get(item._id, ()))
+    
+    def _can_book(self, item, start, rental_time):
+        """Whether the period overlaps no reservation of item; call with the item's lock held."""
+        bookings = self._bookings.get(item._id)
+        return not bookings or not bookings.conflicts(*period(start, rental_time))
+    
+    def _book(self, item, start, rental_time, customer=None):
+        """Reserve item for the period if it is free then. Returns the Reservation or None."""
+        with item._lock:
+            if item._store is not self or not self._can_book(item, start, rental_time):
+                return None
+            if item.rental_end is not None and item.rental_end > start:
+                return None
+            self._log('reserve', id=format(item._id, 'x'), customer=getattr(customer, 'name', None),
+                      start=start.toordinal(), weeks=rental_time)
+            reservation = Reservation(item, start, rental_time, customer)
+            first, end = period(start, rental_time)
+            self._bookings.setdefault(item._id, IntervalList()).add(first, end, reservation)
+            return reservation
+        
+    def _unbook(self, reservation):
+        """Cancel a reservation. Returns True if it was booked."""
+        item = reservation.item
+        with item._lock:
+            bookings = self._bookings.get(item._id)
+            if bookings is None:
+                return False
+            self._log('cancel', id=format(item._id, 'x'), customer=getattr(reservation.customer, 'name', None),
+                      start=reservation.start.toordinal())
+            if not bookings.remove(reservation.start.toordinal(), reservation):
+                return False
+            if not bookings:
+                del self._bookings[item._id]
+            return True
+    
+    def count(self, name):
+        """Return the number of units with the given name in the store."""
+        return len(self._by_name.get(name, ()))
+    
+    def available_count(self, name):
+        """Return the number of free units with the given name."""
+        return len(self._available.get(name, ()))
+    
+    def rented_count(self, name):
+        """Return the number of rented units with the given name."""
+        return len(self._rented.get(name, ()))
+    
+    def ended_items(self):
+        """Return all rented units whose rental period has ended."""
+        self._sweep()
+        return list(self._ended.values())
+    
+    @property
+    def customers(self):
+        """list: Customers created for this store."""
+        return list(self._customers)
+    
+    @property
+    def receivables(self):
+        """float: Outstanding amount of all customers for due rentals."""
+        self._sweep()
+        return self._receivables
+    
+    @property
+    def active_rentals(self):
+        """int: Number of units in the store that are currently rented."""
+        return self._rented_total
+    
+    @property
+    def utilization(self):
+        """float: Share of the units in the store that are rented, 0 for an empty store."""
+        total = len(self)
+        return self.active_rentals / total if total else 0.0
+    
+    def revenue_by_type(self):
+        """
+        Return the rental payments received so far by product type.
+        
+        Returns:
+            dict: {'Laptop': amount, 'Phone': amount, ...} for the types with payments.
+        """
+        with self._stats_lock:
+            return dict(self._revenue)
+        
+    def stats(self):
+        """Return all running aggregates as one dict, e.g. for a dashboard."""
+        return {'customers': len(self._customers),
+                'products': len(self),
+                'active_rentals': self.active_rentals,
+                'utilization': self.utilization,
+                'receivables': self.receivables,
+                'revenue_by_type': self.revenue_by_type()}
+    
+    def extend(self, items):
+        """
+        Add many products to the store in one operation, without printing.
+        
+        Args:
+            items (list): Products to add.
+            
+        Returns:
+            RentalStore: The store itself.
+        """
+        with self._catalog_lock:
+            keys = set()
+            for item in items:
+                assert isinstance(item, Product), "Only instances of Product can be added to the store"
+                assert item._id not in self._by_id, "Product is already part of the store"
+                assert item._id not in keys, "Product is added twice"
+                keys.add(item._id)
+            for item in items:
+                self._log_product('add', item)
+            for item in items:
+                self._append(item)
+        return self
+    
+    def extend_rows(self, rows):
+        """
+        Add products given as already validated rows.
+        
+        Args:
+            rows (list): (cls, name, price_per_week, buyable) tuples, cls being a
+                Product class.
+                
+        Returns:
+            RentalStore: The store itself.
+        """
+        return self.extend([cls._from_row(name, price_per_week, buyable)
+                            for cls, name, price_per_week, buyable in rows])
+    
+    def discard(self, item):
+        """
+        Remove exactly this product from the store, e.g. after a purchase.
+        
+        Args:
+            item (Product): Product to remove.
+            
+        Returns:
+            True if the product was part of the store, False otherwise.
+        """
+        with self._catalog_lock:
+            if item._id not in self._by_id:
+                return False
+            self._log('remove', id=format(item._id, 'x'))
+            self._pop(item)
+            self._unindex(item)
+        return True
+    
+    def _append(self, item):
+        self._positions[item._id] = len(self.products)
+        self.products.append(item)
+        self._index(item)
+        
+    def _pop(self, item):
+        # O(1) removal: the last product takes the place of the removed one
+        position = self._positions.pop(item._id)
+        last = self.products.pop()
+        if last is not item:
+            self.products[position] = last
+            self._positions[last._id] = position
+    
+    def _name_lock(self, name):
+        return self._name_locks[hash(name) % len(self._name_locks)]
+    
+    def _index(self, item):
+        self._by_id[item._id] = item
+        self._mark_changed(item)
+        with self._name_lock(item.name):
+            if item.name not in self._by_name and self._name_index is not None:
+                self._name_index.add(item.name)
+            _put(self._by_name, item)
+            rented = _put(self._available if item.available else self._rented, item) and not item.available
+        if rented:
+            self._count_rented(1)
+        if item.rental_end is not None:
+            self._expiry.push(item)
+        if self._catalog_index is not None:
+            self._catalog_index.add(item)
+        item._store = self
+    
+    def _unindex(self, item):
+        del self._by_id[item._id]
+        self._changes[item._id] = None
+        with self._name_lock(item.name):
+            _drop(self._by_name, item)
+            _drop(self._available, item)
+            rented = _drop(self._rented, item)
+            if item.name not in self._by_name and self._name_index is not None:
+                self._name_index.remove(item.name)
+        if rented:
+            self._count_rented(-1)
+        self._ended.pop(item._id, None)
+        self._renters.pop(item._id, None)
+        self._bookings.pop(item._id, None)
+        if self._catalog_index is not None:
+            self._catalog_index.remove(item)
+        item._store = None
+        
+    def _claim_rental(self, item, start, rental_time):
+        """
+        Called by Product.rent() with the product's lock held, before the rental is applied.
+        
+        Returns False if the unit cannot be rented after all. The in-memory pools are
+        guarded by the product's lock, so a RentalStore always grants the claim.
+        """
+        return True
+    
+    def _sell(self, item):
+        """Remove a free unit sold by sell_available(), called with its lock held. Returns True if sold."""
+        return self.discard(item)
+        
+    def _product_rented(self, item):
+        """Called by Product.rent() to move the unit out of the free pool."""
+        with self._name_lock(item.name):
+            _drop(self._available, item)
+            rented = _put(self._rented, item)
+        if rented:
+            self._count_rented(1)
+        self._expiry.push(item)
+        self._mark_changed(item)
+        if self._catalog_index is not None:
+            self._catalog_index.update(item)
+        
+    def _product_released(self, item):
+        """Called by Product._release() to move the unit back into the free pool."""
+        with self._name_lock(item.name):
+            released = _drop(self._rented, item)
+            _put(self._available, item)
+        if released:
+            self._count_rented(-1)
+        self._ended.pop(item._id, None)
+        self._renters.pop(item._id, None)
+        self._mark_changed(item)
+        if self._catalog_index is not None:
+            self._catalog_index.update(item)
+        
+    def _rental_changed(self, item):
+        """Called by Product whenever its rental period, price or buyable flag changes."""
+        self._mark_changed(item)
+        if self._catalog_index is not None:
+            self._catalog_index.update(item)
+        if item.rental_end is None:
+            return
+        if item.rental_end > self.clock.today():
+            self._ended.pop(item._id, None)
+        self._expiry.push(item)
+        renter = self._renters.get(item._id)
+        if renter is not None:
+            renter._rental_changed(item)
+            
+    def _set_renter(self, item, customer):
+        """Register the customer holding the rental of item."""
+        self._renters[item._id] = customer
+        
+    def _add_customer(self, customer):
+        """Called by Customer.__init__ to be included in the aggregates."""
+        with self._stats_lock:
+            self._customers.append(customer)
+            
+    def _count_rented(self, delta):
+        with self._stats_lock:
+            self._rented_total += delta
+            
+    def _receivable_changed(self, amount, count):
+        """Called by a Customer when count rentals worth amount become due (or stop being due if negative)."""
+        with self._stats_lock:
+            self._receivables += amount
+            self._due_total += count
+            if not self._due_total:
+                self._receivables = 0  # no rounding residue once nothing is due
+                
+    def _rental_paid(self, kind, amount):
+        """Called by a Customer when a rental of a product of type kind, see _kind_name(), is paid."""
+        with self._stats_lock:
+            self._revenue[kind] = self._revenue.get(kind, 0) + amount
+        
+    def _log(self, op, **fields):
+        if self.event_log is not None:
+            self.event_log.append(op, fields)
+            
+    def _log_product(self, op, item):
+        """Log the complete state of item, e.g. when it is added."""
+        if self.event_log is not None:
+            self.event_log.append(op, {
+                'id': format(item._id, 'x'),
+                'kind': _kind_name(item),
+                'name': item.name,
+                'price': item.price_per_week,
+                'buyable': item.buyable,
+                'start': item.rental_start.toordinal() if item.rental_start else None,
+                'weeks': item.rental_time})
+            
+    def _mark_changed(self, item):
+        """Record that item changed since the last snapshot."""
+        self._changes[item._id] = item
+        
+    def _take_changes(self):
+        """Return and reset the products changed since the last call."""
+        with self._catalog_lock:
+            changes, self._changes = self._changes, {}
+        return changes
+        
+    def _sweep(self):
+        """Move all rentals that ended up to today into _ended and bill their renters."""
+        for item in self._expiry.pop_due(self.clock.today()):
+            if self._lookup(item._id) is item:
+                self._ended[item._id] = item
+            renter = self._renters.get(item._id)
+            if renter is not None:
+                renter._sweep()
+            
     def __len__(self):
         """Return the number of products in the store."""
         return len(self.products)
@@ -42,18 +744,28 @@ class RentalStore():
         """Add a product to the store."""
         assert isinstance(item, Product), "Only instances of Product can be added to the store"
         
-        self.products.append(item)
-        print('{} is added to the store'.format(item.__repr__()))
+        with self._catalog_lock:
+            assert item._id not in self._by_id, "Product is already part of the store"
+            self._log_product('add', item)
+            self._append(item)
+        if not self.quiet:
+            print('{} is added to the store'.format(item.__repr__()))
         return self
             
     def __sub__(self, item):
         """Remove a product from the store."""
         assert isinstance(item, Product), "Only instances of Product can be removed from the store"
         
-        for product in self.products:
-            if product.name == item.name:
-                self.products.remove(product)
+        # prefer the exact unit, otherwise any unit with the same name
+        with self._catalog_lock:
+            if self.discard(item):
+                return self
+            units = self.get_by_name(item.name)
+            if units:
+                self.discard(units[0])
                 return self
             
+        if self.quiet:
+            raise ProductNotFoundError(item.name)
         print('{} cannot be removed, as it is not part of the store\'s products'.format(item.__repr__()))
         return self
\ No newline at end of file
@@ -0,0 +1,77 @@
+import pytest
+import asyncio
+import datetime
+import threading
+
+from async_store import AsyncRentalStore, AsyncCustomer
+from store import RentalStore
+from sqlite_store import SQLiteRentalStore
+from products import Laptop, Phone
+from errors import ProductUnavailableError, ProductNotFoundError
+
+
+@pytest.fixture
+def store():
+    """Fixture for a quiet RentalStore with ten laptops and one phone."""
+    out = RentalStore([Laptop('Test Laptop', 10) for _ in range(10)] + [Phone('Test Phone', 5)], quiet=True)
+    return out
+
+
+def test_async_rent_many_clients(store):
+    """Test that concurrent coroutines rent each unit exactly once."""
+    async def main():
+        async with AsyncRentalStore(store, workers=4, queue_size=3) as front:
+            customers = [AsyncCustomer('Customer {}'.format(i), front) for i in range(25)]
+            return await asyncio.gather(*(customer.rent('Test Laptop', 2) for customer in customers),
+                                        return_exceptions=True)
+        
+    results = asyncio.run(main())
+    rented = [result for result in results if isinstance(result, Laptop)]
+    assert len(rented) == 10
+    assert len({item._id for item in rented}) == 10
+    assert sum(isinstance(result, ProductUnavailableError) for result in results) == 15
+    
+    
+def test_async_store_requires_quiet_store():
+    """Test that a store printing its failures is not wrapped, nor switched to quiet."""
+    store = RentalStore([Laptop('Test Laptop', 10)])
+    with pytest.raises(AssertionError):
+        AsyncRentalStore(store)
+    assert not store.quiet
+    
+    
+def test_async_buy_and_pay(store):
+    """Test buy and pay_invoice through the async front-end."""
+    async def main():
+        async with AsyncRentalStore(store) as front:
+            customer = AsyncCustomer('Tina Tester', front)
+            phone = await customer.buy('Test Phone')
+            with pytest.raises(ProductNotFoundError):
+                await customer.buy('Test Phone')
+            laptop = await customer.rent('Test Laptop', 2)
+            laptop._rental_start = datetime.date.today() - datetime.timedelta(weeks=3)
+            await customer.pay_invoice(customer.invoice)
+            return customer, phone, laptop
+        
+    customer, phone, laptop = asyncio.run(main())
+    assert customer.customer.owned_items == [phone]
+    assert customer.customer.paid_items == [laptop]
+    assert customer.invoice == 0
+    
+    
+def test_async_blocking_store_runs_in_executor():
+    """Test that operations on a SQLite store run off the event loop and still rent each unit once."""
+    store = SQLiteRentalStore(products=[Laptop('Test Laptop', 10) for _ in range(5)], quiet=True)
+    
+    async def main():
+        async with AsyncRentalStore(store, workers=4) as front:
+            customers = [AsyncCustomer('Customer {}'.format(i), front) for i in range(8)]
+            results = await asyncio.gather(*(customer.rent('Test Laptop', 2) for customer in customers),
+                                           return_exceptions=True)
+            return results, await front.submit(threading.get_ident)
+        
+    results, worker_thread = asyncio.run(main())
+    assert worker_thread != threading.get_ident()
+    assert len({item._id for item in results if isinstance(item, Laptop)}) == 5
+    assert sum(isinstance(result, ProductUnavailableError) for result in results) == 3
+    store.close()
@@ -0,0 +1,73 @@
+import pytest
+import datetime
+
+from clock import SimulatedClock
+from store import RentalStore
+from columnar import ColumnarRentalStore
+from customer import Customer
+from eventlog import EventLog, replay
+from snapshot import Snapshot, save_snapshot
+from products import Laptop, Phone
+
+
+@pytest.fixture
+def clock():
+    """Fixture for a simulated clock starting on a fixed day."""
+    return SimulatedClock(datetime.date(2024, 1, 1))
+
+
+def test_simulated_clock_advance(clock):
+    """Test that the clock only moves forward when advanced."""
+    assert clock.today() == datetime.date(2024, 1, 1)
+    assert clock.advance(days=3, weeks=1) == datetime.date(2024, 1, 11)
+    assert clock.today() == datetime.date(2024, 1, 11)
+    with pytest.raises(AssertionError):
+        clock.advance(days=-1)
+        
+        
+@pytest.mark.parametrize('store_class', [RentalStore, ColumnarRentalStore])
+def test_store_follows_clock(clock, store_class):
+    """Test that rentals start on the clock's day and are billed once it passes their end."""
+    store = store_class([Laptop('Test Laptop', 10), Phone('Test Phone', 5)], quiet=True, clock=clock)
+    customer = Customer('Tina Tester', store)
+    laptop = customer.rent('Test Laptop', 2)
+    customer.rent('Test Phone', 4)
+    assert laptop.rental_start == datetime.date(2024, 1, 1)
+    
+    clock.advance(days=13)
+    assert store.receivables == 0
+    assert customer.due_items == []
+    clock.advance(days=1)
+    assert store.receivables == 20
+    assert customer.due_items == [laptop]
+    assert store.ended_items() == [laptop]
+    clock.advance(weeks=2)
+    assert customer.invoice == 40
+    
+    
+def test_advance_processes_due_rentals(clock):
+    """Test that advancing the clock bills all rentals that ended as one batch."""
+    store = RentalStore([Laptop('Test Laptop', 1) for _ in range(100)], quiet=True, clock=clock)
+    customer = Customer('Tina Tester', store)
+    customer.rent_many([('Test Laptop', 1 + i % 4) for i in range(100)])
+    clock.advance(weeks=2)
+    assert customer._balance == 25 * 1 + 25 * 2  # billed without reading invoice
+    assert len(customer._due) == 50
+    
+    
+def test_rebuilt_store_keeps_clock(clock, tmp_path):
+    """Test that replay() and Snapshot.load() hand the clock to the rebuilt store."""
+    store = RentalStore([Laptop('Test Laptop', 10)], quiet=True, clock=clock)
+    path = str(tmp_path / 'events.log')
+    with EventLog(path) as log:
+        log.attach(store)
+        Customer('Tina Tester', store).rent('Test Laptop', 1)
+    save_snapshot(str(tmp_path / 'store.snapshot'), store, store.customers)
+    clock.advance(weeks=1)
+    
+    replayed, (customer,) = replay(path, clock=clock)
+    with Snapshot(str(tmp_path / 'store.snapshot')) as snapshot:
+        loaded, (loaded_customer,) = snapshot.load(quiet=True, clock=clock)
+    for rebuilt, holder in ((replayed, customer), (loaded, loaded_customer)):
+        assert rebuilt.clock is clock
+        assert holder.invoice == 10
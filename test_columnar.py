@@ -0,0 +1,113 @@
+import pytest
+import datetime
+
+import columnar
+from columnar import ColumnarRentalStore
+from customer import Customer
+from products import Product, Laptop, Phone
+
+
+@pytest.fixture
+def store():
+    """Fixture for a ColumnarRentalStore with laptops and phones."""
+    out = ColumnarRentalStore([
+        Laptop('Test Laptop A', 15),
+        Laptop('Test Laptop B', 25),
+        Phone('Test Phone A', 5.2),
+        Phone('Test Phone B', 8, buyable=False)
+    ])
+    return out
+
+
+@pytest.fixture(params=['numpy', 'python'])
+def backend(request, monkeypatch):
+    """Run the queries with and without NumPy."""
+    if request.param == 'numpy':
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(columnar, 'np', None)
+    return request.param
+
+
+def test_columnar_views_behave_like_products(store):
+    """Test that the products list API works through the row views."""
+    laptop = store.products[0]
+    assert isinstance(laptop, Laptop)
+    assert laptop.name == 'Test Laptop A'
+    assert laptop.price_per_week == 15
+    assert laptop.available
+    assert store.get_by_id(laptop.product_id) is laptop
+    
+    laptop.rent(4)
+    assert laptop.rental_start == datetime.date.today()
+    assert laptop.rental_time == 4
+    assert store._weeks[0] == 4
+    assert store.available_count('Test Laptop A') == 0
+    
+    with pytest.raises(AssertionError):
+        laptop.rental_time = Laptop.max_rental_time + 1
+        
+        
+def test_columnar_add_product(store):
+    """Test that '+' copies a product into a new row."""
+    new_product = Phone('Test Phone C', 3)
+    store + new_product
+    assert len(store) == 5
+    assert store.products[-1].product_id == new_product.product_id
+    assert store.products[-1].buyable
+    
+    
+def test_columnar_customer(store):
+    """Test that Customer can rent and buy from a columnar store."""
+    customer = Customer('Tina Tester', store)
+    customer.rent('Test Laptop B', 2)
+    customer.buy('Test Phone A')
+    assert [item.name for item in customer.current_items] == ['Test Laptop B']
+    assert [item.name for item in customer.owned_items] == ['Test Phone A']
+    assert customer.owned_items[0].price_per_week == 5.2
+    assert len(store) == 3
+    
+    
+def test_columnar_select(store, backend):
+    """Test filtered selection over the columns."""
+    store.products[1].rent(2)
+    assert [item.name for item in store.select(kind=Laptop, available=True, max_price=20)] == ['Test Laptop A']
+    assert [item.name for item in store.select(kind=Phone, buyable=True)] == ['Test Phone A']
+    assert [item.name for item in store.select(min_price=8, max_price=15)] == ['Test Laptop A', 'Test Phone B']
+    
+    store.discard(store.products[0])
+    assert store.select(kind=Laptop, available=True) == []
+    
+    
+def test_columnar_revenue_due(store, backend):
+    """Test revenue of rentals ending in a period."""
+    today = datetime.date.today()
+    store.products[0].rent(1)
+    store.products[2].rent(2)
+    week = (today + datetime.timedelta(days=1), today + datetime.timedelta(weeks=1))
+    assert store.revenue_due(*week) == pytest.approx(15)
+    assert store.revenue_due(today, today + datetime.timedelta(weeks=2)) == pytest.approx(15 + 2 * 5.2)
+    
+    
+def test_columnar_views_are_created_lazily(store):
+    """Test that rows only get a view while it is in use, and always the same one."""
+    assert len(store._views) == 0
+    laptop = store.get_by_name('Test Laptop A')[0]
+    assert store.get_by_id(laptop.product_id) is laptop
+    assert store.query(kind=Laptop, max_price=20) == [laptop]
+    assert len(store._views) == 1
+    del laptop
+    assert len(store._views) == 0
+    
+    customer = Customer('Tina Tester', store)
+    customer.rent('Test Laptop B', 2)
+    assert store.get_by_name('Test Laptop B')[0] is customer.current_items[0]
+    
+    
+def test_columnar_failed_extend_leaves_no_rows(store):
+    """Test that a batch rejected because of a duplicate does not write any row."""
+    with pytest.raises(AssertionError):
+        store.extend([Phone('Test Phone C', 3), store.products[0]])
+    assert len(store._ids) == 4
+    assert len(store) == 4
+    assert [item.name for item in store.select(kind=Phone)] == ['Test Phone A', 'Test Phone B']
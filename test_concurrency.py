@@ -0,0 +1,118 @@
+import sys
+import pytest
+import threading
+
+from customer import Customer
+from store import RentalStore
+from sqlite_store import SQLiteRentalStore
+from products import Laptop, Phone
+from errors import RentalError
+
+
+N_THREADS = 16
+N_UNITS = 50
+
+
+@pytest.fixture(autouse=True)
+def frequent_thread_switches():
+    """Switch threads as often as possible to provoke races."""
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+    
+
+def run_threads(target, n_threads=N_THREADS):
+    barrier = threading.Barrier(n_threads)
+    errors = []
+    
+    def worker(number):
+        barrier.wait()
+        try:
+            target(number)
+        except Exception as error:  # surfaced in the main thread below
+            errors.append(error)
+            
+    threads = [threading.Thread(target=worker, args=(number,)) for number in range(n_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    
+
+def test_concurrent_rent_never_double_rents():
+    """Test that many customers renting the same name never share a unit."""
+    store = RentalStore([Laptop('Test Laptop', 10) for _ in range(N_UNITS)], quiet=True)
+    customers = [Customer('Customer {}'.format(i), store) for i in range(N_THREADS)]
+    
+    def rent_until_sold_out(number):
+        while True:
+            try:
+                customers[number].rent('Test Laptop', 2)
+            except RentalError:
+                return
+            
+    run_threads(rent_until_sold_out)
+    
+    rented = [item for customer in customers for item in customer.current_items]
+    assert len(rented) == N_UNITS
+    assert len({item._id for item in rented}) == N_UNITS
+    assert store.available_count('Test Laptop') == 0
+    assert store.rented_count('Test Laptop') == N_UNITS
+    
+    
+def test_concurrent_buy_and_rent():
+    """Test that a unit is either sold once or rented once, never both."""
+    store = RentalStore([Phone('Test Phone', 5) for _ in range(N_UNITS)], quiet=True)
+    customers = [Customer('Customer {}'.format(i), store) for i in range(N_THREADS)]
+    
+    def buy_or_rent(number):
+        customer = customers[number]
+        while True:
+            try:
+                if number % 2:
+                    customer.buy('Test Phone')
+                else:
+                    customer.rent('Test Phone', 1)
+            except RentalError:
+                return
+            
+    run_threads(buy_or_rent)
+    
+    owned = [item for customer in customers for item in customer.owned_items]
+    rented = [item for customer in customers for item in customer.current_items]
+    ids = [item._id for item in owned + rented]
+    assert len(ids) == N_UNITS
+    assert len(set(ids)) == N_UNITS
+    assert len(store) == N_UNITS - len(owned)
+    assert all(item._store is None and item.available for item in owned)
+    
+    
+def test_concurrent_buy_and_rent_sqlite(tmp_path):
+    """Test that a SQLite unit is either sold once or rented once, never both."""
+    store = SQLiteRentalStore(str(tmp_path / 'store.db'), quiet=True)
+    store.extend([Phone('Test Phone', 5) for _ in range(N_UNITS)])
+    customers = [Customer('Customer {}'.format(i), store) for i in range(8)]
+    
+    def buy_or_rent(number):
+        customer = customers[number]
+        while True:
+            try:
+                if number % 2:
+                    customer.buy('Test Phone')
+                else:
+                    customer.rent('Test Phone', 1)
+            except RentalError:
+                return
+            
+    run_threads(buy_or_rent, n_threads=8)
+    
+    owned = [item for customer in customers for item in customer.owned_items]
+    rented = [item for customer in customers for item in customer.current_items]
+    ids = [item._id for item in owned + rented]
+    assert len(ids) == N_UNITS
+    assert len(set(ids)) == N_UNITS
+    assert len(store) == N_UNITS - len(owned)
+    assert store.rented_count('Test Phone') == len(rented)
+    store.close()
@@ -3,6 +3,7 @@ import datetime
 from customer import Customer
 from store import RentalStore
 from products import Laptop, Phone
+from errors import ProductNotFoundError, ProductUnavailableError, ProductNotBuyableError
 
 NoneType = type(None)
 
@@ -166,4 +167,202 @@ def test_customer_buy(demo_customer, products):
 #        
 #    # test already rented items
 #    with pytest.raises(AssertionError):
-#        demo_customer.buy(demo_product_2.name)    
\ No newline at end of file
+#        demo_customer.buy(demo_product_2.name)    
+
+def test_customer_rent_picks_free_unit(store):
+    """Test that rent() hands out a free unit when other units of the name are rented."""
+    first, second = Laptop('Test Laptop'), Laptop('Test Laptop')
+    store + first
+    store + second
+    first.rent(2)
+    
+    customer = Customer('Tina Tester', store)
+    customer.rent('Test Laptop', 2)
+    assert customer.current_items == [second]
+    assert store.available_count('Test Laptop') == 0
+
+
+def test_customer_extension_moves_due_item_back(demo_customer, products):
+    """Test that extending an ended rental makes it current again."""
+    demo_product = products[1]
+    demo_customer.rent(demo_product.name, 2)
+    demo_product._rental_start = datetime.date.today() - datetime.timedelta(weeks=3)
+    assert demo_product in demo_customer.due_items
+    
+    demo_product.rental_time = 4
+    assert demo_product in demo_customer.current_items
+    assert demo_product not in demo_customer.due_items
+
+
+def test_customer_invoice_running_total(demo_customer, products):
+    """Test that the cached invoice follows due transitions, extensions, price changes and payments."""
+    laptop, phone = products[1], products[2]
+    demo_customer.rent(laptop.name, 2)
+    demo_customer.rent(phone.name, 1)
+    assert demo_customer.invoice == 0.0
+    
+    laptop._rental_start = datetime.date.today() - datetime.timedelta(weeks=3)
+    phone._rental_start = datetime.date.today() - datetime.timedelta(weeks=2)
+    assert demo_customer.invoice == pytest.approx(2 * 10 + 1 * 5.2)
+    demo_customer.check_invoice()
+    
+    phone.price_per_week = 6
+    assert demo_customer.invoice == pytest.approx(2 * 10 + 1 * 6)
+    demo_customer.check_invoice()
+    
+    # extended beyond today, laptop is no longer due
+    laptop.rental_time = 4
+    assert demo_customer.invoice == pytest.approx(6)
+    demo_customer.check_invoice()
+    
+    demo_customer.pay_invoice(demo_customer.invoice)
+    assert demo_customer.invoice == 0.0
+    demo_customer.check_invoice()
+
+
+def test_customer_quiet_store_errors(products, capsys):
+    """Test typed errors instead of printed messages in a quiet store."""
+    store = RentalStore(products, quiet=True)
+    customer = Customer('Tina Tester', store)
+    
+    assert customer.rent(products[0].name, 2) is products[0]
+    with pytest.raises(ProductUnavailableError):
+        customer.rent(products[0].name, 2)
+    with pytest.raises(ProductUnavailableError):
+        customer.buy(products[0].name)
+    with pytest.raises(ProductNotBuyableError):
+        customer.buy(products[1].name)
+    with pytest.raises(ProductNotFoundError):
+        customer.buy('Toaster')
+    phone = products[2]
+    assert customer.buy(phone.name) is phone
+    assert capsys.readouterr().out == ''
+
+
+def test_customer_rent_many(capsys):
+    """Test all-or-nothing and best-effort batch rentals."""
+    store = RentalStore([Laptop('Test Laptop', 10) for _ in range(3)] + [Phone('Test Phone', 5)])
+    customer = Customer('Tina Tester', store)
+    capsys.readouterr()
+    
+    results = customer.rent_many([('Test Laptop', 2)] * 3 + [('Toaster', 1)])
+    assert [result.ok for result in results] == [False] * 4
+    assert isinstance(results[3].error, ProductNotFoundError)
+    assert store.available_count('Test Laptop') == 3
+    assert customer.current_items == []
+    assert 'Toaster' in capsys.readouterr().out
+    
+    results = customer.rent_many([('Test Laptop', 2)] * 4 + [('Test Phone', 1)], atomic=False)
+    assert [result.ok for result in results] == [True, True, True, False, True]
+    assert isinstance(results[3].error, ProductUnavailableError)
+    assert len(customer.current_items) == 4
+    assert store.available_count('Test Laptop') == 0
+    
+    
+def test_customer_buy_many(store, products):
+    """Test that a failed all-or-nothing purchase puts the units back."""
+    store.quiet = True
+    customer = Customer('Tina Tester', store)
+    laptop, phone = products[0], products[2]
+    
+    results = customer.buy_many([phone.name, laptop.name])
+    assert not any(result.ok for result in results)
+    assert isinstance(results[1].error, ProductNotBuyableError)
+    assert store.count(phone.name) == 1
+    assert customer.owned_items == []
+    
+    results = customer.buy_many([phone.name, laptop.name], atomic=False)
+    assert results[0].item is phone
+    assert customer.owned_items == [phone]
+    assert store.count(phone.name) == 0
+
+
+def test_customer_return_item(demo_customer, store, products):
+    """Test that a returned unit is free again and its rental archived."""
+    laptop = products[1]
+    demo_customer.rent(laptop.name, 2)
+    laptop._rental_start = datetime.date.today() - datetime.timedelta(weeks=3)
+    demo_customer.pay_invoice(demo_customer.invoice)
+    
+    demo_customer.return_item(laptop)
+    assert laptop.available
+    assert store.available_count(laptop.name) == 1
+    assert demo_customer.paid_items == []
+    assert demo_customer._paid_held == {}
+    (record,) = demo_customer.returned_rentals
+    assert record.product_id == laptop._id
+    assert (record.weeks, record.price, record.paid) == (2, 10, True)
+    assert record.start == (datetime.date.today() - datetime.timedelta(weeks=3)).toordinal()
+    assert store.revenue_by_type() == {'Laptop': 20}
+    
+    # the recycled unit is rented again like any other
+    assert demo_customer.rent(laptop.name, 1) is laptop
+    with pytest.raises(AssertionError):
+        Customer('Other Tester', store).return_item(laptop)
+        
+        
+def test_customer_return_paid_item_removed_from_store(demo_customer, store, products):
+    """Test that a paid rental can still be returned after its unit left the store."""
+    laptop = products[1]
+    demo_customer.rent(laptop.name, 2)
+    demo_customer._settle([laptop._id])
+    store - laptop
+    assert demo_customer.paid_items == [laptop]
+    
+    demo_customer.return_item(demo_customer.paid_items[0])
+    assert demo_customer.paid_items == []
+    assert laptop.available
+    
+    
+def test_customer_return_unpaid(demo_customer, store, products):
+    """Test that unpaid returned rentals stay on the invoice until paid."""
+    laptop, phone = products[1], products[2]
+    demo_customer.rent(laptop.name, 2)
+    demo_customer.rent(phone.name, 1)
+    laptop._rental_start = datetime.date.today() - datetime.timedelta(weeks=3)
+    demo_customer.return_item(laptop)
+    # returned early, billed for the booked rental time
+    demo_customer.return_item(phone)
+    assert demo_customer.invoice == pytest.approx(20 + 5.2)
+    assert store.receivables == pytest.approx(20 + 5.2)
+    assert demo_customer.due_items == []
+    demo_customer.check_invoice()
+    
+    demo_customer.pay_invoice(demo_customer.invoice)
+    assert demo_customer.invoice == 0
+    assert store.receivables == 0
+    assert [record.paid for record in demo_customer.returned_rentals] == [True, True]
+    assert store.revenue_by_type() == {'Laptop': 20, 'Phone': 5.2}
+        
+        
+def test_customer_rental_history(demo_customer, store, products):
+    """Test that the history is streamed as compact records, settled rentals first."""
+    laptop, phone = products[1], products[2]
+    demo_customer.rent(laptop.name, 2)
+    laptop._rental_start = datetime.date.today() - datetime.timedelta(weeks=3)
+    demo_customer.pay_invoice(demo_customer.invoice)
+    demo_customer.return_item(laptop)
+    demo_customer.rent(laptop.name, 1)
+    demo_customer.rent(phone.name, 3)
+    
+    records = list(demo_customer.iter_rentals())
+    assert [(record.name, record.weeks, record.paid) for record in records] == [
+        (laptop.name, 2, True), (laptop.name, 1, False), (phone.name, 3, False)]
+    assert records[0].price == 10 and records[0].kind == 'Laptop'
+    assert [record.name for record in demo_customer.iter_rentals(paid=False, offset=1)] == [phone.name]
+    assert list(demo_customer.iter_rentals(limit=1)) == records[:1]
+    assert list(demo_customer.rental_pages(page_size=2)) == [records[:2], records[2:]]
+    
+    
+def test_customer_items_views(demo_customer, products):
+    """Test that item lists are lazy views that keep their contents like lists did."""
+    laptop = products[1]
+    demo_customer.rent(laptop.name, 2)
+    laptop._rental_start = datetime.date.today() - datetime.timedelta(weeks=3)
+    due = demo_customer.due_items
+    assert len(due) == 1 and due[0] is laptop and laptop in due
+    assert due == [laptop] and due[:1] == [laptop]
+    demo_customer.pay_invoice(demo_customer.invoice)
+    assert list(due) == [laptop]
+    assert demo_customer.due_items == []
+    assert demo_customer.paid_items == [laptop]
@@ -0,0 +1,40 @@
+import pytest
+import datetime
+
+from expiry import ExpiryIndex
+from products import Laptop
+
+
+@pytest.fixture
+def products():
+    """Fixture with three rented laptops ending after 1, 2 and 3 weeks."""
+    out = [Laptop('Test Product A {}'.format(weeks)) for weeks in (3, 1, 2)]
+    for item in out:
+        item.rent(int(item.name[-1]))
+    return out
+
+
+def test_expiry_pop_due_in_order(products):
+    """Test that pop_due() returns ended rentals ordered by rental_end."""
+    index = ExpiryIndex()
+    for item in products:
+        index.push(item)
+    
+    today = datetime.date.today()
+    assert list(index.pop_due(today)) == []
+    assert [item.name for item in index.pop_due(today + datetime.timedelta(weeks=2))] == [
+        'Test Product A 1', 'Test Product A 2']
+    assert len(index) == 1
+    
+    
+def test_expiry_skips_stale_entries(products):
+    """Test that entries are skipped once the rental period has changed."""
+    index = ExpiryIndex()
+    item = products[1]
+    index.push(item)
+    item.rental_time = 4
+    index.push(item)
+    
+    in_two_weeks = datetime.date.today() + datetime.timedelta(weeks=2)
+    assert list(index.pop_due(in_two_weeks)) == []
+    assert list(index.pop_due(item.rental_end)) == [item]
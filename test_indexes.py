@@ -0,0 +1,122 @@
+import pytest
+import random
+
+from indexes import CatalogIndex, NameIndex
+from store import RentalStore
+from columnar import ColumnarRentalStore
+from sqlite_store import SQLiteRentalStore
+from customer import Customer
+from products import Product, Laptop, Phone
+
+
+@pytest.fixture(params=[RentalStore, ColumnarRentalStore, SQLiteRentalStore])
+def store(request):
+    """Fixture for each store type with laptops, phones and a rental-only phone."""
+    out = request.param(quiet=True)
+    out.extend([Laptop('Test Laptop', 10), Laptop('Test Laptop', 12.5), Phone('Test Phone', 5.2),
+                Phone('Test Phone', 3), Phone('Test Phone Rental Only', 7, buyable=False)])
+    return out
+
+
+def prices(items):
+    return [item.price_per_week for item in items]
+
+
+def test_query_facets(store):
+    """Test filtering by type, buyable flag and price range, sorted by price."""
+    assert prices(store.query()) == [3, 5.2, 7, 10, 12.5]
+    assert prices(store.query(kind=Phone, buyable=True, min_price=3, max_price=8)) == [3, 5.2]
+    assert prices(store.query(kind=Laptop, descending=True)) == [12.5, 10]
+    assert prices(store.query(min_price=5, offset=1, limit=2)) == [7, 10]
+    
+    
+def test_query_stays_current(store):
+    """Test that rent, buy, add, remove and price changes update the indexes."""
+    store.query()
+    customer = Customer('Tina Tester', store)
+    customer.rent('Test Laptop', 2)
+    customer.buy('Test Phone')
+    store + Laptop('Test Laptop', 4)
+    store - store.query(kind=Phone, buyable=False)[0]
+    laptop = store.query(kind=Laptop, available=True, max_price=10)[-1]
+    laptop.price_per_week = 20
+    
+    assert len(store.query()) == 4
+    assert prices(store.query(available=True)) == [3, 12.5, 20]
+    assert prices(store.query(available=False)) == [10]
+    assert prices(store.query(kind=Laptop, min_price=5)) == [10, 12.5, 20]
+    
+    
+def test_query_follows_buyable_changes(store):
+    """Test that changing the buyable flag of an indexed product moves it to the right facet."""
+    store.query()
+    phone = store.query(kind=Phone, buyable=True)[0]
+    phone.buyable = False
+    
+    assert prices(store.query(buyable=True)) == [5.2]
+    assert prices(store.query(buyable=False)) == [3, 7, 10, 12.5]
+    assert all(not item.buyable for item in store.query(buyable=False))
+    
+    
+def test_catalog_index_matches_linear_filter():
+    """Test random queries against a plain filter over the products."""
+    rng = random.Random(0)
+    items = [rng.choice([Laptop, Phone, Product])('Item {}'.format(i), rng.randint(1, 20)) for i in range(300)]
+    for item in items[::3]:
+        item.rent(1)
+    index = CatalogIndex(items)
+    for item in items[::7]:
+        index.remove(item)
+    live = [item for position, item in enumerate(items) if position % 7]
+    for _ in range(50):
+        kind = rng.choice([None, Product, Laptop, Phone])
+        available = rng.choice([None, True, False])
+        low = rng.randint(1, 20)
+        high = rng.randint(low, 20)
+        expected = sorted((item for item in live
+                           if (kind is None or isinstance(item, kind)) and
+                           (available is None or item.available == available) and
+                           low <= item.price_per_week <= high),
+                          key=lambda item: item.price_per_week)
+        result = list(index.query(kind, available, None, low, high))
+        assert prices(result) == prices(expected)
+        assert set(map(id, result)) == set(map(id, expected))
+    
+    
+def test_name_index():
+    """Test prefix and fuzzy lookups and incremental updates of the name trie."""
+    index = NameIndex(['MacBook Pro', 'MacBook Air', 'Mac Mini', 'iPhone 15', 'Pixel 8'])
+    assert index.prefix('macb') == ['MacBook Air', 'MacBook Pro']
+    assert index.prefix('MAC', limit=1) == ['Mac Mini']
+    assert index.prefix('x') == []
+    assert index.similar('Macbok Pro') == [('MacBook Pro', 1)]
+    assert index.similar('Pixel 9', max_distance=1) == [('Pixel 8', 1)]
+    assert index.similar('Pixel 9', max_distance=0) == []
+    index.add('Pixel 9')
+    index.remove('Pixel 8')
+    assert index.similar('Pixel 9', max_distance=1) == [('Pixel 9', 0)]
+    assert len(index) == 5
+    
+    
+def test_store_name_search(store):
+    """Test that name searches report availability and follow the catalog."""
+    assert store.search_names('test p') == [('Test Phone', 2, 2), ('Test Phone Rental Only', 1, 1)]
+    Customer('Tina Tester', store).rent('Test Laptop', 2)
+    assert store.suggest_names('Tset Laptop') == [('Test Laptop', 1, 2)]
+    for item in store.get_by_name('Test Phone'):
+        store - item
+    store + Laptop('Test Tablet', 3)
+    assert [name for name, _, _ in store.search_names('test')] == [
+        'Test Laptop', 'Test Phone Rental Only', 'Test Tablet']
+    
+    
+def test_name_search_in_empty_store():
+    """Test name searches on a store without products and on one whose last product was sold."""
+    store = RentalStore(quiet=True)
+    assert store.suggest_names('abc') == []
+    assert store.search_names('abc') == []
+    store + Phone('Test Phone', 5)
+    assert store.suggest_names('Tset Phone') == [('Test Phone', 1, 1)]
+    Customer('Tina Tester', store).buy('Test Phone')
+    assert store.suggest_names('Tset Phone') == []
+    assert store.search_names('test') == []
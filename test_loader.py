@@ -0,0 +1,69 @@
+import io
+import json
+import pytest
+
+from loader import load_catalog, validate_batch
+from store import RentalStore
+from columnar import ColumnarRentalStore
+from products import Laptop, Phone
+
+
+CSV_CATALOG = """type,name,price_per_week,buyable
+laptop,Test Laptop,12.5,
+phone,Test Phone,4,
+phone,Test Phone Rental Only,3,false
+"""
+
+
+def test_load_csv(capsys):
+    """Test loading a CSV catalog with a single summary line."""
+    store = RentalStore()
+    assert load_catalog(io.StringIO(CSV_CATALOG), store, fmt='csv') == 3
+    
+    assert len(store) == 3
+    laptop = store.get_by_name('Test Laptop')[0]
+    assert isinstance(laptop, Laptop)
+    assert laptop.price_per_week == 12.5
+    assert not laptop.buyable
+    assert store.get_by_name('Test Phone')[0].buyable
+    assert not store.get_by_name('Test Phone Rental Only')[0].buyable
+    assert len(capsys.readouterr().out.splitlines()) == 1
+    
+    
+def test_load_into_quiet_store(capsys):
+    """Test that loading into a quiet store prints nothing."""
+    store = RentalStore(quiet=True)
+    assert load_catalog(io.StringIO(CSV_CATALOG), store, fmt='csv') == 3
+    assert len(store) == 3
+    assert capsys.readouterr().out == ''
+    
+    
+def test_load_jsonl_into_columnar_store():
+    """Test loading JSON Lines straight into the columns of a ColumnarRentalStore."""
+    lines = [json.dumps({'type': 'Phone', 'name': 'Test Phone {}'.format(i), 'price_per_week': i})
+             for i in range(5)]
+    store = ColumnarRentalStore()
+    load_catalog(io.StringIO('\n'.join(lines)), store, batch_size=2)
+    
+    assert len(store) == 5
+    assert all(isinstance(item, Phone) for item in store.products)
+    assert store.products[3].price_per_week == 3
+    assert [item.name for item in store.select(max_price=1)] == ['Test Phone 0', 'Test Phone 1']
+    
+    
+def test_load_invalid_rows_adds_nothing():
+    """Test that an invalid row rejects the whole catalog."""
+    store = RentalStore()
+    catalog = CSV_CATALOG + 'toaster,Test Toaster,1,\nlaptop,,1,\n'
+    with pytest.raises(AssertionError, match='row 4.*\n.*row 5'):
+        load_catalog(io.StringIO(catalog), store, fmt='csv')
+    assert len(store) == 0
+    
+    
+def test_validate_batch_errors():
+    """Test validation of single fields."""
+    with pytest.raises(AssertionError, match='price_per_week'):
+        validate_batch([{'type': 'laptop', 'name': 'Test Laptop', 'price_per_week': 'ten'}])
+    with pytest.raises(AssertionError, match='buyable'):
+        validate_batch([{'type': 'phone', 'name': 'Test Phone', 'buyable': 'maybe'}])
+    assert validate_batch([{'type': 'laptop', 'name': 'Test Laptop'}]) == [(Laptop, 'Test Laptop', 0, False)]
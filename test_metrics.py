@@ -0,0 +1,76 @@
+import pytest
+
+import metrics
+from customer import Customer
+from store import RentalStore
+from columnar import ColumnarRentalStore
+from products import Laptop, Phone
+from errors import ProductUnavailableError
+
+
+@pytest.fixture
+def recording():
+    """Fixture enabling metrics for one test."""
+    out = metrics.enable()
+    yield out
+    metrics.disable()
+
+
+@pytest.fixture
+def store():
+    """Fixture for a quiet RentalStore with two laptops and a phone."""
+    out = RentalStore([Laptop('Test Laptop', 10), Laptop('Test Laptop', 10), Phone('Test Phone', 5)],
+                      quiet=True)
+    return out
+
+
+def test_metrics_record_operations(recording, store):
+    """Test counts, errors and scan lengths of instrumented calls."""
+    customer = Customer('Tina Tester', store)
+    customer.rent('Test Laptop', 2)
+    customer.rent('Test Laptop', 2)
+    with pytest.raises(ProductUnavailableError):
+        customer.rent('Test Laptop', 2)
+    customer.current_items
+    store + Phone('Test Phone', 5)
+    
+    snapshot = recording.snapshot()
+    rent = snapshot['Customer.rent']
+    assert rent['count'] == 3
+    assert rent['errors'] == 1
+    assert rent['scanned'] == 3
+    assert rent['p50'] <= rent['p99'] and rent['seconds'] > 0
+    assert snapshot['Customer.current_items']['count'] == 1
+    assert snapshot['RentalStore.__add__']['count'] == 1
+    
+    
+def test_metrics_catalog_scan(recording):
+    """Test that printing the catalog after a failed rental shows up as a full scan."""
+    store = RentalStore([Laptop('Test Laptop {}'.format(i), 10) for i in range(20)])
+    customer = Customer('Tina Tester', store)
+    customer.rent('Test Laptop 0', 2)
+    customer.rent('Test Laptop 0', 2)
+    assert recording.snapshot()['Customer.rent']['max_scanned'] == 1 + 20
+    
+    
+def test_metrics_prometheus(recording, store):
+    """Test the Prometheus text format."""
+    Customer('Tina Tester', store).buy('Test Phone')
+    text = recording.prometheus()
+    assert '# TYPE rentalstore_calls_total counter' in text
+    assert 'rentalstore_calls_total{operation="Customer.buy"} 1' in text
+    assert 'rentalstore_latency_seconds{operation="Customer.buy",quantile="0.99"}' in text
+    assert 'rentalstore_latency_seconds_count{operation="Customer.buy"} 1' in text
+    
+    
+def test_metrics_disable_restores_methods():
+    """Test that disabling puts the original methods back."""
+    originals = (Customer.rent, Customer.__dict__['invoice'], RentalStore.__add__,
+                 ColumnarRentalStore.__add__, RentalStore.iter_products)
+    recording = metrics.enable()
+    assert metrics.enabled() is recording
+    assert Customer.rent is not originals[0]
+    assert metrics.disable() is recording
+    assert metrics.enabled() is None
+    assert (Customer.rent, Customer.__dict__['invoice'], RentalStore.__add__,
+            ColumnarRentalStore.__add__, RentalStore.iter_products) == originals
@@ -126,3 +126,18 @@ def test_product_rental_end_read_only(products):
     with pytest.raises(AttributeError):
         products[0].rental_end = datetime.date(2020, 1, 1)
         
+
+
+def test_product_slots(products):
+    """Test that products have no per-instance __dict__."""
+    assert not hasattr(products[0], '__dict__')
+    with pytest.raises(AttributeError):
+        products[0].colour = 'red'
+        
+        
+def test_product_id_key(products):
+    """Test that product_id round-trips through the compact ID."""
+    product_id = products[0].product_id
+    assert Product.id_key(product_id) == products[0]._id
+    assert products[0].product_id == product_id
+    assert Product.id_key('unknown-id') is None
@@ -0,0 +1,51 @@
+import pytest
+import multiprocessing
+
+from products import Product, Laptop
+from product_ids import Uuid1Ids, SequentialIds, BlockUuidIds, RandomIds
+
+
+STRATEGIES = [Uuid1Ids, SequentialIds, BlockUuidIds, RandomIds]
+
+
+@pytest.fixture(params=STRATEGIES)
+def id_generator(request, monkeypatch):
+    """Install each ID strategy on Product for the duration of a test."""
+    generator = request.param()
+    monkeypatch.setattr(Product, 'id_generator', generator)
+    return generator
+
+
+def _draw_ids(n):
+    return [Product.id_generator.new_id() for _ in range(n)]
+
+
+def test_ids_unique(id_generator):
+    """Test that a strategy gives unique IDs that work as product_id."""
+    products = [Laptop('Test Laptop') for _ in range(5000)]
+    assert len({item._id for item in products}) == 5000
+    assert Product.id_key(products[0].product_id) == products[0]._id
+    
+    
+def test_sequential_ids_monotonic():
+    """Test that SequentialIds increase within a process."""
+    generator = SequentialIds()
+    ids = [generator.new_id() for _ in range(100)]
+    assert ids == sorted(ids)
+    
+    
+def test_block_ids_span_blocks():
+    """Test that BlockUuidIds keeps IDs unique across block boundaries."""
+    generator = BlockUuidIds(block_size=16)
+    ids = [generator.new_id() for _ in range(100)]
+    assert len(set(ids)) == 100
+    
+    
+@pytest.mark.skipif('fork' not in multiprocessing.get_all_start_methods(), reason='needs fork')
+def test_ids_unique_across_process_pool(id_generator):
+    """Test that forked workers do not repeat IDs of each other or of the parent."""
+    parent_ids = _draw_ids(100)
+    with multiprocessing.get_context('fork').Pool(4) as pool:
+        worker_ids = pool.map(_draw_ids, [1000] * 4)
+    all_ids = parent_ids + [i for ids in worker_ids for i in ids]
+    assert len(set(all_ids)) == len(all_ids)
@@ -1,6 +1,11 @@
 import pytest
+import datetime
 from store import RentalStore
+from columnar import ColumnarRentalStore
+from sqlite_store import SQLiteRentalStore
 from products import Product, Laptop, Phone
+from errors import ProductNotFoundError
+from customer import Customer
 
 
 @pytest.fixture
@@ -20,6 +25,13 @@ def test_rentalstore_init():
         RentalStore(['Product', 'Product 2.0'])
         
         
+def test_rentalstore_init_rejects_duplicates():
+    """Test that a product cannot be passed to the store twice."""
+    laptop = Laptop('Test Laptop')
+    with pytest.raises(AssertionError):
+        RentalStore([laptop, laptop])
+        
+        
 def test_rentalstore_len(store):
     """Test __len__() method."""
     assert len(store) == 3
@@ -69,6 +81,32 @@ def test_rentalstore_substract_product(store):
     assert len(store) == 2
     
     
+def test_rentalstore_discard_keeps_products_consistent(store):
+    """Test that discarding any product leaves every other product in the store exactly once."""
+    first, second, third = store.products
+    assert store.discard(first)
+    assert not store.discard(first)
+    assert sorted(store.products, key=id) == sorted([second, third], key=id)
+    assert store.discard(third)
+    assert store.products == [second]
+    store + first
+    assert store.products == [second, first]
+    assert store.discard(second)
+    assert store.products == [first]
+    
+    
+@pytest.mark.parametrize('store_class', [RentalStore, ColumnarRentalStore, SQLiteRentalStore])
+def test_rentalstore_extend_rejects_duplicates_in_batch(store_class):
+    """Test that a batch adding the same product twice is rejected as a whole."""
+    store = store_class(quiet=True)
+    laptop = Laptop('Test Laptop', 10)
+    with pytest.raises(AssertionError):
+        store.extend([Phone('Test Phone', 5), laptop, laptop])
+    assert len(store) == 0
+    assert store.count('Test Laptop') == 0
+    assert list(store.products) == []
+    
+    
 def test_rentalstore_substract_product_errors(store):
     """Test errors when substracting non-Product-type to rental store via '-' operator."""    
     with pytest.raises(AssertionError):
@@ -86,3 +124,115 @@ def test_rentalstore_substract_product_returns_store(store):
     assert isinstance(result, RentalStore)
     assert len(result) == 2
     
+    
+def test_rentalstore_get_by_name_and_id(store):
+    """Test index lookups by name and product_id."""
+    laptop = store.products[1]
+    assert store.get_by_id(laptop.product_id) is laptop
+    assert store.get_by_name('Test Product A 2') == [laptop]
+    assert store.get_by_name('Toaster') == []
+    assert store.get_by_id('unknown-id') is None
+    
+    
+def test_rentalstore_index_follows_add_and_sub(store):
+    """Test that the indexes are updated by '+' and '-'."""
+    new_product = Laptop('Test Product A 2')
+    store + new_product
+    assert store.get_by_id(new_product.product_id) is new_product
+    assert len(store.get_by_name('Test Product A 2')) == 2
+    
+    store - new_product
+    assert store.get_by_id(new_product.product_id) is None
+    assert len(store.get_by_name('Test Product A 2')) == 1
+    
+    
+def test_rentalstore_discard(store):
+    """Test discard() removes exactly the given product."""
+    product = store.products[2]
+    assert store.discard(product)
+    assert store.get_by_id(product.product_id) is None
+    assert store.get_by_name(product.name) == []
+    assert len(store) == 2
+    assert not store.discard(product)
+    
+    
+def test_rentalstore_available_pool():
+    """Test that renting moves units between the free and rented pools."""
+    units = [Laptop('Test Laptop', 10) for _ in range(3)]
+    store = RentalStore(list(units))
+    assert store.count('Test Laptop') == 3
+    assert store.available_count('Test Laptop') == 3
+    
+    rented = store.get_available('Test Laptop')
+    rented.rent(2)
+    assert store.available_count('Test Laptop') == 2
+    assert store.rented_count('Test Laptop') == 1
+    assert store.get_available('Test Laptop') is not rented
+    
+    for item in units:
+        item.rent(2)
+    assert store.get_available('Test Laptop') is None
+    assert store.rented_count('Test Laptop') == 3
+    
+    store.discard(rented)
+    assert store.rented_count('Test Laptop') == 2
+    assert store.count('Test Laptop') == 2
+    
+    
+def test_rentalstore_ended_items(store):
+    """Test that ended_items() reports rentals whose period is over."""
+    item = store.products[1]
+    item.rent(2)
+    assert store.ended_items() == []
+    
+    item._rental_start = datetime.date.today() - datetime.timedelta(weeks=3)
+    assert store.ended_items() == [item]
+    
+    
+def test_rentalstore_quiet(capsys):
+    """Test that a quiet store does not print and raises typed errors."""
+    store = RentalStore(quiet=True)
+    new_product = Laptop('New Product')
+    store + new_product
+    store - new_product
+    with pytest.raises(ProductNotFoundError):
+        store - new_product
+    assert capsys.readouterr().out == ''
+    
+    
+def test_rentalstore_iter_products(store):
+    """Test filtering and pagination of the catalog stream."""
+    store.products[0].rent(2)
+    assert [item.name for item in store.iter_products(available=True)] == [
+        'Test Product A 2', 'Test Product B 1']
+    assert [item.name for item in store.iter_products(kind=Laptop, offset=1)] == ['Test Product A 2']
+    assert [item.name for item in store.iter_products(buyable=True)] == ['Test Product B 1']
+    assert [item.name for item in store.iter_products(name='Test Product A 1', available=False)] == [
+        'Test Product A 1']
+    assert len(list(store.iter_products(limit=2))) == 2
+    assert [len(page) for page in store.pages(page_size=2)] == [2, 1]
+
+    
+def test_rentalstore_aggregates(store):
+    """Test the running receivables, revenue and utilization figures."""
+    tina = Customer('Tina Tester', store)
+    tom = Customer('Tom Tester', store)
+    assert store.customers == [tina, tom]
+    laptop = tina.rent('Test Product A 2', 2)
+    phone = tom.rent('Test Product B 1', 1)
+    assert store.active_rentals == 2
+    assert store.utilization == 2 / 3
+    assert store.receivables == 0
+    
+    laptop._rental_start = datetime.date.today() - datetime.timedelta(weeks=3)
+    phone._rental_start = datetime.date.today() - datetime.timedelta(weeks=2)
+    assert store.receivables == pytest.approx(25.2)
+    laptop.rental_time = 4
+    assert store.receivables == pytest.approx(5.2)
+    
+    tom.pay_invoice(tom.invoice)
+    assert store.receivables == 0
+    assert store.revenue_by_type() == {'Phone': pytest.approx(5.2)}
+    store - laptop
+    assert store.stats()['active_rentals'] == 1
+    assert store.stats()['utilization'] == 0.5
@@ -0,0 +1,157 @@
+import pytest
+import datetime
+
+from clock import SimulatedClock
+from store import RentalStore
+from columnar import ColumnarRentalStore
+from sqlite_store import SQLiteRentalStore
+from customer import Customer
+from eventlog import EventLog, replay
+from errors import ProductUnavailableError
+from reservations import IntervalList
+from products import Laptop, Phone
+
+DAY = datetime.date(2024, 1, 1)
+
+
+@pytest.fixture
+def clock():
+    """Fixture for a simulated clock starting on a fixed day."""
+    return SimulatedClock(DAY)
+
+
+@pytest.fixture(params=[RentalStore, ColumnarRentalStore, SQLiteRentalStore])
+def store(request, clock):
+    """Fixture for a quiet store of every kind with two laptops and a phone."""
+    return request.param(products=[Laptop('Test Laptop', 10), Laptop('Test Laptop', 12), Phone('Test Phone', 5)],
+                         quiet=True, clock=clock)
+
+
+def in_weeks(weeks):
+    return DAY + datetime.timedelta(weeks=weeks)
+
+
+def test_interval_list():
+    """Test conflict checks and the free slot search on half-open periods."""
+    bookings = IntervalList()
+    bookings.add(10, 20, 'a')
+    bookings.add(30, 40, 'b')
+    assert bookings.conflicts(15, 16)
+    assert bookings.conflicts(5, 11)
+    assert bookings.conflicts(39, 50)
+    assert not bookings.conflicts(20, 30)
+    assert not bookings.conflicts(0, 10)
+    assert bookings.next_free(0, 10) == 0
+    assert bookings.next_free(5, 10) == 20
+    assert bookings.next_free(12, 11) == 40
+    with pytest.raises(AssertionError):
+        bookings.add(25, 31, 'c')
+    assert not bookings.remove(10, 'b')
+    assert bookings.remove(10, 'a')
+    assert list(bookings) == ['b']
+
+
+def test_reserve_and_pick_up(store, clock):
+    """Test that a reservation holds its unit and becomes a rental from the reserved start."""
+    customer = Customer('Tina Tester', store)
+    first = customer.reserve('Test Laptop', in_weeks(2), 2)
+    second = customer.reserve('Test Laptop', in_weeks(3), 2)
+    assert first.item is not second.item
+    with pytest.raises(ProductUnavailableError):
+        customer.reserve('Test Laptop', in_weeks(1), 3)
+    assert customer.reservations == [first, second]
+
+    clock.advance(weeks=2, days=3)
+    item = customer.pick_up(first)
+    assert item is first.item
+    assert item.rental_start == in_weeks(2)
+    assert item.rental_end == in_weeks(4)
+    assert customer.reservations == [second]
+    assert store.reservations(item) == []
+
+
+def test_rent_skips_reserved_units(store):
+    """Test that a rental never overlaps a reservation of its unit."""
+    customer = Customer('Tina Tester', store)
+    reserved = customer.reserve('Test Laptop', in_weeks(1), 1).item
+    rented = customer.rent('Test Laptop', 4)
+    assert rented is not reserved
+    with pytest.raises(ProductUnavailableError):
+        customer.rent('Test Laptop', 2)
+    assert customer.rent('Test Laptop', 1) is reserved
+
+
+def test_buy_skips_reserved_units(store):
+    """Test that a reserved unit is not sold."""
+    customer = Customer('Tina Tester', store)
+    customer.reserve('Test Phone', in_weeks(1), 1)
+    with pytest.raises(ProductUnavailableError):
+        customer.buy('Test Phone')
+    assert store.count('Test Phone') == 1
+
+
+def test_extension_respects_reservations(store):
+    """Test that an extension cannot overlap the next reservation of the unit."""
+    customer = Customer('Tina Tester', store)
+    phone = customer.rent('Test Phone', 2)
+    Customer('Other Tester', store).reserve('Test Phone', in_weeks(4), 1)
+    phone.rental_time = 4
+    with pytest.raises(AssertionError):
+        phone.rental_time = 5
+    assert phone.rental_time == 4
+
+
+def test_laptop_max_rental_time(store):
+    """Test that laptops cannot be reserved longer than Laptop.max_rental_time."""
+    customer = Customer('Tina Tester', store)
+    with pytest.raises(AssertionError):
+        customer.reserve('Test Laptop', in_weeks(1), Laptop.max_rental_time + 1)
+    assert store.earliest_slot('Test Laptop', Laptop.max_rental_time + 1) is None
+
+
+def test_earliest_slot(store):
+    """Test the earliest start over all units, after current rentals and reservations."""
+    customer = Customer('Tina Tester', store)
+    assert store.earliest_slot('Test Laptop', 2) is not None
+    assert store.earliest_slot('Test Laptop', 2)[0] == DAY
+    customer.rent('Test Laptop', 3)
+    customer.reserve('Test Laptop', in_weeks(1), 4)
+    start, item = store.earliest_slot('Test Laptop', 2)
+    assert start == in_weeks(3)
+    assert store.earliest_slot('Test Laptop', 2, not_before=in_weeks(6))[0] == in_weeks(6)
+    reservation = customer.reserve('Test Laptop', start, 2)
+    assert reservation.item is item
+    customer.cancel_reservation(reservation)
+    assert store.earliest_slot('Test Laptop', 2)[0] == in_weeks(3)
+
+
+def test_pick_up_before_return(store, clock):
+    """Test that a reservation cannot be picked up while the unit is still out."""
+    customer = Customer('Tina Tester', store)
+    phone = customer.rent('Test Phone', 1)
+    reservation = Customer('Other Tester', store).reserve('Test Phone', in_weeks(1), 1)
+    with pytest.raises(AssertionError):
+        reservation.customer.pick_up(reservation)
+    clock.advance(weeks=1)
+    with pytest.raises(ProductUnavailableError):
+        reservation.customer.pick_up(reservation)
+    phone._release()
+    assert reservation.customer.pick_up(reservation) is phone
+
+
+def test_eventlog_replay_reservations(tmp_path):
+    """Test that reservations and cancellations are replayed."""
+    store = RentalStore([Laptop('Test Laptop', 10), Laptop('Test Laptop', 12)], quiet=True)
+    today = datetime.date.today()
+    path = str(tmp_path / 'events.log')
+    with EventLog(path) as log:
+        log.attach(store)
+        customer = Customer('Tina Tester', store)
+        kept = customer.reserve('Test Laptop', today + datetime.timedelta(weeks=1), 2)
+        customer.cancel_reservation(customer.reserve('Test Laptop', today + datetime.timedelta(weeks=2), 2))
+
+    new_store, (new_customer,) = replay(path)
+    (reservation,) = new_customer.reservations
+    assert reservation.item.product_id == kept.item.product_id
+    assert (reservation.start, reservation.rental_time) == (kept.start, 2)
+    assert new_store.reservations(reservation.item) == [reservation]
@@ -0,0 +1,63 @@
+import pytest
+import datetime
+
+from sharded_store import ShardedRentalStore, ShardedCustomer
+from errors import ProductNotFoundError, ProductUnavailableError
+from store import RentalStore
+from customer import Customer
+from products import Laptop, Phone
+
+
+@pytest.fixture
+def store():
+    """Fixture for a fresh store with three shards on a simulated clock, one per test."""
+    out = ShardedRentalStore(workers=3, clock_start=datetime.date(2024, 1, 1))
+    out.extend_rows([(Laptop, 'Laptop {}'.format(i % 10), 10, False) for i in range(20)] +
+                    [(Phone, 'Phone {}'.format(i % 10), 5, True) for i in range(20)])
+    out.extend([Laptop('Test Laptop', 12)])
+    yield out
+    out.close()
+
+
+def test_sharded_routing(store):
+    """Test that products are split over the shards and found by name."""
+    assert len(store) == 41
+    assert len({store.shard_of('Laptop {}'.format(i)) for i in range(10)}) > 1
+    assert store.count('Laptop 3') == 2
+    assert store.count('Test Laptop') == 1
+    
+    
+def test_sharded_customer(store):
+    """Test renting, buying and paying across shards."""
+    customer = ShardedCustomer('Tina Tester', store)
+    assert isinstance(customer.rent('Test Laptop', 2), str)
+    with pytest.raises(ProductUnavailableError):
+        customer.rent('Test Laptop', 2)
+    with pytest.raises(ProductNotFoundError):
+        customer.buy('Toaster')
+    results = customer.rent_many([('Laptop {}'.format(i), 1) for i in range(10)] + [('Toaster', 1)])
+    assert [result.ok for result in results] == [True] * 10 + [False]
+    assert isinstance(results[-1].error, ProductNotFoundError)
+    assert all(result.ok for result in customer.buy_many(['Phone 1', 'Phone 2']))
+    
+    assert customer.invoice == 0
+    store.advance(weeks=2)
+    assert customer.invoice == 10 * 10 + 2 * 12
+    assert store.stats()['receivables'] == 124
+    customer.pay_invoice(124)
+    assert customer.invoice == 0
+    assert store.stats()['revenue_by_type'] == {'Laptop': 124}
+    assert store.stats()['active_rentals'] == 11
+    
+    
+def test_sharded_extend_copies_store_products(store):
+    """Test that products of a local store, rented ones included, can be copied into the shards."""
+    local = RentalStore([Phone('Copied Phone', 3), Phone('Copied Phone', 3)], quiet=True)
+    rented = Customer('Local Customer', local).rent('Copied Phone', 2)
+    store.extend(local.products)
+    assert store.count('Copied Phone') == 2
+    assert store.available_count('Copied Phone') == 1
+    customer = ShardedCustomer('Copy Tester', store)
+    assert customer.rent('Copied Phone', 1) != rented.product_id
+    with pytest.raises(ProductUnavailableError):
+        customer.rent('Copied Phone', 1)
@@ -0,0 +1,41 @@
+import pytest
+
+from simulator import Simulation, format_report, OPERATIONS
+from columnar import ColumnarRentalStore
+
+
+def test_simulation_report():
+    """Test that a run reports every operation of the mix."""
+    report = Simulation(days=30, customers=20, arrivals_per_day=50).run()
+    for operation in OPERATIONS:
+        entry = report[operation]
+        assert entry['count'] > 0
+        assert 0 <= entry['failed'] <= entry['count']
+        assert entry['p50'] <= entry['p95'] <= entry['p99']
+        assert entry['peak_memory'] is None
+    assert report['total']['count'] == sum(report[operation]['count'] for operation in OPERATIONS)
+    assert 'ops/s' in format_report(report)
+    
+    
+def test_simulation_is_reproducible():
+    """Test that the same seed performs the same operations."""
+    def outcome(seed):
+        report = Simulation(seed=seed, days=20, store_class=ColumnarRentalStore).run()
+        return ({operation: (report[operation]['count'], report[operation]['failed'])
+                 for operation in OPERATIONS},
+                report['total']['receivables'], report['total']['revenue_by_type'])
+    assert outcome(1) == outcome(1)
+    assert outcome(1) != outcome(2)
+    
+    
+def test_simulation_memory():
+    """Test the peak memory measurement."""
+    report = Simulation(days=5, mix={'rent': 1}, trace_memory=True).run()
+    assert report['rent']['peak_memory'] > 0
+    assert list(report) == ['rent', 'total']
+    
+    
+def test_simulation_mix():
+    """Test that only known operations can be simulated."""
+    with pytest.raises(AssertionError):
+        Simulation(mix={'steal': 1})
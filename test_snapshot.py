@@ -0,0 +1,135 @@
+import pytest
+import datetime
+
+from snapshot import Snapshot, save_snapshot, append_delta
+from columnar import ColumnarRentalStore
+from customer import Customer
+from store import RentalStore
+from products import Laptop, Phone
+
+
+@pytest.fixture
+def store():
+    """Fixture for a RentalStore with two laptops and two phones."""
+    out = RentalStore([
+        Laptop('Test Laptop', 10),
+        Laptop('Test Laptop', 12.5),
+        Phone('Test Phone', 5.2),
+        Phone('Test Phone Rental Only', 3, buyable=False)
+    ])
+    return out
+
+
+@pytest.fixture
+def customer(store):
+    """Fixture for a customer with a current, a paid and a bought item."""
+    out = Customer('Tina Tester', store)
+    paid = out.rent('Test Laptop', 2)
+    paid._rental_start = datetime.date.today() - datetime.timedelta(weeks=3)
+    out.pay_invoice(out.invoice)
+    out.rent('Test Laptop', 4)
+    out.buy('Test Phone')
+    return out
+
+
+def test_snapshot_roundtrip(tmp_path, store, customer):
+    """Test that a store and its customers come back with their rental state."""
+    path = str(tmp_path / 'store.snap')
+    save_snapshot(path, store, [customer])
+    
+    with Snapshot(path) as snapshot:
+        assert len(snapshot) == 4
+        new_store, (new_customer,) = snapshot.load()
+        
+    assert len(new_store) == 3
+    assert new_store.available_count('Test Laptop') == 0
+    assert new_customer.name == 'Tina Tester'
+    assert [item.product_id for item in new_customer.current_items] == [
+        item.product_id for item in customer.current_items]
+    assert [item.rental_start for item in new_customer.paid_items] == [
+        item.rental_start for item in customer.paid_items]
+    assert new_customer.owned_items[0].name == 'Test Phone'
+    assert new_customer.owned_items[0].price_per_week == 5.2
+    assert new_customer.invoice == 0
+    
+    rented = new_store.get_by_id(customer.current_items[0].product_id)
+    assert rented.rental_time == 4
+    rented._rental_start = datetime.date.today() - datetime.timedelta(weeks=5)
+    assert new_customer.invoice == 4 * 12.5
+    
+    
+def test_snapshot_returned_rentals(tmp_path, store, customer):
+    """Test that archived rentals are saved, including the unpaid ones."""
+    customer.return_item(customer.paid_items[0])
+    customer.return_item(customer.current_items[0])
+    path = str(tmp_path / 'store.snap')
+    save_snapshot(path, store, [customer])
+    with Snapshot(path) as snapshot:
+        new_store, (new_customer,) = snapshot.load()
+    assert new_customer.returned_rentals == customer.returned_rentals
+    assert new_customer.invoice == customer.invoice == 4 * 12.5
+    assert new_store.available_count('Test Laptop') == 2
+    
+    
+def test_snapshot_lazy_lookup(tmp_path, store):
+    """Test that single products are found without loading the whole store."""
+    path = str(tmp_path / 'store.snap')
+    save_snapshot(path, store)
+    
+    with Snapshot(path) as snapshot:
+        item = snapshot.get(store.products[2].product_id)
+        assert isinstance(item, Phone)
+        assert item.name == 'Test Phone'
+        assert item.buyable
+        assert snapshot.get(Laptop('Unknown').product_id) is None
+        assert len(snapshot._cache) == 1
+        
+        
+def test_snapshot_deltas(tmp_path, store, customer):
+    """Test that appended deltas are applied on top of the snapshot."""
+    path = str(tmp_path / 'store.snap')
+    save_snapshot(path, store, [customer])
+    
+    new_product = Laptop('Test Laptop New', 20)
+    store + new_product
+    append_delta(path, store, [customer])
+    customer.rent('Test Laptop New', 3)
+    store - store.get_by_name('Test Phone Rental Only')[0]
+    append_delta(path, store, [customer])
+    
+    with Snapshot(path) as snapshot:
+        assert snapshot.get(new_product.product_id).rental_time == 3
+        new_store, (new_customer,) = snapshot.load()
+        
+    assert new_store.get_by_name('Test Phone Rental Only') == []
+    assert new_store.get_by_id(new_product.product_id).rental_time == 3
+    assert sorted(item.name for item in new_customer.current_items) == ['Test Laptop', 'Test Laptop New']
+    
+    save_snapshot(path, store, [customer])
+    assert not (tmp_path / 'store.snap.delta').exists()
+    
+    
+def test_snapshot_reservations(tmp_path, store, customer):
+    """Test that reservations are saved with their customer and booked again on load."""
+    start = datetime.date.today() + datetime.timedelta(weeks=1)
+    reservation = customer.reserve('Test Phone Rental Only', start, 2)
+    path = str(tmp_path / 'store.snap')
+    save_snapshot(path, store, [customer])
+    
+    with Snapshot(path) as snapshot:
+        new_store, (new_customer,) = snapshot.load(quiet=True)
+    (loaded,) = new_customer.reservations
+    assert loaded.item.product_id == reservation.item.product_id
+    assert (loaded.start, loaded.rental_time, loaded.customer) == (start, 2, new_customer)
+    assert new_store.reservations(loaded.item) == [loaded]
+    assert new_store.rent_available('Test Phone Rental Only', 2) is None
+    
+    
+def test_snapshot_into_columnar_store(tmp_path, store, customer):
+    """Test loading a snapshot into a ColumnarRentalStore."""
+    path = str(tmp_path / 'store.snap')
+    save_snapshot(path, store, [customer])
+    with Snapshot(path) as snapshot:
+        new_store, (new_customer,) = snapshot.load(store_class=ColumnarRentalStore, quiet=True)
+    assert isinstance(new_store, ColumnarRentalStore)
+    assert new_customer.current_items[0] in new_store.products
@@ -0,0 +1,131 @@
+import pytest
+import datetime
+import threading
+
+from sqlite_store import SQLiteRentalStore
+from customer import Customer
+from eventlog import EventLog, replay
+from products import Product, Laptop, Phone
+
+
+@pytest.fixture
+def store():
+    """Fixture for an in-memory SQLiteRentalStore with two laptops and two phones."""
+    out = SQLiteRentalStore(products=[
+        Laptop('Test Laptop', 10),
+        Laptop('Test Laptop', 12.5),
+        Phone('Test Phone', 5.2),
+        Phone('Test Phone Rental Only', 3, buyable=False)
+    ])
+    yield out
+    out.close()
+
+
+def test_lookups(store):
+    """Test counts and lookups answered by the database."""
+    assert len(store) == 4
+    assert store.count('Test Laptop') == 2
+    assert store.available_count('Test Laptop') == 2
+    laptop = store.get_by_name('Test Laptop')[0]
+    assert isinstance(laptop, Laptop)
+    assert laptop.price_per_week == 10 and isinstance(laptop.price_per_week, int)
+    assert store.get_by_id(laptop.product_id) is laptop
+    assert store.get_by_id('not an id') is None
+    assert [item.name for item in store.iter_products(kind=Phone, buyable=True)] == ['Test Phone']
+
+
+def test_customer_rent_buy_invoice(store):
+    """Test that a Customer works with the SQLite store unchanged."""
+    customer = Customer('Tina Tester', store)
+    laptop = customer.rent('Test Laptop', 2)
+    assert store.rented_count('Test Laptop') == 1
+    assert store.get_by_id(laptop.product_id) is laptop
+    
+    laptop._rental_start = datetime.date.today() - datetime.timedelta(weeks=3)
+    assert store.ended_items() == [laptop]
+    assert customer.invoice == 20
+    assert store.receivables == 20
+    assert store.active_rentals == 1
+    customer.pay_invoice(customer.invoice)
+    assert customer.invoice == 0
+    
+    phone = customer.buy('Test Phone')
+    assert phone in customer.owned_items
+    assert store.count('Test Phone') == 0
+    assert len(store) == 3
+
+
+def test_rental_state_persists(tmp_path):
+    """Test that a file database keeps products and rentals across stores."""
+    path = str(tmp_path / 'store.db')
+    store = SQLiteRentalStore(path, quiet=True)
+    store.extend_rows([(Laptop, 'Test Laptop', 10, False), (Phone, 'Test Phone', 5.5, True)])
+    rented = store.rent_available('Test Laptop', 4)
+    product_id = rented.product_id
+    store.close()
+    
+    reopened = SQLiteRentalStore(path, quiet=True)
+    laptop = reopened.get_by_id(product_id)
+    assert laptop.rental_time == 4
+    assert laptop.rental_start == datetime.date.today()
+    assert reopened.available_count('Test Laptop') == 0
+    assert reopened.revenue_due(datetime.date.today(), laptop.rental_end) == 40
+    reopened.close()
+
+
+def test_concurrent_rent_available(tmp_path):
+    """Test that pooled connections never hand out a unit twice."""
+    store = SQLiteRentalStore(str(tmp_path / 'store.db'), quiet=True)
+    store.extend([Product('Test Product', 1) for _ in range(50)])
+    rented = []
+    
+    def rent():
+        while True:
+            item = store.rent_available('Test Product', 1)
+            if item is None:
+                return
+            rented.append(item)
+    threads = [threading.Thread(target=rent) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(rented) == 50
+    assert len({item._id for item in rented}) == 50
+    assert store.rented_count('Test Product') == 50
+    store.close()
+
+
+def test_stale_objects_cannot_claim_a_unit(store):
+    """Test that a second object of the same row can neither rent nor sell a taken unit."""
+    phone = store.get_by_name('Test Phone')[0]
+    store._identity.pop(phone._id)
+    stale = store.get_by_name('Test Phone')[0]
+    assert stale is not phone
+    assert phone.rent(1)
+    assert not stale.rent(1)
+    assert not stale.available
+    phone._release()
+    store._identity.pop(phone._id)
+    stale = store.get_by_name('Test Phone')[0]
+    assert store.discard(phone)
+    assert not store.discard(stale)
+    assert stale._store is None
+    assert len(store) == 3
+
+
+def test_eventlog_replay_of_extend_rows(tmp_path):
+    """Test that rows added with extend_rows() are logged, so their rentals can be replayed."""
+    store = SQLiteRentalStore(quiet=True)
+    path = str(tmp_path / 'events.log')
+    with EventLog(path) as log:
+        log.attach(store)
+        store.extend_rows([(Laptop, 'Test Laptop', 10, False), (Phone, 'Test Phone', 5, True)])
+        laptop = Customer('Tina Tester', store).rent('Test Laptop', 2)
+    store.close()
+
+    new_store, (new_customer,) = replay(path, store_class=SQLiteRentalStore)
+    assert len(new_store) == 2
+    assert [item.product_id for item in new_customer.current_items] == [laptop.product_id]
+    assert new_store.rented_count('Test Laptop') == 1
+    new_store.close()